@@ -1,26 +1,71 @@
-from flask import Blueprint, jsonify, request, abort
-from models import db, Survey, Question, Response
+import json
+import uuid
+
+from flask import (
+    Blueprint, Response as HttpResponse, jsonify, request, abort, current_app, stream_with_context,
+    url_for
+)
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload, load_only
+from models import db, Survey, Question, Response, WriteBehindMark
+from guard_common.write_behind import QueueFull, WriteBehindQueue
 
 api = Blueprint('api', __name__)
 
+# Rows fetched from the database at a time when streaming a list
+STREAM_CHUNK_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+
+
+def stream_json_list(rows, to_dict):
+    """Stream query rows as a JSON array without loading them all at once."""
+    def generate():
+        yield "["
+        for i, row in enumerate(rows):
+            yield ("," if i else "") + json.dumps(to_dict(row))
+        yield "]"
+    return HttpResponse(stream_with_context(generate()), mimetype="application/json")
+
+
+def page_args():
+    """Read the optional ?limit= and ?after= keyset pagination arguments."""
+    limit = request.args.get("limit")
+    try:
+        limit = int(limit) if limit is not None else None
+        after = int(request.args.get("after", 0))
+    except ValueError:
+        abort(400, description="limit and after must be integers")
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        abort(400, description=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit, after
+
+
+def survey_summary(row):
+    return {
+        "id": row.id,
+        "unique_id": row.unique_id,
+        "title": row.title,
+        "description": row.description
+    }
+
+
 @api.route('/surveys', methods=['GET'])
 def get_surveys():
-    """Retrieve application surveys in JSON form."""
-    surveys = Survey.query.all()
-    data = []
-    for s in surveys:
-        data.append({
-            "id": s.id,
-            "unique_id": s.unique_id,
-            "title": s.title,
-            "description": s.description
-        })
-    return jsonify(data)
+    """Retrieve application surveys in JSON form, streamed in id order."""
+    rows = db.session.query(
+        Survey.id, Survey.unique_id, Survey.title, Survey.description
+    ).order_by(Survey.id).yield_per(STREAM_CHUNK_SIZE)
+    return stream_json_list(rows, survey_summary)
 
 @api.route('/surveys/<string:unique_id>', methods=['GET'])
 def get_survey(unique_id):
     """Retrieve a specific survey by unique_id."""
-    survey = Survey.query.filter_by(unique_id=unique_id).first()
+    # One query: the survey joined to its questions
+    survey = Survey.query.options(
+        joinedload(Survey.questions).load_only(
+            Question.id, Question.question_text, Question.question_type, Question.options
+        )
+    ).filter_by(unique_id=unique_id).first()
     if not survey:
         abort(404, description="Survey not found")
 
@@ -41,65 +86,175 @@ def get_survey(unique_id):
         })
     return jsonify(survey_data)
 
+def survey_errors(survey_data):
+    """Return a list of problems with one survey's JSON data."""
+    if not isinstance(survey_data, dict):
+        return ["Each survey must be a JSON object"]
+    errors = []
+    title = survey_data.get("title")
+    if not isinstance(title, str) or not title.strip():
+        errors.append("title is required")
+    elif len(title) > 100:
+        errors.append("title must be at most 100 characters")
+    questions = survey_data.get("questions", [])
+    if not isinstance(questions, list) or not all(isinstance(q, dict) for q in questions):
+        errors.append("questions must be a list of objects")
+    return errors
+
+
+def insert_surveys(surveys):
+    """
+    Insert surveys and all of their questions in the current transaction,
+    with one multi-row INSERT for the surveys and one for the questions.
+    Returns the new surveys' unique_ids.
+    """
+    survey_rows = [{
+        "unique_id": str(uuid.uuid4()),
+        "title": survey_data.get("title"),
+        "description": survey_data.get("description")
+    } for survey_data in surveys]
+    survey_ids = db.session.scalars(
+        insert(Survey).returning(Survey.id, sort_by_parameter_order=True), survey_rows
+    ).all()
+
+    question_rows = [{
+        "survey_id": survey_id,
+        "question_text": question_data.get("question_text", ""),
+        "question_type": question_data.get("question_type", "short"),
+        "options": question_data.get("options", "")
+    } for survey_id, survey_data in zip(survey_ids, surveys)
+        for question_data in survey_data.get("questions", [])]
+    if question_rows:
+        db.session.execute(insert(Question), question_rows)
+
+    return [row["unique_id"] for row in survey_rows]
+
+
 @api.route('/surveys', methods=['POST'])
 def create_survey():
-    """Create a new survey from JSON data."""
+    """
+    Create a new survey from JSON data, or several from a JSON list.
+
+    Every survey and question is written in a single transaction, so either
+    all of them are created or none are.
+    """
     json_data = request.get_json()
     if not json_data:
         abort(400, description="No JSON data provided")
 
-    new_survey = Survey(
-        title=json_data.get("title"),
-        description=json_data.get("description")
-    )
-    db.session.add(new_survey)
-    db.session.commit()
+    many = isinstance(json_data, list)
+    surveys = json_data if many else [json_data]
+    errors = {i: e for i, e in enumerate(map(survey_errors, surveys)) if e}
+    if errors:
+        if not many:
+            abort(400, description="; ".join(errors[0]))
+        return jsonify({"errors": errors}), 400
 
-    # If survey has questions, create them
-    questions = json_data.get("questions", [])
-    for question_data in questions:
-        q = Question(
-            survey_id=new_survey.id,
-            question_text=question_data.get("question_text", ""),
-            question_type=question_data.get("question_type", "short"),
-            options=question_data.get("options", "")
-        )
-        db.session.add(q)
+    unique_ids = insert_surveys(surveys)
     db.session.commit()
 
-    return jsonify({"message": "Survey created", "unique_id": new_survey.unique_id}), 201
+    if many:
+        return jsonify({"message": "Surveys created", "unique_ids": unique_ids}), 201
+    return jsonify({"message": "Survey created", "unique_id": unique_ids[0]}), 201
+
+def make_response_queue(app):
+    """
+    Build the write-behind queue for responses. Each batch is inserted with
+    one INSERT together with the queue's mark, so a replay after a crash
+    skips the batches that were already committed.
+    """
+    def apply_batch(entries):
+        with app.app_context():
+            db.session.execute(insert(Response), [
+                {"survey_id": payload["survey_id"], "answers": payload["answers"]}
+                for _, payload in entries
+            ])
+            db.session.merge(WriteBehindMark(queue=queue.uid, applied_through=entries[-1][0]))
+            db.session.commit()
+
+    def applied_through():
+        with app.app_context():
+            mark = db.session.get(WriteBehindMark, queue.uid)
+            return mark.applied_through if mark else 0
+
+    queue = WriteBehindQueue(
+        app.config["WRITE_BEHIND_PATH"], apply_batch, applied_through=applied_through,
+        **app.config.get("WRITE_BEHIND_OPTIONS", {})
+    )
+    return queue
+
 
 @api.route('/surveys/<string:unique_id>/responses', methods=['POST'])
 def submit_response(unique_id):
-    """Submit a response for a given survey via JSON."""
-    survey = Survey.query.filter_by(unique_id=unique_id).first()
-    if not survey:
+    """
+    Submit a response for a given survey via JSON.
+
+    With the write-behind queue enabled the response is queued and 202 is
+    returned; it is written directly when the queue is full.
+    """
+    survey_id = db.session.query(Survey.id).filter_by(unique_id=unique_id).scalar()
+    if survey_id is None:
         abort(404, description="Survey not found")
 
     data = request.get_json()
     if not data:
         abort(400, description="No JSON data provided")
+    answers = data.get("answers", "{}")  # Expect a dict with question_id: answer
 
-    new_response = Response(
-        survey_id=survey.id,
-        answers=data.get("answers", "{}")  # Expect a dict with question_id: answer
-    )
+    queue = current_app.extensions.get("write_behind")
+    if queue is not None:
+        try:
+            queue.enqueue({"survey_id": survey_id, "answers": answers})
+            return jsonify({"message": "Response accepted"}), 202
+        except QueueFull:
+            pass
+
+    new_response = Response(survey_id=survey_id, answers=answers)
     db.session.add(new_response)
     db.session.commit()
 
     return jsonify({"message": "Response submitted"}), 201
 
+@api.route('/write-behind', methods=['GET'])
+def write_behind_stats():
+    """Backpressure and throughput counters of the response queue."""
+    queue = current_app.extensions.get("write_behind")
+    if queue is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **queue.stats()})
+
 @api.route('/surveys/<string:unique_id>/responses', methods=['GET'])
 def get_responses(unique_id):
-    """Return application responses for a given survey."""
-    survey = Survey.query.filter_by(unique_id=unique_id).first()
-    if not survey:
+    """
+    Return application responses for a given survey.
+
+    With ?limit=N a page of responses with ids above ?after= is returned and
+    a Link header points at the next page; without it every response is
+    streamed.
+    """
+    survey_id = db.session.query(Survey.id).filter_by(unique_id=unique_id).scalar()
+    if survey_id is None:
         abort(404, description="Survey not found")
 
-    results = []
-    for r in survey.responses:
-        results.append({
-            "response_id": r.id,
-            "answers": r.answers  # stored as JSON string
-        })
-    return jsonify(results)
+    limit, after = page_args()
+    rows = db.session.query(Response.id, Response.answers).filter(
+        Response.survey_id == survey_id, Response.id > after
+    ).order_by(Response.id)
+
+    def to_dict(row):
+        return {
+            "response_id": row.id,
+            "answers": row.answers  # stored as JSON string
+        }
+
+    if limit is None:
+        return stream_json_list(rows.yield_per(STREAM_CHUNK_SIZE), to_dict)
+
+    page = rows.limit(limit).all()
+    response = jsonify([to_dict(row) for row in page])
+    if len(page) == limit:
+        next_url = url_for(
+            '.get_responses', unique_id=unique_id, limit=limit, after=page[-1].id, _external=True
+        )
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
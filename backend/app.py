@@ -1,8 +1,18 @@
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from config import Config
+from guard_common.sqlite import apply_pragmas
+from models import db, create_missing_indexes
 
-db = SQLAlchemy()
+
+def configure_sqlite(engine, profile):
+    """Run the SQLite profile's PRAGMAs on every new pooled connection."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, profile)
 
 def create_app(config_class=Config):
     """Application factory for the GUARD backend (API only)."""
@@ -16,7 +26,16 @@ def create_app(config_class=Config):
 
     # Create database tables if they don't exist yet
     with app.app_context():
+        configure_sqlite(db.engine, app.config.get("SQLITE_PROFILE"))
         db.create_all()
+        create_missing_indexes(db.engine)
+
+    if app.config.get("WRITE_BEHIND_ENABLED"):
+        from api import make_response_queue
+        queue = make_response_queue(app)
+        app.extensions["write_behind"] = queue
+        # Starting now also replays anything left from a previous run
+        queue.start()
 
     return app
 
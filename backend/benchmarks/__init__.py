@@ -0,0 +1,20 @@
+"""
+Benchmarks for the GUARD reports backend.
+
+Each benchmark is a module that can be run from the backend directory, e.g.
+
+    python -m benchmarks.report_indexes --rows 1000000
+
+They use benchmarks.settings, which points Django at a scratch database
+(SQLite by default) configured through BENCH_DB_* environment variables.
+"""
+import os
+
+
+def setup_django():
+    """
+    Configure Django with the benchmark settings.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
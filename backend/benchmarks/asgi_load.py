@@ -0,0 +1,106 @@
+"""
+Compare autosave throughput of the sync (WSGI, DRF) and async (ASGI,
+/api/async/) report endpoints under concurrent connections.
+
+    python -m benchmarks.asgi_load --concurrency 64 --duration 20 [--output results.json]
+
+Each mode starts gunicorn with the same number of workers (sync workers for
+WSGI, uvicorn workers for ASGI) against the benchmark database. Every client
+thread owns one report and alternates a step PATCH with a resume GET, which is
+what the form's autosave does. On the default SQLite database the writes
+serialize on the database lock; point BENCH_DB_* at PostgreSQL to measure the
+request path rather than SQLite.
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks import setup_django
+from benchmarks.http import Client, run_load, server
+
+
+MODES = {
+    'wsgi': {
+        'command': ['guard_api.wsgi:application'],
+        'prefix': '/api/reports',
+    },
+    'asgi': {
+        'command': ['guard_api.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+        'prefix': '/api/async/reports',
+    },
+}
+
+
+def create_reports(host, port, count):
+    """
+    Create the reports the client threads will autosave into, one at a time.
+    """
+    client = Client(host, port)
+    response_ids = []
+    for _ in range(count):
+        status, body = client.request('POST', '/api/reports/', {})
+        if status != 201:
+            raise RuntimeError(f"Creating a report failed with HTTP {status}")
+        response_ids.append(json.loads(body)['response_id'])
+    client.close()
+    return response_ids
+
+
+def autosave_session(prefix, response_ids):
+    response_ids = list(response_ids)
+
+    def make_session(client):
+        response_id = response_ids.pop()
+        calls = [
+            ('PATCH', f'{prefix}/{response_id}/personal_info/', {'school_name': 'Bench School'}),
+            ('GET', f'{prefix}/{response_id}/resume/', None),
+        ]
+        position = [0]
+
+        def session():
+            method, path, data = calls[position[0] % len(calls)]
+            position[0] += 1
+            return client.request(method, path, data)[0]
+        return session
+    return make_session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+    host = '127.0.0.1'
+    env = {'DJANGO_SETTINGS_MODULE': os.environ['DJANGO_SETTINGS_MODULE']}
+    results = {'concurrency': args.concurrency, 'workers': args.workers}
+    for mode in args.modes:
+        command = [
+            sys.executable, '-m', 'gunicorn', *MODES[mode]['command'],
+            '-w', str(args.workers), '-b', f'{host}:{args.port}', '--log-level', 'warning',
+        ]
+        with server(command, host, args.port, env=env):
+            response_ids = create_reports(host, args.port, args.concurrency)
+            print(f"Running {mode} for {args.duration}s at concurrency {args.concurrency}...")
+            results[mode] = run_load(
+                host, args.port, args.concurrency, args.duration,
+                autosave_session(MODES[mode]['prefix'], response_ids),
+            )
+        print(f"  {results[mode]}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Synthetic report data for seeding benchmark databases.
+"""
+import datetime
+import random
+
+from reports.querysets import explicit_timestamps
+
+BOARDS = [
+    'Toronto District School Board', 'Toronto Catholic District School Board',
+    'Ottawa-Carleton District School Board', 'Peel District School Board',
+    'York Region District School Board', 'Halton Catholic District School Board',
+    'Waterloo Region District School Board', 'Hamilton-Wentworth District School Board',
+    'Thames Valley District School Board', 'Durham Catholic District School Board',
+]
+ROLES = ['student', 'staff', 'parent', 'other']
+INCIDENT_TYPES = [
+    'verbal', 'physical', 'cyber', 'exclusion', 'discrimination', 'harassment', 'other',
+]
+BARRIERS = ['fear', 'didnt_know_how', 'no_trust', 'retaliation', 'other']
+REPORTED_TO = ['Teacher', 'Principal/Vice-Principal', 'Guidance Counselor', 'School Board', 'Police']
+SUPPORT_TYPES = ['counselling', 'peer_support', 'community_org', 'family', 'other']
+WORDS = (
+    'student teacher hallway classroom washroom locker bus comments names pronouns '
+    'online group chat ignored excluded pushed threatened repeatedly school staff '
+    'principal counselor friends afraid unsafe reported nothing happened again week '
+    'lunch gym change room rainbow club poster torn slur laughed'
+).split()
+
+
+def synthetic_report_values(rng, now):
+    """
+    Return a dict of field values for one plausible, fully filled-in report.
+    """
+    created_at = now - datetime.timedelta(seconds=rng.randint(0, 3 * 365 * 24 * 3600))
+    submitted = rng.random() < 0.3
+    return {
+        'created_at': created_at,
+        'updated_at': created_at,
+        'is_submitted': submitted,
+        'current_step': 8 if submitted else rng.randint(1, 8),
+        'research_consent': rng.random() < 0.6,
+        'anonymous': rng.random() < 0.8,
+        'role': rng.choice(ROLES),
+        'school_board': rng.choice(BOARDS),
+        'school_name': f"School {rng.randint(1, 500)}",
+        'incident_description': ' '.join(rng.choices(WORDS, k=rng.randint(20, 400))),
+        'incident_types': rng.sample(INCIDENT_TYPES, rng.randint(1, 3)),
+        'incident_date': (created_at - datetime.timedelta(days=rng.randint(0, 60))).date(),
+        'reported': rng.choice(['yes', 'no']),
+        'reporting_barriers': rng.sample(BARRIERS, rng.randint(0, 2)),
+        'reported_to': rng.sample(REPORTED_TO, rng.randint(0, 2)),
+        'support_received': rng.choice(['yes', 'no']),
+        'support_types': rng.sample(SUPPORT_TYPES, rng.randint(0, 2)),
+        'impact_description': ' '.join(rng.choices(WORDS, k=rng.randint(10, 200))),
+    }
+
+
+def seed_reports(count, batch_size=5000, seed=0):
+    """
+    Insert `count` synthetic reports (and their facet rows) with bulk_create
+    and return how many were created.
+    """
+    from django.utils import timezone
+    from reports.facets import facet_rows
+    from reports.models import MULTI_VALUE_FIELDS, Report, ReportFacet
+    from reports.response_ids import allocate_response_ids
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    created = 0
+    with explicit_timestamps(Report):
+        while created < count:
+            size = min(batch_size, count - created)
+            batch = [
+                Report(response_id=response_id, **synthetic_report_values(rng, now))
+                for response_id in allocate_response_ids(size)
+            ]
+            Report.objects.bulk_create(batch, batch_size=batch_size)
+            ReportFacet.objects.bulk_create([
+                facet
+                for report in batch
+                for facet in facet_rows(ReportFacet, report.pk, {
+                    field: getattr(report, field) for field in MULTI_VALUE_FIELDS
+                })
+            ], batch_size=batch_size)
+            created += size
+    return created
+
+
+def journey_steps(rng, now):
+    """
+    Return (step name, PATCH body) pairs filling in one synthetic report
+    through the form's steps, in order.
+    """
+    from reports.steps import STEPS
+
+    values = synthetic_report_values(rng, now)
+    # The step endpoints set current_step themselves
+    del values['current_step']
+    values['incident_date'] = values['incident_date'].isoformat()
+    return [
+        (step.name, {
+            field: values[field] for field in step.serializer_class.Meta.fields if field in values
+        })
+        for step in STEPS
+    ]
@@ -0,0 +1,107 @@
+"""
+Time survey creation in the Flask API: the previous per-object path (commit
+the survey, add each Question, commit again) against the bulk insert path
+used by POST /api/surveys, for surveys with many questions.
+
+    python -m benchmarks.flask_create_survey --surveys 50 --questions 300 [--output results.json]
+
+Runs against a scratch SQLite database unless BENCH_FLASK_DATABASE_URL is set.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+
+def survey_payload(index, questions):
+    return {
+        "title": f"Survey {index}",
+        "description": "Benchmark survey",
+        "questions": [
+            {"question_text": f"Question {n}", "question_type": "short", "options": ""}
+            for n in range(questions)
+        ],
+    }
+
+
+def create_per_object(db, Survey, Question, json_data):
+    """The create_survey implementation before the bulk insert path."""
+    new_survey = Survey(title=json_data.get("title"), description=json_data.get("description"))
+    db.session.add(new_survey)
+    db.session.commit()
+    for question_data in json_data.get("questions", []):
+        db.session.add(Question(
+            survey_id=new_survey.id,
+            question_text=question_data.get("question_text", ""),
+            question_type=question_data.get("question_type", "short"),
+            options=question_data.get("options", "")
+        ))
+    db.session.commit()
+
+
+def summarize(timings):
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--surveys', type=int, default=50)
+    parser.add_argument('--questions', type=int, default=300)
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    database_url = os.environ.get('BENCH_FLASK_DATABASE_URL')
+    if database_url is None:
+        path = os.path.join(tempfile.gettempdir(), 'guard_flask_bench.sqlite3')
+        if os.path.exists(path):
+            os.remove(path)
+        database_url = 'sqlite:///' + path
+    # config.py reads DATABASE_URL when it is imported
+    os.environ['DATABASE_URL'] = database_url
+
+    from app import create_app
+    from models import db, Survey, Question
+
+    app = create_app()
+    client = app.test_client()
+    payloads = [survey_payload(i, args.questions) for i in range(args.surveys)]
+    results = {'surveys': args.surveys, 'questions_per_survey': args.questions}
+
+    timings = []
+    with app.app_context():
+        for payload in payloads:
+            start = time.perf_counter()
+            create_per_object(db, Survey, Question, payload)
+            timings.append((time.perf_counter() - start) * 1000)
+    results['per_object'] = summarize(timings)
+
+    timings = []
+    for payload in payloads:
+        start = time.perf_counter()
+        response = client.post('/api/surveys', json=payload)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 201, response.get_data(as_text=True)
+    results['bulk_single'] = summarize(timings)
+
+    start = time.perf_counter()
+    response = client.post('/api/surveys', json=payloads)
+    assert response.status_code == 201, response.get_data(as_text=True)
+    results['bulk_many_total_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+    print(f"{'path':<16}{'median (ms)':>14}{'min (ms)':>12}")
+    for name in ('per_object', 'bulk_single'):
+        print(f"{name:<16}{results[name]['median_ms']:>14.2f}{results[name]['min_ms']:>12.2f}")
+    print(f"All {args.surveys} surveys in one request: {results['bulk_many_total_ms']:.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Small HTTP load-generation helpers shared by the server benchmarks.
+"""
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies_ms, errors, elapsed):
+    """
+    Throughput and latency percentiles for one load run.
+    """
+    latencies_ms = sorted(latencies_ms)
+    return {
+        'requests': len(latencies_ms),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies_ms) / elapsed, 1) if elapsed else None,
+        'p50_ms': _round(percentile(latencies_ms, 0.50)),
+        'p95_ms': _round(percentile(latencies_ms, 0.95)),
+        'p99_ms': _round(percentile(latencies_ms, 0.99)),
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+class Client:
+    """
+    Keep-alive JSON client for one load-generating thread.
+    """
+    def __init__(self, host, port, timeout=30):
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, data=None):
+        body = None if data is None else json.dumps(data)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # The server closed a kept-alive connection; retry once on a new one
+            self.connection.close()
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        payload = response.read()
+        return response.status, payload
+
+    def close(self):
+        self.connection.close()
+
+
+def run_load(host, port, concurrency, duration, make_session):
+    """
+    Run `concurrency` threads for `duration` seconds.
+
+    `make_session(client)` is called once per thread and returns a callable
+    that performs one request with the client and returns its HTTP status.
+    """
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        client = Client(host, port)
+        session = make_session(client)
+        local, local_errors = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = session()
+            except (http.client.HTTPException, OSError):
+                status = None
+            if status is None or status >= 400:
+                local_errors += 1
+            else:
+                local.append((time.perf_counter() - start) * 1000)
+        client.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - start)
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not start listening on {host}:{port}")
+
+
+@contextmanager
+def server(command, host, port, env=None):
+    """
+    Start a server subprocess from the backend directory and stop it on exit.
+    """
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        command, cwd=backend_dir, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=sys.stderr,
+    )
+    try:
+        wait_for_port(host, port)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
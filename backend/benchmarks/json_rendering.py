@@ -0,0 +1,100 @@
+"""
+Compare DRF's stdlib JSON renderer and parser with the orjson-backed ones in
+reports.renderers, on report payloads of the sizes the API serves: a list
+page, a single full report (retrieve) and an export-sized batch of reports.
+
+    python -m benchmarks.json_rendering --rows 5000 --repeat 50 [--output results.json]
+
+Payloads are serialized once up front, so only rendering and parsing are
+timed. Reports are seeded into the benchmark database if it has fewer than
+--rows.
+"""
+import argparse
+import io
+import json
+import statistics
+import time
+
+from benchmarks import setup_django
+
+
+def time_call(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def payloads(export_size):
+    from reports.models import Report
+    from reports.serializers import ReportListSerializer, ReportSerializer
+
+    reports = list(Report.objects.order_by('-created_at', '-id')[:export_size])
+    return {
+        'list': {
+            'next': 'http://testserver/api/reports/?cursor=cD0yMDI0',
+            'previous': None,
+            'results': ReportListSerializer(reports[:50], many=True).data,
+        },
+        'retrieve': ReportSerializer(reports[0]).data,
+        'export': ReportSerializer(reports, many=True).data,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--export-size', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from benchmarks.data import seed_reports
+    from reports.models import Report
+    from reports.renderers import FastJSONParser, FastJSONRenderer, orjson_available
+
+    call_command('migrate', verbosity=0)
+    existing = Report.objects.count()
+    if existing < args.rows:
+        print(f"Seeding {args.rows - existing} reports...")
+        seed_reports(args.rows - existing)
+
+    if not orjson_available():
+        print("orjson is not installed; the fast renderer falls back to the stdlib")
+    implementations = {
+        'stdlib': (JSONRenderer(), JSONParser()),
+        'fast': (FastJSONRenderer(), FastJSONParser()),
+    }
+    results = {'orjson': orjson_available(), 'repeat': args.repeat}
+    for name, data in payloads(args.export_size).items():
+        results[name] = {}
+        for implementation, (renderer, parser_) in implementations.items():
+            body = renderer.render(data, 'application/json')
+            results[name][implementation] = {
+                'render_ms': round(time_call(lambda: renderer.render(data, 'application/json'), args.repeat), 3),
+                'parse_ms': round(time_call(lambda: parser_.parse(io.BytesIO(body)), args.repeat), 3),
+                'bytes': len(body),
+            }
+
+    print(f"\n{'payload':<10}{'renderer':<10}{'render (ms)':>13}{'parse (ms)':>12}{'bytes':>12}")
+    for name in ('list', 'retrieve', 'export'):
+        for implementation in implementations:
+            row = results[name][implementation]
+            print(
+                f"{name:<10}{implementation:<10}{row['render_ms']:>13.3f}"
+                f"{row['parse_ms']:>12.3f}{row['bytes']:>12}"
+            )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
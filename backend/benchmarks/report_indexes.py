@@ -0,0 +1,114 @@
+"""
+Time the Report admin/API query patterns with and without the indexes added
+in reports/migrations/0002_report_indexes.py.
+
+    python -m benchmarks.report_indexes --rows 1000000 [--output results.json]
+
+The database is migrated to 0001_initial (no indexes), seeded, timed, then
+migrated forward and timed again.
+"""
+import argparse
+import datetime
+import json
+import statistics
+import time
+
+from benchmarks import setup_django
+
+
+def query_patterns():
+    """
+    The queries behind ReportAdmin's changelist, filters and search, and the
+    API's default ordering.
+    """
+    from django.contrib import admin
+    from django.utils import timezone
+    from benchmarks.data import BOARDS
+    from reports.models import Report
+
+    model_admin = admin.site._registry[Report]
+    last_month = timezone.now() - datetime.timedelta(days=30)
+
+    def search(term):
+        queryset, _ = model_admin.get_search_results(None, Report.objects.all(), term)
+        return queryset.count()
+
+    return {
+        'newest_100': lambda: list(Report.objects.values_list('id', flat=True)[:100]),
+        'submitted_newest_100': lambda: list(
+            Report.objects.filter(is_submitted=True).values_list('id', flat=True)[:100]
+        ),
+        'submitted_last_month_count': lambda: Report.objects.filter(
+            is_submitted=True, created_at__gte=last_month
+        ).count(),
+        'drafts_count': lambda: Report.objects.filter(is_submitted=False).count(),
+        'board_count': lambda: Report.objects.filter(school_board=BOARDS[3]).count(),
+        'admin_search_description': lambda: search('rainbow poster'),
+    }
+
+
+def run_queries(repeat):
+    results = {}
+    for name, query in query_patterns().items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            'median_ms': round(statistics.median(timings), 3),
+            'min_ms': round(min(timings), 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+    from benchmarks.data import seed_reports
+    from reports.models import Report
+
+    call_command('migrate', verbosity=0)
+    call_command('migrate', 'reports', '0001', verbosity=0)
+    existing = Report.objects.count()
+    if existing < args.rows:
+        print(f"Seeding {args.rows - existing} reports...")
+        seed_reports(args.rows - existing)
+
+    results = {'vendor': connection.vendor, 'rows': Report.objects.count()}
+    print("Timing without indexes...")
+    results['before'] = run_queries(args.repeat)
+
+    print("Applying index migrations...")
+    start = time.perf_counter()
+    call_command('migrate', 'reports', verbosity=0)
+    results['migrate_seconds'] = round(time.perf_counter() - start, 2)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE reports_report")
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    print("Timing with indexes...")
+    results['after'] = run_queries(args.repeat)
+
+    print(f"\n{'query':<30}{'before (ms)':>14}{'after (ms)':>14}")
+    for name, before in results['before'].items():
+        after = results['after'][name]
+        print(f"{name:<30}{before['median_ms']:>14.2f}{after['median_ms']:>14.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+Load-test the report form's full journey through the API: create a report,
+PATCH each of its seven steps, resume it and submit it.
+
+    python -m benchmarks.report_journey --concurrency 16 --duration 30 [--output results.json]
+
+gunicorn serves guard_api.wsgi, the project's real URLconf, against the
+benchmark database: SQLite by default, or a local PostgreSQL with
+BENCH_DB_ENGINE=django.db.backends.postgresql and BENCH_DB_NAME, _USER,
+_PASSWORD, _HOST and _PORT. Every client thread fills in one synthetic
+report after another. Latency percentiles and throughput are reported for
+each action and for whole journeys.
+
+Queries per request are counted as the instrumentation middleware counts
+them, by running one journey in-process before the load. The JSON output
+records the git commit and database, so runs can be diffed across commits.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks import setup_django
+from benchmarks.http import Client, server, summarize
+
+
+def journey(request, steps):
+    """
+    Run one journey with `request(method, path, data)`, which returns
+    (status, body), yielding (action, status) after each request. A journey
+    stops at its first failed request.
+    """
+    status, body = request('POST', '/api/reports/', {})
+    yield 'create', status
+    if status != 201:
+        return
+    report = f"/api/reports/{json.loads(body)['response_id']}"
+    for name, data in steps:
+        status = request('PATCH', f'{report}/{name}/', data)[0]
+        yield name, status
+        if status >= 400:
+            return
+    status = request('GET', f'{report}/resume/', None)[0]
+    yield 'resume', status
+    if status >= 400:
+        return
+    yield 'submit', request('PATCH', f'{report}/submit/', {})[0]
+
+
+def journey_actions():
+    from reports.steps import STEPS
+    return ['create', *(step.name for step in STEPS), 'resume', 'submit']
+
+
+def count_queries(steps):
+    """
+    Queries each action of one journey runs, using Django's test client.
+    """
+    from django.test import Client as TestClient
+    from reports.instrumentation import Sample
+
+    client = TestClient()
+    last = {}
+
+    def request(method, path, data):
+        sample = Sample()
+        with sample.track_queries():
+            response = client.generic(
+                method, path, '' if data is None else json.dumps(data), content_type='application/json'
+            )
+        last['queries'] = sample.queries
+        return response.status_code, response.content
+
+    counts = {}
+    for action, status in journey(request, steps):
+        if status >= 400:
+            raise RuntimeError(f"{action} failed with HTTP {status}")
+        counts[action] = last['queries']
+    return counts
+
+
+def run_journeys(host, port, concurrency, duration, seed=0):
+    """
+    Run `concurrency` threads for `duration` seconds, each completing
+    journeys for synthetic reports. Returns latencies and error counts per
+    action, and the durations of complete journeys, in milliseconds.
+    """
+    from django.utils import timezone
+    from benchmarks.data import journey_steps
+
+    latencies, errors, journeys, failed = {}, {}, [], [0]
+    lock = threading.Lock()
+    now = timezone.now()
+    deadline = time.perf_counter() + duration
+
+    def worker(number):
+        client = Client(host, port)
+        rng = random.Random(seed + number)
+        local, local_errors, local_journeys, local_failed = {}, {}, [], 0
+        while time.perf_counter() < deadline:
+            journey_start = start = time.perf_counter()
+            completed = False
+            for action, status in journey(client.request, journey_steps(rng, now)):
+                if status >= 400:
+                    local_errors[action] = local_errors.get(action, 0) + 1
+                    break
+                local.setdefault(action, []).append((time.perf_counter() - start) * 1000)
+                completed = action == 'submit'
+                start = time.perf_counter()
+            if completed:
+                local_journeys.append((time.perf_counter() - journey_start) * 1000)
+            else:
+                local_failed += 1
+        client.close()
+        with lock:
+            for action, values in local.items():
+                latencies.setdefault(action, []).extend(values)
+            for action, count in local_errors.items():
+                errors[action] = errors.get(action, 0) + count
+            journeys.extend(local_journeys)
+            failed[0] += local_failed
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, journeys, failed[0], time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8767)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection, connections
+    from django.utils import timezone
+    from benchmarks.data import journey_steps
+
+    call_command('migrate', verbosity=0)
+    queries = count_queries(journey_steps(random.Random(args.seed), timezone.now()))
+    database = {'vendor': connection.vendor, 'name': str(connection.settings_dict['NAME'])}
+    connections.close_all()
+
+    host = '127.0.0.1'
+    env = {'DJANGO_SETTINGS_MODULE': os.environ['DJANGO_SETTINGS_MODULE']}
+    command = [
+        sys.executable, '-m', 'gunicorn', 'guard_api.wsgi:application',
+        '-w', str(args.workers), '-b', f'{host}:{args.port}', '--log-level', 'warning',
+    ]
+    with server(command, host, args.port, env=env):
+        print(
+            f"Running journeys on {database['vendor']} for {args.duration}s "
+            f"at concurrency {args.concurrency}..."
+        )
+        latencies, errors, journeys, failed, elapsed = run_journeys(
+            host, args.port, args.concurrency, args.duration, args.seed
+        )
+
+    actions = {}
+    for action in journey_actions():
+        actions[action] = summarize(latencies.get(action, []), errors.get(action, 0), elapsed)
+        actions[action]['queries_per_request'] = queries[action]
+    overall = summarize(
+        [value for values in latencies.values() for value in values], sum(errors.values()), elapsed
+    )
+    overall['queries_per_request'] = round(sum(queries.values()) / len(queries), 2)
+    whole = summarize(journeys, failed, elapsed)
+    whole['journeys'] = whole.pop('requests')
+    whole['journeys_per_second'] = whole.pop('requests_per_second')
+    whole['queries_per_journey'] = sum(queries.values())
+    results = {
+        'commit': git_commit(),
+        'database': database,
+        'concurrency': args.concurrency,
+        'workers': args.workers,
+        'duration': args.duration,
+        'overall': overall,
+        'journeys': whole,
+        'actions': actions,
+    }
+
+    print(
+        f"\n{'action':<20}{'requests':>10}{'errors':>8}{'req/s':>9}"
+        f"{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'queries':>9}"
+    )
+    for name, row in [*actions.items(), ('all requests', overall)]:
+        print(
+            f"{name:<20}{row['requests']:>10}{row['errors']:>8}{row['requests_per_second'] or 0:>9}"
+            f"{row['p50_ms'] or 0:>10}{row['p95_ms'] or 0:>10}{row['p99_ms'] or 0:>10}"
+            f"{row['queries_per_request']:>9}"
+        )
+    print(
+        f"\n{whole['journeys']} journeys ({whole['journeys_per_second']}/s, {whole['errors']} failed), "
+        f"p50 {whole['p50_ms']} ms, p95 {whole['p95_ms']} ms, p99 {whole['p99_ms']} ms"
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
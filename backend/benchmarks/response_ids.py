@@ -0,0 +1,118 @@
+"""
+Compare report insert throughput with random response IDs (the previous
+scheme) and with IDs from the pre-allocated Feistel sequence pool.
+
+    python -m benchmarks.response_ids --rows 1000000 --inserts 20000 [--output results.json]
+
+The table is first seeded to --rows so the response_id index is realistically
+large, then each scheme inserts --inserts reports one at a time (as the
+create endpoint does) and again with bulk_create.
+"""
+import argparse
+import json
+import random
+import time
+
+import shortuuid
+
+from benchmarks import setup_django
+
+
+def random_ids(count):
+    generator = shortuuid.ShortUUID()
+    return [generator.random(length=8) for _ in range(count)]
+
+
+def pool_ids(count):
+    from reports.response_ids import allocate_response_ids
+    return allocate_response_ids(count)
+
+
+def next_pool_id():
+    from reports.response_ids import next_response_id
+    return next_response_id()
+
+
+def next_random_id():
+    return shortuuid.ShortUUID().random(length=8)
+
+
+def time_single_inserts(next_id, count, rng):
+    from django.utils import timezone
+    from benchmarks.data import synthetic_report_values
+    from reports.models import Report
+
+    now = timezone.now()
+    rows = [synthetic_report_values(rng, now) for _ in range(count)]
+    start = time.perf_counter()
+    for values in rows:
+        Report.objects.create(response_id=next_id(), **values)
+    return time.perf_counter() - start
+
+
+def time_bulk_inserts(make_ids, count, rng, batch_size=1000):
+    from django.utils import timezone
+    from benchmarks.data import synthetic_report_values
+    from reports.querysets import explicit_timestamps
+    from reports.models import Report
+
+    now = timezone.now()
+    rows = [synthetic_report_values(rng, now) for _ in range(count)]
+    start = time.perf_counter()
+    with explicit_timestamps(Report):
+        for offset in range(0, count, batch_size):
+            batch = rows[offset:offset + batch_size]
+            ids = make_ids(len(batch))
+            Report.objects.bulk_create([
+                Report(response_id=response_id, **values)
+                for response_id, values in zip(ids, batch)
+            ])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--inserts', type=int, default=20_000)
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+    from benchmarks.data import seed_reports
+    from reports.models import Report
+
+    call_command('migrate', verbosity=0)
+    existing = Report.objects.count()
+    if existing < args.rows:
+        print(f"Seeding {args.rows - existing} reports...")
+        seed_reports(args.rows - existing)
+
+    results = {'vendor': connection.vendor, 'rows': Report.objects.count(), 'inserts': args.inserts}
+    schemes = {
+        'random': (next_random_id, random_ids),
+        'feistel_pool': (next_pool_id, pool_ids),
+    }
+    for name, (next_id, make_ids) in schemes.items():
+        rng = random.Random(1)
+        print(f"Timing {name}...")
+        single = time_single_inserts(next_id, args.inserts, rng)
+        bulk = time_bulk_inserts(make_ids, args.inserts, rng)
+        results[name] = {
+            'single_rows_per_second': round(args.inserts / single),
+            'bulk_rows_per_second': round(args.inserts / bulk),
+        }
+
+    print(f"\n{'scheme':<16}{'single (rows/s)':>18}{'bulk (rows/s)':>16}")
+    for name in schemes:
+        row = results[name]
+        print(f"{name:<16}{row['single_rows_per_second']:>18}{row['bulk_rows_per_second']:>16}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Django settings for the benchmarks: the project settings with a scratch database.
+"""
+import os
+import tempfile
+
+from guard_api.settings import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+STATICFILES_DIRS = []
+
+DATABASES = {
+    'default': {
+        'ENGINE': os.environ.get('BENCH_DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.environ.get(
+            'BENCH_DB_NAME', os.path.join(tempfile.gettempdir(), 'guard_bench.sqlite3')
+        ),
+        'USER': os.environ.get('BENCH_DB_USER', ''),
+        'PASSWORD': os.environ.get('BENCH_DB_PASSWORD', ''),
+        'HOST': os.environ.get('BENCH_DB_HOST', ''),
+        'PORT': os.environ.get('BENCH_DB_PORT', ''),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': DATABASES['default']['CONN_HEALTH_CHECKS'],
+    }
+}
+
+# The benchmark database is a scratch one, so its IDs need no secret key
+REPORTS_RESPONSE_ID_KEY = os.environ.get('REPORTS_RESPONSE_ID_KEY', 'benchmarks-only-response-id-key')
+
+# The benchmark database has no replicas
+REPORTS_READ_REPLICAS = {**REPORTS_READ_REPLICAS, 'ALIASES': []}  # noqa: F405
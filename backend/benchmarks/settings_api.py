@@ -0,0 +1,9 @@
+"""
+Django settings for the benchmarks with the API-only profile
+(guard_api.settings_api) and the benchmark database.
+"""
+from guard_api.settings_api import *  # noqa: F401,F403
+
+from benchmarks.settings import (  # noqa: F401
+    ALLOWED_HOSTS, DATABASES, DEBUG, REPORTS_READ_REPLICAS, REPORTS_RESPONSE_ID_KEY
+)
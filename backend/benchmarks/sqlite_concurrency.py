@@ -0,0 +1,87 @@
+"""
+Compare autosave throughput and failed requests ("database is locked") on a
+SQLite file with SQLite's default settings and one connection per request,
+against the 'production' SQLite profile with persistent connections.
+
+    python -m benchmarks.sqlite_concurrency --workers 8 --concurrency 64 --duration 20 [--output results.json]
+
+Each configuration gets a fresh database file, migrated and then served by
+gunicorn with sync workers; the client threads autosave reports as in
+benchmarks.asgi_load.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.asgi_load import autosave_session, create_reports
+from benchmarks.http import run_load, server
+
+
+CONFIGURATIONS = {
+    'default': {'SQLITE_PROFILE': 'default', 'DB_CONN_MAX_AGE': '0'},
+    'production': {'SQLITE_PROFILE': 'production', 'DB_CONN_MAX_AGE': '600'},
+}
+
+
+def fresh_database(name):
+    path = os.path.join(tempfile.gettempdir(), f'guard_sqlite_{name}.sqlite3')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument(
+        '--configurations', nargs='+', choices=list(CONFIGURATIONS), default=list(CONFIGURATIONS)
+    )
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    host = '127.0.0.1'
+    results = {'concurrency': args.concurrency, 'workers': args.workers}
+    for name in args.configurations:
+        env = {
+            **os.environ,
+            **CONFIGURATIONS[name],
+            'DJANGO_SETTINGS_MODULE': 'benchmarks.settings',
+            'BENCH_DB_ENGINE': 'django.db.backends.sqlite3',
+            'BENCH_DB_NAME': fresh_database(name),
+        }
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '-v', '0'], cwd=backend_dir, env=env, check=True
+        )
+        command = [
+            sys.executable, '-m', 'gunicorn', 'guard_api.wsgi:application',
+            '-w', str(args.workers), '-b', f'{host}:{args.port}', '--log-level', 'warning',
+        ]
+        with server(command, host, args.port, env=env):
+            response_ids = create_reports(host, args.port, args.concurrency)
+            print(f"Running {name} for {args.duration}s with {args.workers} workers...")
+            results[name] = run_load(
+                host, args.port, args.concurrency, args.duration,
+                autosave_session('/api/reports', response_ids),
+            )
+        print(f"  {results[name]}")
+
+    print(f"\n{'configuration':<16}{'req/s':>10}{'errors':>10}{'p99 (ms)':>12}")
+    for name in args.configurations:
+        row = results[name]
+        print(f"{name:<16}{row['requests_per_second']:>10}{row['errors']:>10}{row['p99_ms']:>12}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Measure cold start and per-worker memory of the Django API with the full
+settings and the API-only profile (guard_api.settings_api), with and
+without gunicorn preloading.
+
+    python -m benchmarks.startup --runs 5 --workers 4 --duration 5 [--output results.json]
+
+Cold start: a fresh interpreter loads the WSGI application, warms it up
+(guard_api/startup.py) and serves one request, `--runs` times per profile;
+medians are reported, with the modules loaded and the peak RSS.
+
+Worker memory: gunicorn (guard_api/gunicorn.py) runs for each profile with
+GUNICORN_PRELOAD off and on, takes `--duration` seconds of autosave
+traffic, and then each worker's RSS, PSS and private memory is read from
+/proc/<pid>/smaps_rollup (Linux only). Preloading shows up as a lower PSS
+and private size: memory the workers share copy-on-write is only counted
+once.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import setup_django
+from benchmarks.asgi_load import autosave_session, create_reports
+from benchmarks.http import run_load, server
+
+
+PROFILES = {
+    'full': 'benchmarks.settings',
+    'api': 'benchmarks.settings_api',
+}
+
+BOOT_SCRIPT = """
+import json, resource, sys, time
+from wsgiref.util import setup_testing_defaults
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = time.perf_counter()
+from guard_api.startup import warm_up
+warm_up()
+warmed = time.perf_counter()
+environ = {'PATH_INFO': '/api/stats/', 'REMOTE_ADDR': '127.0.0.1'}
+setup_testing_defaults(environ)
+statuses = []
+body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+served = time.perf_counter()
+print(json.dumps({
+    'status': statuses[0],
+    'load_ms': (loaded - start) * 1000,
+    'warm_up_ms': (warmed - loaded) * 1000,
+    'first_request_ms': (served - warmed) * 1000,
+    'modules': len(sys.modules),
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty')
+
+
+def backend_dir():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cold_start(settings_module, runs):
+    """
+    Median timings of `runs` fresh interpreters booting the application.
+    """
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', BOOT_SCRIPT], cwd=backend_dir(), env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        if not sample['status'].startswith('200'):
+            raise RuntimeError(f"The first request failed with {sample['status']}")
+        sample['process_ms'] = (time.perf_counter() - start) * 1000
+        samples.append(sample)
+    return {
+        key: round(statistics.median(sample[key] for sample in samples), 3)
+        for key in ('process_ms', 'load_ms', 'warm_up_ms', 'first_request_ms', 'modules', 'max_rss_kb')
+    }
+
+
+def worker_pids(master_pid):
+    pids = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # The parent pid is the second field after the parenthesized command
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == master_pid:
+            pids.append(int(name))
+    return pids
+
+
+def smaps_rollup(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in SMAPS_FIELDS:
+                values[key] = int(rest.split()[0])
+    return values
+
+
+def worker_memory(settings_module, preload, workers, duration, port):
+    host = '127.0.0.1'
+    env = {
+        'DJANGO_SETTINGS_MODULE': settings_module,
+        'GUNICORN_PRELOAD': '1' if preload else '0',
+    }
+    command = [
+        sys.executable, '-m', 'gunicorn', '-c', 'python:guard_api.gunicorn', 'guard_api.wsgi:application',
+        '-w', str(workers), '-b', f'{host}:{port}', '--log-level', 'warning',
+    ]
+    with server(command, host, port, env=env) as process:
+        response_ids = create_reports(host, port, workers * 2)
+        load = run_load(host, port, workers * 2, duration, autosave_session('/api/reports', response_ids))
+        memory = [smaps_rollup(pid) for pid in worker_pids(process.pid)]
+    per_worker = {
+        'rss_kb': statistics.mean(m['Rss'] for m in memory),
+        'pss_kb': statistics.mean(m['Pss'] for m in memory),
+        'private_kb': statistics.mean(m['Private_Clean'] + m['Private_Dirty'] for m in memory),
+    }
+    return {
+        'workers': len(memory),
+        **{key: round(value) for key, value in per_worker.items()},
+        'requests_per_second': load['requests_per_second'],
+        'errors': load['errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--port', type=int, default=8768)
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+    results = {'runs': args.runs, 'workers': args.workers, 'cold_start': {}, 'worker_memory': {}}
+    for profile in args.profiles:
+        print(f"Cold-starting the {profile} profile {args.runs} times...")
+        results['cold_start'][profile] = cold_start(PROFILES[profile], args.runs)
+
+    if os.path.exists('/proc/self/smaps_rollup'):
+        for profile in args.profiles:
+            for preload in (False, True):
+                name = f"{profile}{'+preload' if preload else ''}"
+                print(f"Measuring worker memory for {name}...")
+                results['worker_memory'][name] = worker_memory(
+                    PROFILES[profile], preload, args.workers, args.duration, args.port
+                )
+    else:
+        print("Skipping worker memory: /proc/<pid>/smaps_rollup is not available")
+
+    print(f"\n{'profile':<10}{'process (ms)':>14}{'load (ms)':>11}{'warm-up (ms)':>14}"
+          f"{'1st request (ms)':>18}{'modules':>9}{'max RSS (MB)':>14}")
+    for profile, row in results['cold_start'].items():
+        print(
+            f"{profile:<10}{row['process_ms']:>14.1f}{row['load_ms']:>11.1f}{row['warm_up_ms']:>14.1f}"
+            f"{row['first_request_ms']:>18.1f}{row['modules']:>9.0f}{row['max_rss_kb'] / 1024:>14.1f}"
+        )
+    if results['worker_memory']:
+        print(f"\n{'workers':<16}{'RSS (MB)':>10}{'PSS (MB)':>10}{'private (MB)':>14}{'req/s':>9}")
+        for name, row in results['worker_memory'].items():
+            print(
+                f"{name:<16}{row['rss_kb'] / 1024:>10.1f}{row['pss_kb'] / 1024:>10.1f}"
+                f"{row['private_kb'] / 1024:>14.1f}{row['requests_per_second']:>9}"
+            )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
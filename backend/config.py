@@ -7,3 +7,14 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or \
         "sqlite:///" + os.path.join(basedir, "survey.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pooled connections are checked before use and replaced after 10 minutes
+    SQLALCHEMY_ENGINE_OPTIONS = {"pool_pre_ping": True, "pool_recycle": 600}
+    # PRAGMAs run on each new SQLite connection (see guard_common/sqlite.py)
+    SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "production")
+
+    # Optional write-behind queue for response submissions: responses are
+    # staged in a local SQLite file and written in batches by a background
+    # thread (see guard_common/write_behind.py)
+    WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND") == "1"
+    WRITE_BEHIND_PATH = os.path.join(basedir, "write_behind_responses.sqlite3")
+    WRITE_BEHIND_OPTIONS = {"batch_size": 500, "max_depth": 10000, "flush_interval": 0.05}
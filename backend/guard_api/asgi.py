@@ -1,5 +1,10 @@
 """
 ASGI config for guard_api project.
+
+Serve it with uvicorn workers to use the async report endpoints under
+/api/async/, e.g.:
+
+    gunicorn guard_api.asgi:application -k uvicorn.workers.UvicornWorker
 """
 
 import os
@@ -7,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'guard_api.settings')
+# Read by guard_api/databases.py: no persistent connections under ASGI
+os.environ.setdefault('DJANGO_SERVER_INTERFACE', 'asgi')
 
 application = get_asgi_application() 
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+DATABASES built from the environment.
+
+Without POSTGRES_DB the project runs on the SQLite file next to manage.py.
+With it, 'default' is the PostgreSQL primary and each host in
+POSTGRES_REPLICAS (comma separated, host or host:port) becomes a read-only
+alias 'replica1', 'replica2', ... which reports.routing.ReplicaRouter sends
+report reads to.
+
+Django 4.2 has no built-in connection pool. Under WSGI connections are kept
+open per worker thread (CONN_MAX_AGE, checked before reuse). Under ASGI
+(guard_api/asgi.py sets DJANGO_SERVER_INTERFACE=asgi) they are closed after
+each request, as Django's docs advise: sync code there runs on a pool of
+threads whose persistent connections would pile up. Either way they can be
+multiplexed by a pgbouncer in front of PostgreSQL: set POSTGRES_POOLER=pgbouncer when it
+runs in transaction pooling mode, which disables server-side cursors (a
+cursor cannot outlive the transaction that pgbouncer lends a server
+connection for).
+"""
+import os
+
+
+POOLERS = ('', 'pgbouncer')
+
+
+def _env(name, default=''):
+    return os.environ.get(name, default)
+
+
+def serves_asgi():
+    return _env('DJANGO_SERVER_INTERFACE', 'wsgi') == 'asgi'
+
+
+def connection_settings():
+    """
+    Settings shared by every alias.
+    """
+    return {
+        # Under WSGI keep connections open between requests, checking them
+        # before reuse; DB_CONN_MAX_AGE overrides either default
+        'CONN_MAX_AGE': int(_env('DB_CONN_MAX_AGE', '0' if serves_asgi() else '600')),
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+
+def sqlite_databases(base_dir):
+    return {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': base_dir / 'db.sqlite3',
+            **connection_settings(),
+        }
+    }
+
+
+def postgres_database(host, port):
+    pooler = _env('POSTGRES_POOLER')
+    if pooler not in POOLERS:
+        raise ValueError(f"Unknown POSTGRES_POOLER {pooler!r}; choose one of {', '.join(POOLERS[1:])}")
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': _env('POSTGRES_DB'),
+        'USER': _env('POSTGRES_USER', 'postgres'),
+        'PASSWORD': _env('POSTGRES_PASSWORD'),
+        'HOST': host,
+        'PORT': port,
+        'DISABLE_SERVER_SIDE_CURSORS': pooler == 'pgbouncer',
+        'OPTIONS': {
+            'connect_timeout': int(_env('POSTGRES_CONNECT_TIMEOUT', '5')),
+        },
+        **connection_settings(),
+    }
+
+
+def postgres_databases():
+    databases = {
+        'default': postgres_database(_env('POSTGRES_HOST', 'localhost'), _env('POSTGRES_PORT', '5432')),
+    }
+    replicas = [host.strip() for host in _env('POSTGRES_REPLICAS').split(',') if host.strip()]
+    for number, replica in enumerate(replicas, start=1):
+        host, _, port = replica.partition(':')
+        databases[f'replica{number}'] = {
+            **postgres_database(host, port or databases['default']['PORT']),
+            # Replicas hold the primary's data; tests use the primary for them
+            'TEST': {'MIRROR': 'default'},
+        }
+    return databases
+
+
+def database_settings(base_dir):
+    """
+    The DATABASES setting for this environment.
+    """
+    if _env('POSTGRES_DB'):
+        return postgres_databases()
+    return sqlite_databases(base_dir)
@@ -0,0 +1,43 @@
+"""
+gunicorn configuration for the Django API:
+
+    gunicorn -c python:guard_api.gunicorn guard_api.wsgi:application
+
+With GUNICORN_PRELOAD=1 (the default) the application is imported and
+warmed up (see guard_api/startup.py) once in the master, and the workers are
+forked from it, sharing its memory copy-on-write. The garbage collector
+would undo most of that: each collection in a worker writes to the header
+of every object it examines, copying the shared pages they live on. So, as
+the gc module documents, collection is disabled in the master, everything
+allocated so far is moved to the permanent generation with gc.freeze()
+before each fork, and collection is enabled again in the worker.
+
+Command-line options (e.g. -w, -b) override these settings.
+"""
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '3'))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+if preload_app:
+    gc.disable()
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from guard_api.startup import warm_up
+        warm_up()
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        # Workers must open their own database connections
+        from django.db import connections
+        connections.close_all()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
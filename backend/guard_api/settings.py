@@ -5,6 +5,11 @@ Django settings for guard_api project.
 import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
+
+from .databases import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -32,6 +37,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it measures the whole request; it removes itself unless
+    # REPORTS_INSTRUMENTATION is enabled (see reports/instrumentation.py)
+    'reports.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -66,12 +74,16 @@ TEMPLATES = [
 WSGI_APPLICATION = 'guard_api.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# SQLite unless POSTGRES_DB is set; POSTGRES_REPLICAS adds read replicas and
+# POSTGRES_POOLER=pgbouncer adapts to transaction pooling (see guard_api/databases.py)
+DATABASES = database_settings(BASE_DIR)
+
+# Report reads go to the replicas, if any (see reports/routing.py)
+DATABASE_ROUTERS = ['reports.routing.ReplicaRouter']
+
+# PRAGMAs run on each new SQLite connection (see guard_common/sqlite.py);
+# 'default' keeps SQLite's own settings
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -117,6 +129,18 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'reports.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # orjson-backed JSON when it is installed (see reports/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'reports.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'reports.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # CORS settings
@@ -124,4 +148,105 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React frontend
 ]
 
-CORS_ALLOW_CREDENTIALS = True 
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True 
+
+# Step saves and report GETs are conditional on the report's ETag (see
+# reports/conditional.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'if-match', 'if-none-match')
+CORS_EXPOSE_HEADERS = ['ETag']
+
+# Shared cache for report resume payloads and read-replica stickiness. Without
+# REDIS_URL Django's per-process local-memory cache is used, which the worker
+# processes don't share, so the resume cache stays off and replica routing
+# can't be enabled.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
+# Cache for report resume lookups (see reports/cache.py), kept in the CACHES
+# alias below; off unless that alias is shared. 'reports.cache.LocMemResumeCache'
+# is an in-process alternative for a single worker process.
+REPORTS_RESUME_CACHE = {
+    'BACKEND': 'reports.cache.DjangoResumeCache',
+    'OPTIONS': {
+        'alias': 'default',
+        'timeout': 30,
+    },
+}
+
+# Report response IDs are reserved from a sequence this many at a time per
+# process, and permuted with a key derived from REPORTS_RESPONSE_ID_KEY (see
+# reports/response_ids.py). The key must be a secret of its own, kept out of
+# the repository: with it every response ID can be listed. It is read the
+# first time an ID is allocated. With DEBUG on and no key set, a development
+# key is used, which `manage.py check --deploy` rejects; with DEBUG off the
+# key is required.
+REPORTS_RESPONSE_ID_BLOCK_SIZE = 256
+REPORTS_RESPONSE_ID_KEY = os.environ.get('REPORTS_RESPONSE_ID_KEY') or (
+    'development-only-response-id-key' if DEBUG else ''
+)
+if not REPORTS_RESPONSE_ID_KEY:
+    raise ImproperlyConfigured(
+        "Set REPORTS_RESPONSE_ID_KEY to a secret kept out of the repository; "
+        "report response IDs are derived from it."
+    )
+
+# Optional write-behind queue for report submissions (see reports/submissions.py).
+# Submissions are staged in a local SQLite file and applied in batches by a
+# background thread; run `manage.py drain_submissions` to replay leftovers.
+REPORTS_WRITE_BEHIND = {
+    'ENABLED': os.environ.get('REPORTS_WRITE_BEHIND') == '1',
+    'PATH': os.path.join(BASE_DIR, 'write_behind.sqlite3'),
+    'OPTIONS': {
+        'batch_size': 500,
+        'max_depth': 10000,
+        'flush_interval': 0.05,
+    },
+}
+
+# Read replicas used by the report list, retrieve, resume, stats and export
+# endpoints. After a write, reads of that report stay on the primary for
+# STICKY_SECONDS; the marks are kept in the CACHE alias, which must be shared
+# by the workers (e.g. Redis, see REDIS_URL), or the app refuses to start.
+REPORTS_READ_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': 10,
+    'CACHE': 'default',
+}
+
+# Per-view request metrics, served at /api/metrics/ (see reports/instrumentation.py).
+# Off unless REPORTS_INSTRUMENTATION=1; the middleware then removes itself.
+# /api/metrics/ is readable by staff users or with REPORTS_METRICS_TOKEN as
+# a bearer token. With ENFORCE_QUERY_BUDGETS a request over its view's query
+# budget fails; `manage.py check_query_budgets` runs the report actions that way.
+REPORTS_INSTRUMENTATION = {
+    'ENABLED': os.environ.get('REPORTS_INSTRUMENTATION') == '1',
+    'ENFORCE_QUERY_BUDGETS': os.environ.get('REPORTS_ENFORCE_QUERY_BUDGETS') == '1',
+    'METRICS_TOKEN': os.environ.get('REPORTS_METRICS_TOKEN') or None,
+}
+
+# Unsubmitted reports are deleted by `manage.py reap_drafts` once they have
+# gone unsaved for TTL_DAYS[current_step] days (DEFAULT_TTL_DAYS for other
+# steps; None keeps them). See reports/drafts.py.
+REPORTS_DRAFT_RETENTION = {
+    'TTL_DAYS': {1: 2, 2: 7},
+    'DEFAULT_TTL_DAYS': 30,
+    'BATCH_SIZE': 500,
+    'PAUSE': 0.0,
+}
+
+# Cold archive for submitted reports older than AGE_DAYS, moved there by
+# `manage.py archive_reports` and put back on demand by the report detail
+# endpoint (see reports/archive.py). zstd needs the zstandard package and
+# falls back to gzip without it.
+REPORTS_ARCHIVE = {
+    'PATH': os.environ.get('REPORTS_ARCHIVE_PATH', os.path.join(BASE_DIR, 'archive')),
+    'AGE_DAYS': 365,
+    'SEGMENT_SIZE': 10000,
+    'BLOCK_SIZE': 64,
+    'COMPRESSION': 'zstd',
+}
@@ -0,0 +1,49 @@
+"""
+Settings for workers that only serve the report API.
+
+The project settings without the admin, sessions, messages, static files,
+whitenoise, the browsable API or the React app, so each worker imports and
+holds less. Run the full settings (guard_api.settings) in a separate
+process for the admin, staff-only endpoints (export, write-behind stats)
+and the frontend, or let the web server serve the frontend build.
+
+    DJANGO_SETTINGS_MODULE=guard_api.settings_api gunicorn guard_api.wsgi:application
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+
+# contenttypes and auth stay: DRF's anonymous user comes from auth
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app not in (
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+    )
+]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'whitenoise.middleware.WhiteNoiseMiddleware',
+    )
+]
+
+ROOT_URLCONF = 'guard_api.urls_api'
+
+# Nothing is rendered from templates
+TEMPLATES = []
+
+# JSON only, and no session logins: the report endpoints allow anyone, and
+# the staff-only ones are served by the full settings
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_RENDERER_CLASSES': ['reports.renderers.FastJSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': ['reports.renderers.FastJSONParser'],
+}
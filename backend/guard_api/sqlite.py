@@ -0,0 +1,17 @@
+"""
+Applies the SQLite tuning profiles (guard_common/sqlite.py) to the Django
+project's connections; connected in reports/apps.py.
+"""
+from guard_common.sqlite import apply_pragmas
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    connection_created handler applying settings.SQLITE_PROFILE to new
+    Django SQLite connections (in-memory test databases are left alone).
+    """
+    from django.conf import settings
+
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    apply_pragmas(connection.connection, getattr(settings, 'SQLITE_PROFILE', 'default'))
@@ -0,0 +1,37 @@
+"""
+Work a process can do once before serving requests.
+
+Under gunicorn with preloading (see guard_api/gunicorn.py) this runs in the
+master, so the workers forked from it start with it done and share the
+result instead of each building its own copy on its first requests.
+"""
+import sys
+
+
+def warm_up():
+    """
+    Build what requests otherwise build lazily: the URLconf and the views
+    it imports, DRF's renderer, parser and permission classes, the column
+    lists of the report actions, and the SPA shell.
+    """
+    from django.urls import get_resolver
+    from rest_framework.settings import api_settings
+    from reports.querysets import loaded_columns
+    from reports.serializers import ReportResumeSerializer
+
+    resolver = get_resolver()
+    resolver.reverse_dict
+    for name in (
+        'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_AUTHENTICATION_CLASSES',
+        'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_PAGINATION_CLASS',
+    ):
+        getattr(api_settings, name)
+
+    from reports.views import ACTION_SERIALIZERS
+    for serializer_class in {*ACTION_SERIALIZERS.values(), ReportResumeSerializer}:
+        loaded_columns(serializer_class)
+
+    # Only when the URLconf serves the frontend (not in guard_api.settings_api)
+    if 'guard_api.views' in sys.modules:
+        from guard_api.views import load_spa_shell
+        load_spa_shell()
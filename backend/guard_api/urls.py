@@ -3,12 +3,14 @@ URL configuration for the guard_api project.
 """
 from django.contrib import admin
 from django.urls import path, include, re_path
-from django.views.generic import TemplateView
+
+from .views import spa_shell
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('reports.urls')),
+    path('api/async/', include('reports.async_urls')),
     
     # Serve React app - this should be last
-    re_path(r'^.*$', TemplateView.as_view(template_name='index.html')),
+    re_path(r'^.*$', spa_shell),
 ] 
\ No newline at end of file
@@ -0,0 +1,9 @@
+"""
+URL configuration for API-only workers (guard_api.settings_api).
+"""
+from django.urls import path, include
+
+urlpatterns = [
+    path('api/', include('reports.urls')),
+    path('api/async/', include('reports.async_urls')),
+]
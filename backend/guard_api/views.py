@@ -0,0 +1,58 @@
+"""
+The React app's index.html, served for every path the API does not handle.
+
+The file is read once per process and kept as bytes with a precomputed
+ETag, instead of going through the template engine on every request; it
+is a static build artifact with no template tags. Restart the server after
+deploying a new frontend build.
+"""
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+
+
+_shell = None
+_shell_lock = threading.Lock()
+
+
+class SPAShell:
+    def __init__(self, content):
+        self.content = content
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def load_spa_shell():
+    """
+    The built index.html, or None when the frontend has not been built.
+    """
+    global _shell
+    if _shell is None:
+        with _shell_lock:
+            if _shell is None:
+                path = os.path.join(settings.REACT_APP_BUILD_PATH, 'index.html')
+                try:
+                    with open(path, 'rb') as f:
+                        _shell = SPAShell(f.read())
+                except FileNotFoundError:
+                    return None
+    return _shell
+
+
+@require_safe
+def spa_shell(request):
+    shell = load_spa_shell()
+    if shell is None:
+        raise Http404("The frontend has not been built")
+    response = get_conditional_response(request, etag=shell.etag)
+    if response is None:
+        response = HttpResponse(shell.content, content_type='text/html; charset=utf-8')
+    response['ETag'] = shell.etag
+    # The shell names the hashed bundles of the current build, so browsers
+    # must revalidate it
+    patch_cache_control(response, no_cache=True)
+    return response
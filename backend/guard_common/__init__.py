@@ -0,0 +1,4 @@
+"""
+Code shared by the Django project and the Flask app. Nothing here imports
+Django or Flask.
+"""
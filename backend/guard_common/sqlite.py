@@ -0,0 +1,52 @@
+"""
+SQLite connection tuning for deployments that run on a plain SQLite file.
+
+A profile is a set of PRAGMAs run on every new connection. 'production'
+switches the file to WAL (readers no longer block the writer), makes commits
+fsync only at checkpoints, waits for the write lock instead of failing with
+"database is locked", and gives each connection a larger page cache and a
+memory map. 'default' leaves SQLite's own settings alone.
+
+Applied by the Django project (guard_api/sqlite.py) and by the Flask app
+(app.py); it only depends on sqlite3.
+"""
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,       # milliseconds
+        'cache_size': -65536,       # negative: KiB, i.e. 64 MiB per connection
+        'mmap_size': 268435456,     # 256 MiB
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def profile_pragmas(profile):
+    """
+    The PRAGMAs for a profile given by name (or already as a dict).
+    """
+    if isinstance(profile, dict):
+        return profile
+    try:
+        return SQLITE_PROFILES[profile or 'default']
+    except KeyError:
+        raise ValueError(
+            f"Unknown SQLite profile {profile!r}; choose one of {', '.join(SQLITE_PROFILES)}"
+        )
+
+
+def apply_pragmas(dbapi_connection, profile):
+    """
+    Run a profile's PRAGMAs on a sqlite3 connection.
+    """
+    pragmas = profile_pragmas(profile)
+    if not pragmas:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
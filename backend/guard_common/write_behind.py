@@ -0,0 +1,341 @@
+"""
+Durable write-behind queue for bursts of submissions.
+
+A submission is appended to a staging table in a local SQLite file (WAL
+mode) and acknowledged straight away; a background thread then applies the
+queued entries to the main database in batches, one transaction per batch,
+so a burst costs one commit per batch instead of one per request.
+
+Only one process drains a given queue at a time (an flock on a lock file
+next to the queue decides which), so several workers can share it. Entries
+are removed from the staging table only after their batch has committed. If
+the process dies in between, the entries are applied again when draining
+resumes; `apply_batch` must either be idempotent or record the last applied
+id (keyed by the queue's `uid`) in the same transaction and report it
+through `applied_through`, in which case those entries are skipped.
+
+This module has no Django or Flask imports; both apps wrap it (see
+reports/submissions.py and api.py).
+
+An entry that fails on its own while the rest of its batch applies is moved
+to a dead_letter table. It is moved before any later entry is applied, so an
+`applied_through` mark never passes an entry that is still only in the
+queue.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """
+    Raised by `enqueue` when the queue already holds `max_depth` entries;
+    callers should fall back to writing synchronously.
+    """
+
+
+class DrainBusy(Exception):
+    """
+    Raised by `drain` when another process kept the drain lock for the
+    whole timeout; it is draining the queue itself.
+    """
+
+
+class WriteBehindQueue:
+    """
+    Queue of JSON payloads in the SQLite file at `path`.
+
+    `apply_batch(entries)` receives a list of (id, payload) pairs in id order
+    and must write them to the main database in a single transaction.
+    `synchronous` is the staging file's PRAGMA synchronous: NORMAL survives a
+    crash of the process, FULL also survives power loss at the cost of an
+    fsync per enqueue.
+    """
+    def __init__(self, path, apply_batch, applied_through=None, batch_size=500,
+                 max_depth=10000, flush_interval=0.05, synchronous='NORMAL'):
+        self.path = path
+        self.apply_batch = apply_batch
+        self.applied_through = applied_through
+        self.batch_size = batch_size
+        self.max_depth = max_depth
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+
+        self.enqueued = 0
+        self.applied = 0
+        self.rejected = 0
+        self.dead_lettered = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_batch_size = 0
+        self.apply_seconds = 0.0
+
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._lock_file = None
+        self._start_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._create_tables()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(f'PRAGMA synchronous={self.synchronous}')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _create_tables(self):
+        connection = self._connection()
+        # A random id for this queue file, so that marks recorded through
+        # `applied_through` are not mistaken for a recreated file's entries
+        connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        connection.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('uid', lower(hex(randomblob(16))))"
+        )
+        self.uid = connection.execute("SELECT value FROM meta WHERE key = 'uid'").fetchone()[0]
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS queue ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, enqueued_at REAL NOT NULL)'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS dead_letter ('
+            'id INTEGER PRIMARY KEY, payload TEXT NOT NULL, enqueued_at REAL NOT NULL, '
+            'failed_at REAL NOT NULL, error TEXT)'
+        )
+
+    def depth(self):
+        # max - min is read from the ends of the rowid b-tree, unlike COUNT(*);
+        # entries are removed oldest first, so it is the number of entries
+        first, last = self._connection().execute('SELECT min(id), max(id) FROM queue').fetchone()
+        return 0 if first is None else last - first + 1
+
+    def enqueue(self, payload):
+        """
+        Durably queue one payload and return its id. Raises QueueFull when
+        the queue is at `max_depth`.
+        """
+        self.start()
+        if self.depth() >= self.max_depth:
+            with self._stats_lock:
+                self.rejected += 1
+            raise QueueFull(f"{self.path} holds {self.max_depth} entries")
+        cursor = self._connection().execute(
+            'INSERT INTO queue (payload, enqueued_at) VALUES (?, ?)', (json.dumps(payload), time.time())
+        )
+        with self._stats_lock:
+            self.enqueued += 1
+        self._wake.set()
+        return cursor.lastrowid
+
+    def start(self):
+        """
+        Start the background drain thread in this process, if not running.
+        """
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            self._lock_file = None
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def _acquire_drain_lock(self):
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            self._lock_file = True
+            return True
+        lock_file = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.recover()
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if not self._acquire_drain_lock():
+                # Another process is draining; check again later in case it exits
+                time.sleep(1)
+                continue
+            try:
+                with self._drain_lock:
+                    while self._drain_batch():
+                        pass
+            except Exception:
+                logger.exception("Write-behind drain of %s failed", self.path)
+                time.sleep(1)
+
+    def drain(self, timeout=30):
+        """
+        Apply every queued entry now and return the number applied. Waits up
+        to `timeout` seconds (0: not at all, None: indefinitely) for the drain
+        lock if another process holds it, then raises DrainBusy.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._acquire_drain_lock():
+            if deadline is not None and time.monotonic() >= deadline:
+                raise DrainBusy(f"Another process is draining {self.path}")
+            time.sleep(0.1)
+        applied = 0
+        with self._drain_lock:
+            while True:
+                count = self._drain_batch()
+                if not count:
+                    return applied
+                applied += count
+
+    def recover(self):
+        """
+        Drop entries that a previous drainer applied but did not get to
+        delete, using `applied_through`.
+        """
+        if self.applied_through is None:
+            return
+        last_applied = self.applied_through()
+        if last_applied:
+            self._connection().execute('DELETE FROM queue WHERE id <= ?', (last_applied,))
+
+    def _drain_batch(self):
+        connection = self._connection()
+        rows = connection.execute(
+            'SELECT id, payload, enqueued_at FROM queue ORDER BY id LIMIT ?', (self.batch_size,)
+        ).fetchall()
+        if not rows:
+            return 0
+
+        entries = [(pk, json.loads(payload)) for pk, payload, _ in rows]
+        start = time.perf_counter()
+        try:
+            self.apply_batch(entries)
+        except Exception:
+            logger.warning("Write-behind batch failed; applying entries one by one", exc_info=True)
+            return self._apply_singly(rows)
+
+        connection.execute('DELETE FROM queue WHERE id <= ?', (rows[-1][0],))
+        self._count_batch(len(rows), time.perf_counter() - start)
+        return len(rows)
+
+    def _apply_singly(self, rows):
+        """
+        After a failed batch, apply each entry on its own. Entries that fail
+        while others succeed are moved to the dead_letter table; if every
+        entry fails the cause is probably the database, so they are kept and
+        retried later.
+
+        A failed entry is dead-lettered before the next entry is tried, since
+        applying that one moves the `applied_through` mark past it; if the
+        remaining entries all fail too, it is put back in the queue.
+        """
+        connection = self._connection()
+        pending, dead_lettered, applied = [], [], 0
+        for pk, payload, enqueued_at in rows:
+            if pending:
+                self._move_to_dead_letter(pending)
+                dead_lettered += pending
+                pending = []
+            try:
+                self.apply_batch([(pk, json.loads(payload))])
+            except Exception as exc:
+                pending.append((pk, payload, enqueued_at, repr(exc)))
+                continue
+            connection.execute('DELETE FROM queue WHERE id = ?', (pk,))
+            applied += 1
+
+        if not applied:
+            self._restore_from_dead_letter([row[0] for row in dead_lettered])
+            with self._stats_lock:
+                self.failures += 1
+            raise RuntimeError(f"Could not apply any of {len(rows)} queued entries")
+
+        self._move_to_dead_letter(pending)
+        with self._stats_lock:
+            self.dead_lettered += len(dead_lettered) + len(pending)
+        self._count_batch(applied, 0.0)
+        return len(rows)
+
+    def _move_to_dead_letter(self, failed):
+        """
+        Move (id, payload, enqueued_at, error) entries from the queue to the
+        dead_letter table in one transaction.
+        """
+        if not failed:
+            return
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        connection.executemany(
+            'INSERT OR REPLACE INTO dead_letter (id, payload, enqueued_at, failed_at, error) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(pk, payload, enqueued_at, time.time(), error) for pk, payload, enqueued_at, error in failed],
+        )
+        connection.executemany('DELETE FROM queue WHERE id = ?', [(row[0],) for row in failed])
+        connection.execute('COMMIT')
+
+    def _restore_from_dead_letter(self, ids):
+        if not ids:
+            return
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        connection.executemany(
+            'INSERT INTO queue (id, payload, enqueued_at) '
+            'SELECT id, payload, enqueued_at FROM dead_letter WHERE id = ?',
+            [(pk,) for pk in ids],
+        )
+        connection.executemany('DELETE FROM dead_letter WHERE id = ?', [(pk,) for pk in ids])
+        connection.execute('COMMIT')
+
+    def _count_batch(self, size, seconds):
+        with self._stats_lock:
+            self.applied += size
+            self.batches += 1
+            self.last_batch_size = size
+            self.apply_seconds += seconds
+
+    def stats(self):
+        """
+        Backpressure and throughput counters. The counters are for this
+        process; depth and oldest_age_seconds are for the whole queue.
+        """
+        oldest = self._connection().execute(
+            'SELECT enqueued_at FROM queue ORDER BY id LIMIT 1'
+        ).fetchone()
+        depth = self.depth()
+        with self._stats_lock:
+            return {
+                'depth': depth,
+                'max_depth': self.max_depth,
+                'utilization': depth / self.max_depth if self.max_depth else 0.0,
+                'oldest_age_seconds': time.time() - oldest[0] if oldest else 0.0,
+                'enqueued': self.enqueued,
+                'applied': self.applied,
+                'rejected': self.rejected,
+                'dead_lettered': self.dead_lettered,
+                'batches': self.batches,
+                'failures': self.failures,
+                'last_batch_size': self.last_batch_size,
+                'avg_batch_ms': self.apply_seconds * 1000 / self.batches if self.batches else 0.0,
+                'draining': self._lock_file is not None,
+            }
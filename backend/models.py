@@ -10,13 +10,14 @@ class Survey(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
 
-    questions = db.relationship('Question', backref='survey', cascade="all, delete-orphan", lazy=True)
+    questions = db.relationship('Question', backref='survey', cascade="all, delete-orphan", lazy=True,
+                                order_by='Question.id')
     responses = db.relationship('Response', backref='survey', cascade="all, delete-orphan", lazy=True)
 
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'), nullable=False)
+    survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'), nullable=False, index=True)
     question_text = db.Column(db.String(200), nullable=False)
     question_type = db.Column(db.String(20), nullable=False)
     options = db.Column(db.Text)
@@ -25,3 +26,19 @@ class Response(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'), nullable=False)
     answers = db.Column(db.Text, nullable=False)
+
+    # Covers lookups by survey and paging through them in id order
+    __table_args__ = (db.Index('ix_response_survey_id_id', 'survey_id', 'id'),)
+
+
+class WriteBehindMark(db.Model):
+    """Last queued entry applied from a write-behind queue, by queue uid."""
+    queue = db.Column(db.String(32), primary_key=True)
+    applied_through = db.Column(db.Integer, nullable=False, default=0)
+
+
+def create_missing_indexes(engine):
+    """create_all() skips existing tables, so add indexes declared since."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -1,5 +1,35 @@
+from django import forms
 from django.contrib import admin
-from .models import Report
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .cache import get_resume_cache
+from .facets import sync_facets
+from .models import MULTI_VALUE_FIELDS, Report, validate_choice_values
+from .pagination import EstimatedCountPaginator
+from . import search
+from .stats import (
+    STAT_SOURCE_FIELDS, recount_report, stat_keys, submitted_stat_keys, subtract_counts
+)
+from .steps import update_report
+
+
+class ReportAdminForm(forms.ModelForm):
+    """
+    Report form that validates the multi-value fields like the API does.
+    """
+    class Meta:
+        model = Report
+        fields = '__all__'
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        for field in MULTI_VALUE_FIELDS:
+            if field in cleaned_data:
+                try:
+                    validate_choice_values(cleaned_data[field])
+                except ValidationError as exc:
+                    self.add_error(field, exc)
+        return cleaned_data
 
 
 @admin.register(Report)
@@ -7,14 +37,18 @@ class ReportAdmin(admin.ModelAdmin):
     """
     Admin interface for the Report model.
     """
+    form = ReportAdminForm
     list_display = ('response_id', 'created_at', 'updated_at', 'is_submitted', 'current_step')
     list_filter = ('is_submitted', 'current_step', 'created_at')
     search_fields = ('response_id', 'name', 'school_name', 'incident_description')
-    readonly_fields = ('response_id', 'created_at', 'updated_at')
+    readonly_fields = ('response_id', 'created_at', 'updated_at', 'version')
+    # Avoid COUNT(*) over the whole table on every changelist page
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Metadata', {
-            'fields': ('response_id', 'created_at', 'updated_at', 'is_submitted', 'current_step')
+            'fields': ('response_id', 'created_at', 'updated_at', 'version', 'is_submitted', 'current_step')
         }),
         ('Before You Begin', {
             'fields': ('reported_officially', 'research_consent')
@@ -38,4 +72,63 @@ class ReportAdmin(admin.ModelAdmin):
         ('Additional Information', {
             'fields': ('additional_info', 'contact_permission', 'contact_email', 'contact_phone')
         }),
-    ) 
\ No newline at end of file
+    )
+    
+    def get_search_fields(self, request):
+        """
+        On SQLite the incident description is searched through the FTS5 index
+        (see get_search_results) instead of an icontains table scan.
+        """
+        if search.uses_fts():
+            return tuple(f for f in self.search_fields if f != 'incident_description')
+        return self.search_fields
+    
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term and search.uses_fts():
+            results |= queryset.filter(search.description_matches(search_term))
+        return results, may_have_duplicates 
+    
+    def save_model(self, request, obj, form, change):
+        """
+        An edit is a new version of the report, so clients holding the old
+        ETag see the change and cannot save over it. The facet rows and the
+        statistics rollup are brought in line with the saved values in the
+        same transaction, as the API's writes do.
+        """
+        with transaction.atomic():
+            old_keys = []
+            if change:
+                old_keys = submitted_stat_keys(report_id=obj.pk)
+                obj.version = update_report(obj.response_id, {}) or obj.version
+            super().save_model(request, obj, form, change)
+            sync_facets({field: getattr(obj, field) for field in MULTI_VALUE_FIELDS}, report_id=obj.pk)
+            new_keys = []
+            if obj.is_submitted:
+                new_keys = stat_keys({field: getattr(obj, field) for field in STAT_SOURCE_FIELDS})
+            recount_report(old_keys, new_keys)
+        get_resume_cache().delete(obj.response_id)
+    
+    def delete_model(self, request, obj):
+        """
+        Take a deleted submitted report out of the statistics rollup.
+        """
+        with transaction.atomic():
+            old_keys = submitted_stat_keys(report_id=obj.pk)
+            super().delete_model(request, obj)
+            recount_report(old_keys, [])
+        get_resume_cache().delete(obj.response_id)
+    
+    def delete_queryset(self, request, queryset):
+        """
+        Take the deleted submitted reports out of the statistics rollup.
+        """
+        with transaction.atomic():
+            submitted = list(queryset.filter(is_submitted=True).values(*STAT_SOURCE_FIELDS))
+            response_ids = list(queryset.values_list('response_id', flat=True))
+            super().delete_queryset(request, queryset)
+            for values in submitted:
+                subtract_counts(stat_keys(values))
+        cache = get_resume_cache()
+        for response_id in response_ids:
+            cache.delete(response_id)
@@ -1,6 +1,43 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'reports' 
\ No newline at end of file
+    name = 'reports'
+
+    def ready(self):
+        from . import checks  # noqa: F401
+        # Refuse to start with replicas but no shared cache
+        from .routing import check_replica_settings
+        check_replica_settings()
+        post_migrate.connect(restore_search_index, sender=self)
+
+        from guard_api.sqlite import configure_connection
+        connection_created.connect(configure_connection)
+
+        # Serving processes drain the write-behind queue (management
+        # commands don't)
+        from .submissions import start_submission_queue
+        request_started.connect(start_submission_queue, dispatch_uid='reports.start_submission_queue')
+
+
+def restore_search_index(sender, using, **kwargs):
+    """
+    Put back the SQLite FTS triggers after migrations that rebuilt the
+    reports table, as long as the search index migration is applied.
+    """
+    from django.db import connections, router
+    from django.db.migrations.recorder import MigrationRecorder
+    from .models import Report
+    from .search import install_search_index
+
+    if not router.allow_migrate_model(using, Report):
+        # e.g. a read replica, which gets its tables from the primary
+        return
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('reports', '0002_report_indexes') in applied:
+        install_search_index(connection)
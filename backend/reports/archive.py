@@ -0,0 +1,329 @@
+"""
+Cold archive tier for old submitted reports.
+
+`manage.py archive_reports` moves submitted reports created, and last
+changed, more than REPORTS_ARCHIVE['AGE_DAYS'] ago out of reports_report
+into append-only segment files under REPORTS_ARCHIVE['PATH']:
+
+    segments/000001.ndjson.zst   blocks of up to BLOCK_SIZE reports, each
+                                 block one compressed frame of NDJSON rows
+    index.sqlite3                response_id -> segment, block offset, length
+
+A segment is written under a temporary name, synced and renamed before its
+reports are indexed, and never changed afterwards; reports are deleted from
+the table only once they are indexed. Blocks are compressed with zstd when
+the `zstandard` package is installed and gzip otherwise; the file suffix
+records which, so both can be read back.
+
+The report endpoints rehydrate archived reports, so fetching, resuming,
+saving a step of or submitting one works as before: a report that is not
+in the table but is in the index is inserted back with its original id,
+timestamps and facet rows, and dropped from the index (a later run archives
+it again). Archived reports keep counting in the ReportStat rollups, and
+`rebuild_stats` and the research export read them from the archive, but
+they are left out of the report list and the admin.
+"""
+import datetime
+import gzip
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .cache import get_resume_cache
+from .facets import sync_facets
+from .models import MULTI_VALUE_FIELDS, Report
+from .renderers import dumps, loads
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+DEFAULT_ARCHIVE = {
+    'PATH': 'archive',
+    # Submitted reports this old are moved to the archive
+    'AGE_DAYS': 365,
+    'SEGMENT_SIZE': 10000,
+    'BLOCK_SIZE': 64,
+    'COMPRESSION': 'zstd',
+}
+
+SEGMENT_SUFFIX = '.ndjson'
+
+
+class ZstdCodec:
+    suffix = '.zst'
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=10).compress(data)
+
+    def decompress(self, data):
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+class GzipCodec:
+    suffix = '.gz'
+
+    def compress(self, data):
+        return gzip.compress(data, mtime=0)
+
+    def decompress(self, data):
+        return gzip.decompress(data)
+
+
+CODECS = {'.zst': ZstdCodec(), '.gz': GzipCodec()}
+
+
+def archive_settings():
+    return {**DEFAULT_ARCHIVE, **getattr(settings, 'REPORTS_ARCHIVE', {})}
+
+
+def archive_codec(compression):
+    """
+    The codec new segments are written with; zstd falls back to gzip when
+    zstandard is not installed.
+    """
+    if compression == 'zstd' and zstandard is not None:
+        return CODECS['.zst']
+    if compression not in ('zstd', 'gzip'):
+        raise ValueError(f"Unknown archive compression {compression!r}")
+    return CODECS['.gz']
+
+
+def report_from_row(row):
+    """
+    A Report built from an archived row, with its values converted back
+    from their JSON form.
+    """
+    return Report(**{
+        field.attname: field.to_python(row[field.attname])
+        for field in Report._meta.concrete_fields
+        if field.attname in row
+    })
+
+
+class ReportArchive:
+    """
+    The segment files and index in one archive directory.
+    """
+    def __init__(self, path, segment_size=10000, block_size=64, compression='zstd'):
+        self.path = path
+        self.segment_dir = os.path.join(path, 'segments')
+        self.index_path = os.path.join(path, 'index.sqlite3')
+        self.segment_size = segment_size
+        self.block_size = block_size
+        self.codec = archive_codec(compression)
+
+    def connect(self):
+        os.makedirs(self.segment_dir, exist_ok=True)
+        connection = sqlite3.connect(self.index_path, timeout=30)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS archived_reports ("
+            "response_id TEXT PRIMARY KEY, segment TEXT NOT NULL, "
+            "block_offset INTEGER NOT NULL, block_length INTEGER NOT NULL)"
+        )
+        return connection
+
+    @contextmanager
+    def writer_lock(self):
+        """
+        Only one archiving run writes segments at a time.
+        """
+        os.makedirs(self.segment_dir, exist_ok=True)
+        with open(os.path.join(self.path, '.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def next_segment_name(self):
+        numbers = [
+            int(name.split('.', 1)[0]) for name in os.listdir(self.segment_dir)
+            if name.split('.', 1)[0].isdigit() and not name.endswith('.tmp')
+        ]
+        return f"{max(numbers, default=0) + 1:06d}{SEGMENT_SUFFIX}{self.codec.suffix}"
+
+    def write_segment(self, rows):
+        """
+        Write `rows` (dicts from `Report.objects.values()`) to a new segment
+        and index them. Returns the segment's name.
+        """
+        name = self.next_segment_name()
+        path = os.path.join(self.segment_dir, name)
+        entries, offset = [], 0
+        with open(path + '.tmp', 'wb') as f:
+            for start in range(0, len(rows), self.block_size):
+                block = rows[start:start + self.block_size]
+                data = self.codec.compress(b''.join(dumps(row) + b'\n' for row in block))
+                f.write(data)
+                entries += [(row['response_id'], name, offset, len(data)) for row in block]
+                offset += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        with closing(self.connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO archived_reports VALUES (?, ?, ?, ?)", entries
+            )
+        return name
+
+    def read_block(self, segment, offset, length):
+        with open(os.path.join(self.segment_dir, segment), 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        codec = CODECS[os.path.splitext(segment)[1]]
+        return [loads(line) for line in codec.decompress(data).splitlines()]
+
+    def find(self, response_id):
+        """
+        The archived row of a report, or None.
+        """
+        if not os.path.exists(self.index_path):
+            return None
+        with closing(self.connect()) as connection:
+            entry = connection.execute(
+                "SELECT segment, block_offset, block_length FROM archived_reports WHERE response_id = ?",
+                [response_id],
+            ).fetchone()
+        if entry is None:
+            return None
+        for row in self.read_block(*entry):
+            if row['response_id'] == response_id:
+                return row
+        return None
+
+    def archived_ids(self, response_ids):
+        """
+        The subset of `response_ids` that is archived.
+        """
+        response_ids = list(response_ids)
+        if not response_ids or not os.path.exists(self.index_path):
+            return set()
+        with closing(self.connect()) as connection:
+            rows = connection.execute(
+                "SELECT response_id FROM archived_reports WHERE response_id IN "
+                f"({', '.join('?' * len(response_ids))})",
+                response_ids,
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def forget(self, response_ids):
+        """
+        Drop reports from the index, e.g. once they are back in the table.
+        """
+        with closing(self.connect()) as connection, connection:
+            connection.executemany(
+                "DELETE FROM archived_reports WHERE response_id = ?", [[rid] for rid in response_ids]
+            )
+
+    def iter_rows(self):
+        """
+        Every report currently archived (that is, indexed), block by block.
+        """
+        if not os.path.exists(self.index_path):
+            return
+        with closing(self.connect()) as connection:
+            entries = connection.execute(
+                "SELECT segment, block_offset, block_length, response_id FROM archived_reports "
+                "ORDER BY segment, block_offset"
+            ).fetchall()
+        block, indexed = None, set()
+        for segment, offset, length, response_id in entries + [(None, None, None, None)]:
+            if block is not None and block != (segment, offset, length):
+                for row in self.read_block(*block):
+                    if row['response_id'] in indexed:
+                        yield row
+                indexed = set()
+            block = (segment, offset, length)
+            indexed.add(response_id)
+
+    def count(self):
+        if not os.path.exists(self.index_path):
+            return 0
+        with closing(self.connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM archived_reports").fetchone()[0]
+
+
+def get_archive():
+    config = archive_settings()
+    path = config['PATH']
+    if not os.path.isabs(path):
+        path = os.path.join(settings.BASE_DIR, path)
+    return ReportArchive(
+        path, segment_size=config['SEGMENT_SIZE'], block_size=config['BLOCK_SIZE'],
+        compression=config['COMPRESSION'],
+    )
+
+
+def archivable_reports(now=None, age_days=None):
+    age_days = archive_settings()['AGE_DAYS'] if age_days is None else age_days
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=age_days)
+    # created_at narrows the scan with the (is_submitted, created_at) index;
+    # updated_at keeps reports edited recently (e.g. in the admin)
+    return Report.objects.filter(is_submitted=True, created_at__lt=cutoff, updated_at__lt=cutoff)
+
+
+def archive_reports(age_days=None, limit=None, now=None, archive=None, delete_batch_size=500):
+    """
+    Move archivable reports into new segments, one segment at a time, and
+    return how many were moved.
+    """
+    archive = archive or get_archive()
+    queryset = archivable_reports(now, age_days)
+    moved, last_id = 0, 0
+    with archive.writer_lock():
+        while limit is None or moved < limit:
+            size = archive.segment_size if limit is None else min(archive.segment_size, limit - moved)
+            rows = list(queryset.filter(id__gt=last_id).order_by('id').values()[:size])
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            archive.write_segment(rows)
+            for start in range(0, len(rows), delete_batch_size):
+                ids = [row['id'] for row in rows[start:start + delete_batch_size]]
+                with transaction.atomic():
+                    # A report changed since it was read stays in the table
+                    queryset.filter(id__in=ids).delete()
+            kept = list(
+                Report.objects.filter(id__in=[row['id'] for row in rows]).values_list('response_id', flat=True)
+            )
+            if kept:
+                archive.forget(kept)
+            cache = get_resume_cache()
+            for row in rows:
+                cache.delete(row['response_id'])
+            moved += len(rows) - len(kept)
+    return moved
+
+
+def rehydrate_report(response_id, archive=None):
+    """
+    Put an archived report back in the table and return it, or return None
+    if it is not archived.
+    """
+    archive = archive or get_archive()
+    row = archive.find(response_id)
+    if row is None:
+        return None
+    report = report_from_row(row)
+    try:
+        with transaction.atomic(using='default'):
+            # A raw save keeps the archived created_at and updated_at
+            report.save_base(raw=True, force_insert=True, using='default')
+            sync_facets(
+                {field: getattr(report, field) for field in MULTI_VALUE_FIELDS}, report_id=report.pk
+            )
+    except IntegrityError:
+        # Rehydrated by a concurrent request
+        return Report.objects.using('default').filter(response_id=response_id).first()
+    archive.forget([response_id])
+    return report
@@ -0,0 +1,14 @@
+from django.urls import path
+
+from . import async_views
+
+# Async counterparts of the step, resume and submit actions; mounted under
+# api/async/ and meant to be served by an ASGI server
+urlpatterns = [
+    path('reports/<str:response_id>/resume/', async_views.resume, name='async-report-resume'),
+    path('reports/<str:response_id>/submit/', async_views.submit, name='async-report-submit'),
+    path(
+        'reports/<str:response_id>/<str:step_name>/', async_views.update_step,
+        name='async-report-step'
+    ),
+]
@@ -0,0 +1,202 @@
+"""
+Async versions of the report step, resume and submit endpoints.
+
+These are plain Django async views (DRF 3.14 has no async support) for use
+under an ASGI server, e.g.
+
+    gunicorn guard_api.asgi:application -k uvicorn.workers.UvicornWorker
+
+They share validation, the step engine and the resume cache with the DRF
+views in reports/views.py and return the same payloads. Writes that must be
+transactional (facet sync and the statistics rollup) are run
+in a worker thread with sync_to_async, as Django 4.2 has no async
+transactions; other step saves are awaited natively. Reports in the cold
+archive are put back in the table first, as by the DRF views.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+
+from .archive import rehydrate_report
+from .cache import get_resume_cache
+from .conditional import (
+    conditional_response, if_match_version, is_conditional, report_etag, set_validators
+)
+from .models import Report
+from .querysets import loaded_columns
+from .renderers import dumps, loads
+from .routing import aread_database, arecord_write
+from .serializers import ReportResumeSerializer
+from .submissions import enqueue_submission
+from .steps import (
+    STEPS_BY_NAME, VersionConflict, aapply_update, needs_transaction, saved_steps_queryset,
+    save_steps, step_update_values, submit_report
+)
+
+
+def json_response(data, status=200):
+    """
+    JsonResponse encoded like the DRF views' responses (see
+    reports/renderers.py).
+    """
+    return HttpResponse(dumps(data), content_type='application/json', status=status)
+
+
+def not_found():
+    return json_response({'detail': 'Report not found'}, status=404)
+
+
+def precondition_failed(conflict):
+    response = json_response({
+        'detail': 'The report has been changed since this version was loaded',
+        'version': conflict.version
+    }, status=412)
+    response['ETag'] = report_etag(conflict.version)
+    return response
+
+
+def method_not_allowed(request):
+    return json_response(
+        {'detail': f'Method "{request.method}" not allowed.'}, status=405
+    )
+
+
+def api_view(methods):
+    """
+    Restrict an async view to `methods` and exempt it from CSRF checks, as the
+    DRF views are for anonymous clients. (Django 4.2's own decorators wrap
+    async views in sync functions, so they cannot be used here.)
+    """
+    def decorator(view):
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return method_not_allowed(request)
+            return await view(request, *args, **kwargs)
+        wrapper.__name__ = view.__name__
+        wrapper.__doc__ = view.__doc__
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def parse_json(request):
+    """
+    Return the decoded JSON body, or None if it is not valid JSON.
+    """
+    if not request.body:
+        return {}
+    try:
+        return loads(request.body)
+    except ValueError:
+        return None
+
+
+async def asave_step(response_id, step, data, expected_version):
+    """
+    Save one validated step and return the saved report, or None if the
+    report is not in the table. May raise VersionConflict.
+    """
+    validated_steps = [(step, data)]
+    if needs_transaction(data):
+        # Facet rows or rollup counts are written in the same transaction
+        return await sync_to_async(save_steps)(response_id, validated_steps, expected_version)
+    if await aapply_update(response_id, step_update_values(validated_steps), expected_version):
+        # Read back without a transaction: if another write lands in
+        # between, its data and version are returned, as with any
+        # last-writer-wins save
+        return await saved_steps_queryset(response_id, [step]).afirst()
+    return None
+
+
+@api_view(['PATCH'])
+async def update_step(request, response_id, step_name):
+    """
+    Update one step of a report.
+    """
+    step = STEPS_BY_NAME.get(step_name)
+    if step is None:
+        return not_found()
+    data = parse_json(request)
+    if data is None:
+        return json_response({'detail': 'Invalid JSON'}, status=400)
+
+    serializer = step.serializer_class(data=data, partial=True)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=400)
+
+    data, expected_version = serializer.validated_data, if_match_version(request)
+    try:
+        report = await asave_step(response_id, step, data, expected_version)
+        if report is None and await sync_to_async(rehydrate_report)(response_id) is not None:
+            report = await asave_step(response_id, step, data, expected_version)
+    except VersionConflict as conflict:
+        return precondition_failed(conflict)
+    if report is None:
+        return not_found()
+
+    await get_resume_cache().adelete(response_id)
+    await arecord_write(response_id)
+    response = json_response({'version': report.version, **step.serializer_class(report).data})
+    response['ETag'] = report_etag(report.version)
+    return response
+
+
+@api_view(['GET'])
+async def resume(request, response_id):
+    """
+    Resume a report by its response_id, with its ETag and Last-Modified (or
+    304 Not Modified).
+    """
+    cache = get_resume_cache()
+    payload = await cache.aget(response_id)
+    if payload is None:
+        reports = Report.objects.using(await aread_database(response_id)).filter(
+            response_id=response_id
+        )
+        if is_conditional(request):
+            validators = await reports.values_list('version', 'updated_at').afirst()
+            if validators is not None:
+                response = conditional_response(request, *validators)
+                if response is not None:
+                    return response
+        try:
+            report = await reports.only(*loaded_columns(ReportResumeSerializer)).aget()
+        except Report.DoesNotExist:
+            report = await sync_to_async(rehydrate_report)(response_id)
+            if report is None:
+                return not_found()
+            await arecord_write(response_id)
+        payload = dict(ReportResumeSerializer(report).data)
+        await cache.aset(response_id, payload)
+    response = conditional_response(request, payload['version'], payload['updated_at'])
+    if response is None:
+        response = set_validators(json_response(payload), payload['version'], payload['updated_at'])
+    return response
+
+
+@api_view(['PATCH'])
+async def submit(request, response_id):
+    """
+    Submit the final report, or queue it when write-behind is enabled.
+    """
+    queued = await sync_to_async(enqueue_submission)(response_id)
+    if queued is None and await sync_to_async(rehydrate_report)(response_id) is not None:
+        queued = await sync_to_async(enqueue_submission)(response_id)
+    if queued is None:
+        return not_found()
+    if queued:
+        return json_response({
+            'message': 'Report accepted for submission',
+            'response_id': response_id
+        }, status=202)
+
+    submitted = await sync_to_async(submit_report)(response_id)
+    if not submitted and await sync_to_async(rehydrate_report)(response_id) is not None:
+        submitted = await sync_to_async(submit_report)(response_id)
+    if not submitted:
+        return not_found()
+    await get_resume_cache().adelete(response_id)
+    await arecord_write(response_id)
+    return json_response({
+        'message': 'Report submitted successfully',
+        'response_id': response_id
+    })
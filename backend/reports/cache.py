@@ -0,0 +1,213 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+DEFAULT_RESUME_CACHE = {
+    'BACKEND': 'reports.cache.DjangoResumeCache',
+    'OPTIONS': {},
+}
+
+# Django cache backends whose entries live in one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias):
+    """
+    Whether the Django cache `alias` is seen by every worker process, so a
+    delete in one worker reaches the others.
+    """
+    return settings.CACHES.get(alias, {}).get('BACKEND') not in (None, *PROCESS_LOCAL_CACHES)
+
+
+class ResumeCache:
+    """
+    Base class for caches of serialized resume payloads keyed by response_id.
+
+    Subclasses implement `_get`, `_set` and `_delete`; hit and miss counting
+    is done here so every backend reports the same stats.
+    """
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, response_id):
+        return self._count(self._get(response_id))
+
+    def set(self, response_id, payload):
+        self._set(response_id, payload)
+
+    def delete(self, response_id):
+        self._delete(response_id)
+
+    async def aget(self, response_id):
+        return self._count(await self._aget(response_id))
+
+    async def aset(self, response_id, payload):
+        await self._aset(response_id, payload)
+
+    async def adelete(self, response_id):
+        await self._adelete(response_id)
+
+    def _count(self, value):
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def stats(self):
+        """
+        Return hit/miss counters for this process.
+        """
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _get(self, response_id):
+        raise NotImplementedError
+
+    def _set(self, response_id, payload):
+        raise NotImplementedError
+
+    def _delete(self, response_id):
+        raise NotImplementedError
+
+    # The async variants default to the sync ones, which is right for
+    # backends that never block on I/O
+    async def _aget(self, response_id):
+        return self._get(response_id)
+
+    async def _aset(self, response_id, payload):
+        self._set(response_id, payload)
+
+    async def _adelete(self, response_id):
+        self._delete(response_id)
+
+
+class NullResumeCache(ResumeCache):
+    """
+    Caches nothing: every lookup is a miss and goes to the database.
+    """
+    def __init__(self, timeout=0, **options):
+        super().__init__(timeout=timeout)
+
+    def _get(self, response_id):
+        return None
+
+    def _set(self, response_id, payload):
+        pass
+
+    def _delete(self, response_id):
+        pass
+
+
+class LocMemResumeCache(ResumeCache):
+    """
+    In-process LRU cache with a per-entry TTL.
+
+    Each worker process has its own copy, so invalidations made by one worker
+    are not seen by the others, which would then serve stale payloads and
+    ETags. Only use it with a single worker process (e.g. runserver).
+    """
+    def __init__(self, max_entries=10000, timeout=30):
+        super().__init__(timeout=timeout)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, response_id):
+        with self._lock:
+            entry = self._entries.get(response_id)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self._entries[response_id]
+                return None
+            self._entries.move_to_end(response_id)
+            return payload
+
+    def _set(self, response_id, payload):
+        with self._lock:
+            self._entries[response_id] = (time.monotonic() + self.timeout, payload)
+            self._entries.move_to_end(response_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _delete(self, response_id):
+        with self._lock:
+            self._entries.pop(response_id, None)
+
+    def stats(self):
+        stats = super().stats()
+        stats['size'] = len(self._entries)
+        return stats
+
+
+class DjangoResumeCache(ResumeCache):
+    """
+    Resume cache stored in one of the Django CACHES backends, which must be
+    shared between the worker processes (e.g. Redis or Memcached).
+    """
+    def __init__(self, alias='default', timeout=30, key_prefix='reports:resume:'):
+        super().__init__(timeout=timeout)
+        self.alias = alias
+        self.key_prefix = key_prefix
+
+    @property
+    def _cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def _get(self, response_id):
+        return self._cache.get(self.key_prefix + response_id)
+
+    def _set(self, response_id, payload):
+        self._cache.set(self.key_prefix + response_id, payload, self.timeout)
+
+    def _delete(self, response_id):
+        self._cache.delete(self.key_prefix + response_id)
+
+    async def _aget(self, response_id):
+        return await self._cache.aget(self.key_prefix + response_id)
+
+    async def _aset(self, response_id, payload):
+        await self._cache.aset(self.key_prefix + response_id, payload, self.timeout)
+
+    async def _adelete(self, response_id):
+        await self._cache.adelete(self.key_prefix + response_id)
+
+
+_resume_cache = None
+
+
+def get_resume_cache():
+    """
+    Return the resume cache configured by the REPORTS_RESUME_CACHE setting.
+
+    A DjangoResumeCache over a process-local Django cache is replaced by a
+    NullResumeCache: with several workers it would serve stale payloads.
+    """
+    global _resume_cache
+    if _resume_cache is None:
+        config = getattr(settings, 'REPORTS_RESUME_CACHE', DEFAULT_RESUME_CACHE)
+        backend = import_string(config.get('BACKEND', DEFAULT_RESUME_CACHE['BACKEND']))
+        options = config.get('OPTIONS', {})
+        if issubclass(backend, DjangoResumeCache) and not is_shared_cache(options.get('alias', 'default')):
+            backend = NullResumeCache
+        _resume_cache = backend(**options)
+    return _resume_cache
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core import checks
+
+
+@checks.register()
+def check_action_columns(app_configs, **kwargs):
+    """
+    Make sure every ReportViewSet action can be given a deferred-column
+    queryset, so a serializer change never silently falls back to loading
+    every column (or to a lazy query per deferred field).
+    """
+    from .models import Report
+    from .querysets import UnmappedField, serializer_columns
+    from .views import ACTION_SERIALIZERS
+
+    errors = []
+    model_fields = {field.name for field in Report._meta.concrete_fields}
+    for action_name, serializer_class in ACTION_SERIALIZERS.items():
+        try:
+            columns = serializer_columns(serializer_class)
+        except UnmappedField as exc:
+            errors.append(checks.Warning(
+                f"The '{action_name}' action loads every Report column: {exc}",
+                hint="Map the field to a model column or list the columns it needs.",
+                obj=serializer_class,
+                id='reports.W001',
+            ))
+            continue
+        missing = set(columns) - model_fields
+        if missing:
+            errors.append(checks.Error(
+                f"The '{action_name}' action would load unknown columns: {sorted(missing)}",
+                obj=serializer_class,
+                id='reports.E001',
+            ))
+    return errors
+
+
+@checks.register(checks.Tags.security, deploy=True)
+def check_response_id_key(app_configs, **kwargs):
+    """
+    Make sure production does not derive response IDs from the development
+    key guard_api.settings falls back to under DEBUG.
+    """
+    from .response_ids import DEVELOPMENT_KEY_PREFIX
+
+    if getattr(settings, 'REPORTS_RESPONSE_ID_KEY', '').startswith(DEVELOPMENT_KEY_PREFIX):
+        return [checks.Error(
+            "REPORTS_RESPONSE_ID_KEY is the development key, so every response ID can be listed.",
+            hint="Set REPORTS_RESPONSE_ID_KEY to a secret kept out of the repository.",
+            id='reports.E002',
+        )]
+    return []
@@ -0,0 +1,83 @@
+"""
+HTTP validators for reports.
+
+A report's ETag is its `version` (see Report.version), which every step
+save and submission bumps. Step PATCHes return it, and clients send it back
+in If-Match so that a save based on an outdated copy of the report is
+refused with 412 Precondition Failed instead of overwriting newer answers.
+
+The GET endpoints (retrieve, resume) send the ETag and a Last-Modified from
+`updated_at`, and answer If-None-Match / If-Modified-Since with 304 Not
+Modified when the client's copy is current.
+"""
+import datetime
+import re
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+
+
+ETAG_RE = re.compile(r'^(?:W/)?"(\d+)"$')
+
+
+def report_etag(version):
+    return f'"{version}"'
+
+
+def if_match_version(request):
+    """
+    The version named by the request's If-Match header, or None when there
+    is no header or it is "*" (any current version).
+
+    A weak ETag (W/"3", as some proxies rewrite them) counts as its
+    version. Any other value (e.g. a list, or an ETag from elsewhere) gives
+    0, a version no report has, so the update fails its precondition.
+    """
+    value = request.headers.get('If-Match', '').strip()
+    if not value or value == '*':
+        return None
+    match = ETAG_RE.match(value)
+    return int(match.group(1)) if match else 0
+
+
+def last_modified(updated_at):
+    """
+    `updated_at` (a datetime, or as serialized in a cached payload) as a
+    timestamp; HTTP dates have one-second resolution.
+    """
+    if not isinstance(updated_at, datetime.datetime):
+        updated_at = parse_datetime(updated_at)
+    return int(updated_at.timestamp())
+
+
+def is_conditional(request):
+    return 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers
+
+
+def set_validators(response, version, updated_at, private=False):
+    """
+    Add the report's ETag and Last-Modified to a response. Caches may keep
+    it but must revalidate before reuse; `private` keeps it out of shared
+    caches, for payloads with personal details.
+    """
+    response['ETag'] = report_etag(version)
+    response['Last-Modified'] = http_date(last_modified(updated_at))
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional_response(request, version, updated_at, private=False):
+    """
+    304 Not Modified (or 412 for a failed If-Match) when the request's
+    validators match the report, otherwise None.
+    """
+    response = get_conditional_response(
+        request, etag=report_etag(version), last_modified=last_modified(updated_at)
+    )
+    if response is not None:
+        set_validators(response, version, updated_at, private)
+    return response
@@ -0,0 +1,145 @@
+"""
+Lifecycle of unsubmitted reports.
+
+Every visit to the form creates a draft Report, and most are never
+submitted. `reap_drafts` deletes drafts that have not been saved for longer
+than their time to live, which depends on how far they got: a draft left on
+the first step is abandoned much sooner than one left on the last.
+REPORTS_DRAFT_RETENTION['TTL_DAYS'] maps `current_step` to days;
+DEFAULT_TTL_DAYS covers the other steps, and None keeps those drafts.
+
+Drafts are deleted in batches of BATCH_SIZE, each in its own short
+transaction, so autosaves are never blocked for long. Optionally each batch
+is first appended to a gzip-compressed NDJSON archive.
+"""
+import datetime
+import gzip
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .cache import get_resume_cache
+from .models import Report
+from .renderers import dumps
+
+
+DEFAULT_DRAFT_RETENTION = {
+    # Days a draft on each step may go unsaved before it is reaped
+    'TTL_DAYS': {1: 2, 2: 7},
+    'DEFAULT_TTL_DAYS': 30,
+    'BATCH_SIZE': 500,
+    # Seconds to sleep between batches, leaving the database to autosaves
+    'PAUSE': 0.0,
+}
+
+
+def draft_retention_settings():
+    return {**DEFAULT_DRAFT_RETENTION, **getattr(settings, 'REPORTS_DRAFT_RETENTION', {})}
+
+
+def stale_drafts(now=None, using='default'):
+    """
+    Drafts past their time to live as of `now`.
+    """
+    config = draft_retention_settings()
+    now = now or timezone.now()
+    ttl_days = {int(step): days for step, days in config['TTL_DAYS'].items()}
+    default_days = config['DEFAULT_TTL_DAYS']
+
+    conditions = Q()
+    for step, days in ttl_days.items():
+        if days is not None:
+            conditions |= Q(current_step=step, updated_at__lt=now - datetime.timedelta(days=days))
+    if default_days is not None:
+        conditions |= (
+            ~Q(current_step__in=list(ttl_days))
+            & Q(updated_at__lt=now - datetime.timedelta(days=default_days))
+        )
+    if not conditions:
+        return Report.objects.using(using).none()
+    # A report is never saved before it is created, so the shortest TTL
+    # also bounds created_at, which the (is_submitted, created_at) index
+    # covers; updated_at is not indexed, as every step save changes it
+    shortest = min(days for days in [*ttl_days.values(), default_days] if days is not None)
+    return Report.objects.using(using).filter(
+        conditions, is_submitted=False, created_at__lt=now - datetime.timedelta(days=shortest)
+    )
+
+
+def stale_draft_counts(now=None, using='default'):
+    """
+    {current_step: number of stale drafts}, for a dry run.
+    """
+    counts = stale_drafts(now, using).values('current_step').annotate(count=Count('id')).order_by()
+    return {row['current_step']: row['count'] for row in counts}
+
+
+class DraftArchive:
+    """
+    Appends reaped drafts, one JSON object per line, to a gzip file. Each
+    run adds a gzip member, which gzip readers read as one stream.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, rows):
+        with gzip.open(self.path, 'ab') as f:
+            for row in rows:
+                f.write(dumps(row) + b'\n')
+
+
+def reap_batch(ids, now, using='default', archive=None):
+    """
+    Delete (and archive) the drafts among `ids` that are still stale, and
+    return how many were deleted. A draft saved since it was selected is
+    kept: the stale rows are locked until they are deleted or, on SQLite
+    (which cannot lock rows), a save committed after the transaction's
+    first read makes its writes fail instead of interleaving with them.
+    """
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        batch = stale_drafts(now, using).filter(id__in=ids)
+        if connection.features.has_select_for_update:
+            # Lock the rows so that a concurrent step save waits for the
+            # delete rather than being lost; rows already locked by one are
+            # skipped and looked at again next run
+            batch = batch.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        rows = list(batch.order_by('id').values() if archive is not None else batch.values('id', 'response_id'))
+        if not rows:
+            return 0
+        if archive is not None:
+            archive.write(rows)
+        _, deleted = Report.objects.using(using).filter(id__in=[row['id'] for row in rows]).delete()
+    cache = get_resume_cache()
+    for row in rows:
+        cache.delete(row['response_id'])
+    return deleted.get(Report._meta.label, 0)
+
+
+def reap_drafts(batch_size=None, pause=None, archive_path=None, limit=None, now=None, using='default'):
+    """
+    Delete every stale draft, batch by batch, and return how many were
+    deleted. `limit` stops after about that many.
+    """
+    config = draft_retention_settings()
+    batch_size = batch_size or config['BATCH_SIZE']
+    pause = config['PAUSE'] if pause is None else pause
+    now = now or timezone.now()
+    archive = DraftArchive(archive_path) if archive_path else None
+
+    reaped, last_id = 0, 0
+    while limit is None or reaped < limit:
+        ids = list(
+            stale_drafts(now, using).filter(id__gt=last_id)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        reaped += reap_batch(ids, now, using, archive)
+        last_id = ids[-1]
+        if pause:
+            time.sleep(pause)
+    return reaped
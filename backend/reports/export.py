@@ -0,0 +1,224 @@
+"""
+Streaming export of submitted, research-consented reports.
+
+Rows are read with a server-side cursor (`QuerySet.iterator`) and written out
+chunk by chunk, so memory use does not grow with the size of the table. The
+JSON list fields are flattened into one 0/1 column per distinct value, e.g.
+`incident_types__verbal`; the set of columns comes from the facet table.
+
+Reports moved to the cold archive are exported too: after the table rows,
+the archive is streamed block by block with the same filter.
+"""
+import csv
+import datetime
+
+from .archive import get_archive, report_from_row
+from .models import MULTI_VALUE_FIELDS, Report, ReportFacet, choice_values
+from .renderers import dumps
+
+
+# Direct identifiers are never part of a research export, nor is the
+# concurrency version. Nor is response_id: it is the key to the report on the
+# (anonymous) report API, which would show the identifiers and allow edits
+EXCLUDED_FIELDS = ('id', 'response_id', 'name', 'contact_email', 'contact_phone', 'version')
+
+SCALAR_FIELDS = tuple(
+    field.name for field in Report._meta.concrete_fields
+    if field.name not in EXCLUDED_FIELDS and field.name not in MULTI_VALUE_FIELDS
+)
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def export_queryset():
+    """
+    Reports that may be exported: submitted and with research consent.
+    """
+    return Report.objects.filter(is_submitted=True, research_consent=True).order_by('id')
+
+
+def archived_export_rows():
+    """
+    Archived reports that may be exported, as dicts like those from `values()`.
+    """
+    for row in get_archive().iter_rows():
+        report = report_from_row(row)
+        if report.is_submitted and report.research_consent:
+            yield {field: getattr(report, field) for field in SCALAR_FIELDS + MULTI_VALUE_FIELDS}
+
+
+def collect_vocabulary(queryset, archived_rows=()):
+    """
+    The distinct values of each multi-value field among the exported reports,
+    which become the flattened column names. Read from the facet table, and
+    from `archived_rows` for reports that are no longer in it.
+    """
+    vocabulary = {field: set() for field in MULTI_VALUE_FIELDS}
+    facets = ReportFacet.objects.using(queryset.db).filter(report__in=queryset.values('id'))
+    for field, value in facets.values_list('field', 'value').distinct().order_by():
+        vocabulary[field].add(value)
+    for row in archived_rows:
+        for field in MULTI_VALUE_FIELDS:
+            vocabulary[field].update(choice_values(row[field]))
+    return {field: sorted(values) for field, values in vocabulary.items()}
+
+
+class ReportFlattener:
+    """
+    Turns report rows (as dicts from `values()`) into flat rows with a fixed
+    column order.
+    """
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        self.columns = list(SCALAR_FIELDS)
+        for field in MULTI_VALUE_FIELDS:
+            self.columns += [f"{field}__{value}" for value in vocabulary[field]]
+
+    def flatten(self, row):
+        flat = {field: row[field] for field in SCALAR_FIELDS}
+        for field in MULTI_VALUE_FIELDS:
+            chosen = set(choice_values(row[field]))
+            for value in self.vocabulary[field]:
+                flat[f"{field}__{value}"] = int(value in chosen)
+        return flat
+
+
+def iter_flat_rows(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield the flattener (for its column list) and then each flattened row,
+    the table's first and then the archive's.
+
+    The archive is read twice, once for its choice values and once for the
+    rows, rather than held in memory.
+    """
+    queryset = export_queryset() if queryset is None else queryset
+    flattener = ReportFlattener(collect_vocabulary(queryset, archived_export_rows()))
+    yield flattener
+    fields = SCALAR_FIELDS + MULTI_VALUE_FIELDS
+    for row in queryset.values(*fields).iterator(chunk_size=chunk_size):
+        yield flattener.flatten(row)
+    for row in archived_export_rows():
+        yield flattener.flatten(row)
+
+
+def _text(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+class _LineBuffer:
+    """
+    File-like object for csv.writer that hands back each written line.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_chunks(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    rows = iter_flat_rows(queryset, chunk_size)
+    flattener = next(rows)
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(flattener.columns)
+    for row in rows:
+        yield writer.writerow([_text(row[column]) for column in flattener.columns])
+
+
+def ndjson_chunks(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    rows = iter_flat_rows(queryset, chunk_size)
+    next(rows)
+    for row in rows:
+        yield dumps({key: _text(value) for key, value in row.items()}) + b'\n'
+
+
+class _ParquetSink:
+    """
+    Write-only file object that collects what pyarrow writes so it can be
+    streamed out after each row group.
+    """
+    closed = False
+
+    def __init__(self):
+        self.buffer = []
+        self.position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self.buffer.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.buffer)
+        self.buffer = []
+        return data
+
+
+def _arrow_type(pa, field_name):
+    internal_type = Report._meta.get_field(field_name).get_internal_type()
+    return {
+        'BooleanField': pa.bool_(),
+        'IntegerField': pa.int32(),
+        'DateField': pa.date32(),
+        'DateTimeField': pa.timestamp('us', tz='UTC'),
+    }.get(internal_type, pa.string())
+
+
+def parquet_chunks(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream a Parquet file, one row group per chunk. Requires pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = iter_flat_rows(queryset, chunk_size)
+    flattener = next(rows)
+    schema = pa.schema(
+        [(field, _arrow_type(pa, field)) for field in SCALAR_FIELDS]
+        + [(column, pa.int8()) for column in flattener.columns[len(SCALAR_FIELDS):]]
+    )
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            batch = []
+            yield sink.drain()
+    if batch:
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    writer.close()
+    yield sink.drain()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_chunks(export_format, queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return a generator of str/bytes chunks for the given export format.
+    """
+    writers = {'csv': csv_chunks, 'ndjson': ndjson_chunks, 'parquet': parquet_chunks}
+    return writers[export_format](queryset, chunk_size)
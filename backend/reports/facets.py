@@ -0,0 +1,56 @@
+"""
+Keeps ReportFacet rows in step with the multi-value JSON fields on Report.
+
+The JSON columns stay the source of truth (the API reads and writes them as
+before); every write that touches one of them replaces that field's facet
+rows, so filters can use the indexed facet table instead of decoding JSON.
+"""
+from .models import MULTI_VALUE_FIELDS, Report, ReportFacet, choice_values
+
+
+# Query parameter accepted by the reports list API -> multi-value field
+FACET_FILTERS = {
+    'incident_type': 'incident_types',
+    'reporting_barrier': 'reporting_barriers',
+    'reported_to': 'reported_to',
+    'support_type': 'support_types',
+}
+
+
+def facet_rows(facet_model, report_id, values):
+    """
+    Build (unsaved) facet rows for one report from a dict of field values.
+    """
+    return [
+        facet_model(report_id=report_id, field=field, value=value)
+        for field in MULTI_VALUE_FIELDS if field in values
+        for value in choice_values(values[field])
+    ]
+
+
+def sync_facets(values, report_id=None, response_id=None):
+    """
+    Replace the facet rows of the multi-value fields present in `values`.
+
+    Identify the report by primary key or by response_id. Call inside the
+    transaction that writes the JSON columns.
+    """
+    fields = [field for field in MULTI_VALUE_FIELDS if field in values]
+    if not fields:
+        return
+    if report_id is None:
+        report_id = Report.objects.values_list('id', flat=True).get(response_id=response_id)
+    ReportFacet.objects.filter(report_id=report_id, field__in=fields).delete()
+    ReportFacet.objects.bulk_create(facet_rows(ReportFacet, report_id, values))
+
+
+def filter_by_facets(queryset, params):
+    """
+    Apply ?incident_type=...&support_type=... style filters as joins on the
+    facet table. Repeating a parameter requires all of the values.
+    """
+    for param, field in FACET_FILTERS.items():
+        for value in params.getlist(param):
+            queryset = queryset.filter(facets__field=field, facets__value=value)
+    return queryset
+
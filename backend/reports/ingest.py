@@ -0,0 +1,276 @@
+"""
+Bulk loading of reports from NDJSON or CSV files, or from the legacy Flask
+survey database.
+
+Records are streamed from the source, mapped onto Report fields, validated
+with ReportIngestSerializer and written with bulk_create, one transaction per
+batch. The same transaction advances an IngestCheckpoint row, so a run that
+is interrupted resumes after the last committed batch without skipping or
+repeating rows.
+"""
+import csv
+import json
+import re
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .facets import facet_rows
+from .models import MULTI_VALUE_FIELDS, IngestCheckpoint, Report, ReportFacet
+from .querysets import explicit_timestamps
+from .response_ids import allocate_response_ids, taken_response_ids
+from .serializers import ReportIngestSerializer
+from .steps import STEPS
+
+
+INGEST_FORMATS = ('ndjson', 'csv', 'legacy')
+
+DEFAULT_BATCH_SIZE = 2000
+
+REPORT_FIELDS = frozenset(field.name for field in Report._meta.concrete_fields) - {'id'}
+
+
+def ndjson_records(path, after=0):
+    """
+    Yield (line number, record) for each non-blank line after `after`. A line
+    that is not valid JSON is yielded as None.
+    """
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if number <= after or not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def csv_value(field, value):
+    """
+    Decode one CSV cell. Multi-value fields may hold a JSON list or
+    semicolon-separated values.
+    """
+    if field not in MULTI_VALUE_FIELDS:
+        return value
+    if value.startswith('['):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return [item.strip() for item in value.split(';') if item.strip()]
+
+
+def csv_records(path, after=0):
+    """
+    Yield (row number, record) for each data row after `after`. Empty cells
+    are left out so the model defaults apply.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        for number, row in enumerate(csv.DictReader(f), 1):
+            if number <= after:
+                continue
+            yield number, {
+                field: csv_value(field, value)
+                for field, value in row.items() if field and value != ''
+            }
+
+
+def question_field(text):
+    """
+    The Report field a legacy question's text names, e.g. "School board" ->
+    'school_board', or None.
+    """
+    name = re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+    return name if name in REPORT_FIELDS else None
+
+
+def legacy_record(answers, questions, mapping):
+    """
+    Map one legacy `Response.answers` JSON document onto Report fields.
+
+    Answer keys are resolved through `mapping` (answer key or question text ->
+    field), then as field names, then through the question's text. Keys that
+    resolve to nothing are dropped. Legacy responses were final, so the
+    report is marked submitted.
+    """
+    try:
+        answers = json.loads(answers)
+        if isinstance(answers, str):
+            # Some clients posted the answers already encoded as a string
+            answers = json.loads(answers)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(answers, dict):
+        return None
+
+    record = {}
+    for key, value in answers.items():
+        key = str(key)
+        text = questions.get(key)
+        field = mapping.get(key) or (key if key in REPORT_FIELDS else None)
+        if field is None and text is not None:
+            field = mapping.get(text) or question_field(text)
+        if field is not None:
+            record[field] = value
+    record['is_submitted'] = True
+    record['current_step'] = len(STEPS) + 1
+    return record
+
+
+def legacy_records(database_url, after=0, mapping=None, page_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield (Response.id, record) for each legacy response with an id above
+    `after`, reading the Flask tables a page at a time. Requires SQLAlchemy.
+    """
+    from sqlalchemy import create_engine, text
+
+    mapping = mapping or {}
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as conn:
+            questions = {
+                str(pk): question_text
+                for pk, question_text in conn.execute(text("SELECT id, question_text FROM question"))
+            }
+            last_id = after
+            while True:
+                rows = conn.execute(
+                    text("SELECT id, answers FROM response WHERE id > :last ORDER BY id LIMIT :limit"),
+                    {'last': last_id, 'limit': page_size},
+                ).all()
+                if not rows:
+                    break
+                for pk, answers in rows:
+                    yield pk, legacy_record(answers, questions, mapping)
+                last_id = rows[-1][0]
+    finally:
+        engine.dispose()
+
+
+class BatchWriter:
+    """
+    Validates records and writes them in batches, advancing `checkpoint`
+    with each one. `on_error(position, errors)` is called for every record
+    that is skipped.
+    """
+    def __init__(self, checkpoint, batch_size=DEFAULT_BATCH_SIZE, on_error=None):
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.on_error = on_error
+        self.serializer = ReportIngestSerializer()
+        self.ingested = 0
+        self.skipped = 0
+        self.submitted = 0
+
+    def validate(self, record):
+        if not isinstance(record, dict):
+            raise ValidationError({'non_field_errors': ['Record is not a JSON object']})
+        unknown = {key: ['Not a report field'] for key in record if key not in REPORT_FIELDS}
+        if unknown:
+            raise ValidationError(unknown)
+        return dict(self.serializer.run_validation(record))
+
+    def run(self, records):
+        """
+        Ingest every (position, record) pair; returns self for the counters.
+        """
+        batch, errors, position = [], [], None
+        for position, record in records:
+            try:
+                batch.append((position, self.validate(record)))
+            except ValidationError as exc:
+                errors.append((position, exc.detail))
+            if len(batch) + len(errors) >= self.batch_size:
+                self.write(batch, errors, position)
+                batch, errors = [], []
+        if position is not None and (batch or errors):
+            self.write(batch, errors, position)
+        return self
+
+    def write(self, batch, errors, position):
+        """
+        Write one batch of validated rows and move the checkpoint to
+        `position`, all in one transaction.
+        """
+        batch = self.drop_duplicates(batch, errors)
+        for error_position, detail in errors:
+            if self.on_error:
+                self.on_error(error_position, detail)
+
+        # Reserved outside the transaction, as the ID sequence is not
+        # rolled back with it
+        new_ids = iter(allocate_response_ids(sum(1 for _, v in batch if 'response_id' not in v)))
+        now = timezone.now()
+        reports = []
+        for _, values in batch:
+            if 'response_id' not in values:
+                values['response_id'] = next(new_ids)
+            values.setdefault('created_at', now)
+            values.setdefault('updated_at', values['created_at'])
+            reports.append(Report(**values))
+
+        with transaction.atomic():
+            with explicit_timestamps(Report):
+                Report.objects.bulk_create(reports, batch_size=self.batch_size)
+            if any(report.pk is None for report in reports):
+                # Backends that cannot return ids from a bulk insert
+                pks = dict(Report.objects.filter(
+                    response_id__in=[report.response_id for report in reports]
+                ).values_list('response_id', 'id'))
+                for report in reports:
+                    report.pk = pks[report.response_id]
+            ReportFacet.objects.bulk_create([
+                facet
+                for report, (_, values) in zip(reports, batch)
+                for facet in facet_rows(ReportFacet, report.pk, values)
+            ], batch_size=self.batch_size)
+
+            self.checkpoint.position = position
+            self.checkpoint.ingested += len(reports)
+            self.checkpoint.skipped += len(errors)
+            self.checkpoint.save()
+
+        self.ingested += len(reports)
+        self.skipped += len(errors)
+        self.submitted += sum(1 for report in reports if report.is_submitted)
+
+    def drop_duplicates(self, batch, errors):
+        """
+        Move rows whose response_id already exists (in the table, in the cold
+        archive or earlier in the batch) to `errors`, so one duplicate cannot
+        fail the batch, nor the later rehydration of an archived report.
+        """
+        given = [values['response_id'] for _, values in batch if 'response_id' in values]
+        if not given:
+            return batch
+        seen = taken_response_ids(given)
+        kept = []
+        for position, values in batch:
+            response_id = values.get('response_id')
+            if response_id is not None and response_id in seen:
+                errors.append((position, {'response_id': ['Report with this response_id already exists']}))
+                continue
+            if response_id is not None:
+                seen.add(response_id)
+            kept.append((position, values))
+        return kept
+
+
+def open_source(source_format, source, after=0, mapping=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Return the (position, record) iterator for a source, starting after the
+    checkpointed `after` position.
+    """
+    if source_format == 'ndjson':
+        return ndjson_records(source, after)
+    if source_format == 'csv':
+        return csv_records(source, after)
+    return legacy_records(source, after, mapping, page_size=batch_size)
+
+
+def get_checkpoint(source_name, restart=False):
+    if restart:
+        IngestCheckpoint.objects.filter(source=source_name).delete()
+    checkpoint, _ = IngestCheckpoint.objects.get_or_create(source=source_name)
+    return checkpoint
@@ -0,0 +1,325 @@
+"""
+Per-view request instrumentation.
+
+InstrumentationMiddleware times every request and records, per view and
+action (e.g. "ReportViewSet.incident_details"), histograms of wall time,
+database query count and time, serializer time and response size. The
+metrics are kept in memory per process and served by /api/metrics/ as
+Prometheus text or JSON.
+
+Views can declare `query_budgets`, the most queries each action may run.
+With REPORTS_INSTRUMENTATION['ENFORCE_QUERY_BUDGETS'] (as set by
+`manage.py check_query_budgets`) a request that goes over its budget raises
+QueryBudgetExceeded, so a change that adds a query to a hot path fails.
+
+Queries made while a streaming response is consumed (the export) happen
+after the view returns and are not counted.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import permissions
+from rest_framework.fields import empty
+
+
+DEFAULT_INSTRUMENTATION = {
+    'ENABLED': False,
+    'ENFORCE_QUERY_BUDGETS': False,
+    # Bearer token that may read /api/metrics/ without logging in as staff
+    'METRICS_TOKEN': None,
+}
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34)
+BYTES_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152)
+
+# (name, help, buckets) of each per-view histogram
+HISTOGRAMS = (
+    ('request_duration_seconds', "Wall time of requests", SECONDS_BUCKETS),
+    ('db_queries', "Database queries per request", QUERY_BUCKETS),
+    ('db_duration_seconds', "Time spent in database queries per request", SECONDS_BUCKETS),
+    ('serializer_duration_seconds', "Time spent serializing and validating per request", SECONDS_BUCKETS),
+    ('response_bytes', "Size of response bodies (streamed responses excluded)", BYTES_BUCKETS),
+)
+
+_sample = ContextVar('reports_instrumentation_sample', default=None)
+
+
+def instrumentation_settings():
+    return {**DEFAULT_INSTRUMENTATION, **getattr(settings, 'REPORTS_INSTRUMENTATION', {})}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    A request ran more queries than its view's budget allows.
+    """
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        (upper bound, count of observations <= bound) pairs, ending with +Inf.
+        """
+        total, pairs = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.statuses = {}
+        self.histograms = {name: Histogram(buckets) for name, _, buckets in HISTOGRAMS}
+
+
+class Registry:
+    """
+    The metrics of this process, by view label.
+    """
+    def __init__(self):
+        self.views = {}
+        self._lock = threading.Lock()
+
+    def record(self, label, status, observations):
+        with self._lock:
+            metrics = self.views.get(label)
+            if metrics is None:
+                metrics = self.views[label] = ViewMetrics()
+            status_class = f'{status // 100}xx'
+            metrics.statuses[status_class] = metrics.statuses.get(status_class, 0) + 1
+            for name, value in observations.items():
+                metrics.histograms[name].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.views = {}
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                label: {
+                    'requests': metrics.statuses.copy(),
+                    **{
+                        name: {
+                            'count': histogram.count,
+                            'sum': histogram.sum,
+                            'buckets': {
+                                ('+Inf' if bound == float('inf') else str(bound)): count
+                                for bound, count in histogram.cumulative()
+                            },
+                        }
+                        for name, histogram in metrics.histograms.items()
+                    },
+                }
+                for label, metrics in sorted(self.views.items())
+            }
+
+    def prometheus(self, prefix='guard_'):
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        views = self.as_dict()
+        lines = [
+            f'# HELP {prefix}requests_total Requests by view and status class',
+            f'# TYPE {prefix}requests_total counter',
+        ]
+        for label, metrics in views.items():
+            for status_class, count in sorted(metrics['requests'].items()):
+                lines.append(f'{prefix}requests_total{{view="{label}",status="{status_class}"}} {count}')
+        for name, description, _ in HISTOGRAMS:
+            lines += [f'# HELP {prefix}{name} {description}', f'# TYPE {prefix}{name} histogram']
+            for label, metrics in views.items():
+                histogram = metrics[name]
+                for bound, count in histogram['buckets'].items():
+                    lines.append(f'{prefix}{name}_bucket{{view="{label}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}{name}_sum{{view="{label}"}} {histogram["sum"]}')
+                lines.append(f'{prefix}{name}_count{{view="{label}"}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def prometheus_stats(name, stats, prefix='guard_'):
+    """
+    Prometheus gauges for the numbers in a flat stats dict, such as
+    ResumeCache.stats() or WriteBehindQueue.stats().
+    """
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, (bool, int, float)):
+            metric = f'{prefix}{name}_{key}'
+            lines += [f'# TYPE {metric} gauge', f'{metric} {float(value)}']
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+class MetricsPermission(permissions.BasePermission):
+    """
+    Staff users, or requests with an `Authorization: Bearer <token>` header
+    carrying REPORTS_INSTRUMENTATION['METRICS_TOKEN'] (e.g. a Prometheus
+    scraper). The client address is not trusted: behind a proxy every
+    request comes from 127.0.0.1.
+    """
+    def has_permission(self, request, view):
+        token = instrumentation_settings()['METRICS_TOKEN']
+        scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if token and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.encode(), token.encode()):
+            return True
+        return bool(request.user and request.user.is_staff)
+
+
+class Sample:
+    """
+    Measurements of one request; also the execute wrapper counting its
+    queries.
+    """
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+    def track_queries(self):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+
+def record_serializer_time(seconds):
+    sample = _sample.get()
+    if sample is not None:
+        sample.serializer_seconds += seconds
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin adding the time spent in to_representation and
+    run_validation to the current request's sample.
+    """
+    def to_representation(self, instance):
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            record_serializer_time(time.perf_counter() - start)
+
+    def run_validation(self, data=empty):
+        start = time.perf_counter()
+        try:
+            return super().run_validation(data)
+        finally:
+            record_serializer_time(time.perf_counter() - start)
+
+
+def resolve_view(match, method):
+    """
+    The view class (or function) and action (the HTTP method for views that
+    are not viewsets) behind a ResolverMatch, and its metrics label, e.g.
+    "ReportViewSet.resume" or "async_views.update_step".
+    """
+    if match is None:
+        return None, None, 'unmatched'
+    func = match.func
+    method = method.lower()
+    view = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    if view is None:
+        return func, method, f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+    action_name = (getattr(func, 'actions', None) or {}).get(method, method)
+    return view, action_name, f'{view.__name__}.{action_name}'
+
+
+def query_budget(view, action_name):
+    """
+    The most queries the action may run, from the view's `query_budgets`.
+    """
+    return getattr(view, 'query_budgets', {}).get(action_name)
+
+
+class InstrumentationMiddleware:
+    """
+    Record per-view metrics for every request (see the module docstring).
+    Works under WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = instrumentation_settings()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.enforce_budgets = config['ENFORCE_QUERY_BUDGETS']
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample, token, start = self.start()
+        try:
+            with sample.track_queries():
+                response = self.get_response(request)
+        finally:
+            _sample.reset(token)
+        return self.finish(request, response, sample, start)
+
+    async def __acall__(self, request):
+        sample, token, start = self.start()
+        try:
+            with sample.track_queries():
+                response = await self.get_response(request)
+        finally:
+            _sample.reset(token)
+        return self.finish(request, response, sample, start)
+
+    def start(self):
+        sample = Sample()
+        return sample, _sample.set(sample), time.perf_counter()
+
+    def finish(self, request, response, sample, start):
+        view, action_name, label = resolve_view(getattr(request, 'resolver_match', None), request.method)
+        observations = {
+            'request_duration_seconds': time.perf_counter() - start,
+            'db_queries': sample.queries,
+            'db_duration_seconds': sample.db_seconds,
+            'serializer_duration_seconds': sample.serializer_seconds,
+        }
+        if not response.streaming:
+            observations['response_bytes'] = len(response.content)
+        registry.record(label, response.status_code, observations)
+
+        if self.enforce_budgets and action_name is not None:
+            budget = query_budget(view, action_name)
+            if budget is not None and sample.queries > budget:
+                raise QueryBudgetExceeded(
+                    f"{label} ran {sample.queries} queries; its budget is {budget}"
+                )
+        return response
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from reports.archive import archivable_reports, archive_reports, get_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move submitted reports older than REPORTS_ARCHIVE['AGE_DAYS'] out of the reports "
+        "table into compressed archive segments. They are put back when requested by ID."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--age-days', type=int, help="Override REPORTS_ARCHIVE['AGE_DAYS']")
+        parser.add_argument('--limit', type=int, help="Move at most this many reports")
+        parser.add_argument(
+            '--dry-run', action='store_true', help="Only count the reports that would be moved"
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_reports(age_days=options['age_days']).count()
+            self.stdout.write(f"{count} reports would be archived")
+            return
+        archive = get_archive()
+        moved = archive_reports(age_days=options['age_days'], limit=options['limit'], archive=archive)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} reports to {archive.path} ({archive.count()} archived in total)"
+        ))
@@ -0,0 +1,117 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import resolve
+
+from reports.cache import get_resume_cache
+from reports.instrumentation import (
+    QueryBudgetExceeded, instrumentation_settings, query_budget, registry, resolve_view
+)
+from reports.steps import STEPS
+
+
+# Valid data for each form step, filling in its multi-value fields so the
+# facet rows are written too
+STEP_DATA = {
+    'before_you_begin': {'reported_officially': 'no', 'research_consent': True},
+    'personal_info': {'anonymous': True, 'role': 'student', 'school_board': 'Peel District School Board'},
+    'incident_details': {
+        'incident_description': 'Comments in the hallway', 'incident_types': ['verbal', 'cyber'],
+        'incident_date': '2024-03-01',
+    },
+    'reporting_response': {'reported': 'yes', 'reporting_barriers': ['fear'], 'reported_to': ['Teacher']},
+    'school_response': {'school_response': 'Nothing happened', 'response_satisfaction': 'unsatisfied'},
+    'impact_support': {'impact_description': 'Missed classes', 'support_types': ['family']},
+    'additional_info': {'additional_info': 'None', 'contact_permission': False},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run each report API action once against a test database with query budgets "
+        "enforced, print the queries each ran, and fail if any went over budget."
+    )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            with override_settings(
+                REPORTS_INSTRUMENTATION={**instrumentation_settings(), 'ENABLED': True, 'ENFORCE_QUERY_BUDGETS': True},
+                REPORTS_WRITE_BEHIND={'ENABLED': False},
+                REPORTS_READ_REPLICAS={'ALIASES': []},
+            ):
+                results = self.run_actions()
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'view':<36}{'request':<28}{'status':>7}{'queries':>9}{'budget':>8}")
+        failures = []
+        for label, description, status_code, queries, budget, error in results:
+            self.stdout.write(
+                f"{label:<36}{description:<28}{status_code:>7}{queries:>9}{'-' if budget is None else budget:>8}"
+            )
+            if error:
+                failures.append(f"{label} ({description}): {error}")
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} requests within their query budgets"))
+
+    def run_actions(self):
+        """
+        Drive one report through the API: create it, save each step with and
+        without If-Match, batch, read it back every way, and submit it.
+
+        Queries are counted as the middleware counts them (transaction
+        control statements are not queries), from the registry's totals.
+        """
+        client = Client()
+        results = []
+
+        def total_queries(label):
+            metrics = registry.views.get(label)
+            return metrics.histograms['db_queries'].sum if metrics else 0
+
+        def request(method, path, description, data=None, **headers):
+            view, action_name, label = resolve_view(resolve(path.split('?')[0]), method)
+            before = total_queries(label)
+            try:
+                response = getattr(client, method)(path, data, content_type='application/json', headers=headers)
+            except QueryBudgetExceeded as exc:
+                response, status_code, error = None, '-', str(exc)
+            else:
+                status_code = response.status_code
+                error = None if status_code < 400 else f"status {status_code}"
+            results.append((
+                label, description, status_code, total_queries(label) - before,
+                query_budget(view, action_name), error,
+            ))
+            return response
+
+        response_id = request('post', '/api/reports/', 'create', {}).json()['response_id']
+        report = f'/api/reports/{response_id}'
+        version = 1
+        for step in STEPS:
+            version = request('patch', f'{report}/{step.name}/', 'save', STEP_DATA[step.name]).json()['version']
+            request('patch', f'{report}/{step.name}/', 'save with If-Match', STEP_DATA[step.name], if_match=f'"{version}"')
+            version += 1
+        request('post', f'{report}/batch/', 'two steps', {
+            'personal_info': STEP_DATA['personal_info'], 'incident_details': STEP_DATA['incident_details'],
+        })
+
+        get_resume_cache().delete(response_id)
+        etag = request('get', f'{report}/resume/', 'uncached')['ETag']
+        request('get', f'{report}/resume/', 'cached')
+        get_resume_cache().delete(response_id)
+        request('get', f'{report}/resume/', 'uncached, If-None-Match', if_none_match=etag)
+        request('get', f'/api/resume/{response_id}/', 'uncached')
+        request('get', f'{report}/', 'full report')
+        request('get', f'{report}/', 'If-None-Match', if_none_match=etag)
+        request('get', '/api/reports/', 'first page')
+        request('get', '/api/reports/?incident_type=verbal', 'facet filter')
+        request('patch', f'{report}/submit/', 'first submission')
+        request('get', '/api/stats/', 'all months')
+        return results
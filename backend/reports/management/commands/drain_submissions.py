@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from guard_common.write_behind import DrainBusy
+from reports.submissions import get_submission_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply every report submission waiting in the write-behind queue, e.g. "
+        "to replay the queue after a crash."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=30,
+            help="Seconds to wait while a web worker is draining the queue (default: 30)",
+        )
+
+    def handle(self, *args, **options):
+        queue = get_submission_queue()
+        if queue is None:
+            raise CommandError("Write-behind is disabled (REPORTS_WRITE_BEHIND['ENABLED'])")
+        try:
+            applied = queue.drain(timeout=options['timeout'])
+        except DrainBusy as exc:
+            raise CommandError(f"{exc}; it applies the queued submissions itself")
+        stats = queue.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {applied} queued submissions; {stats['dead_lettered']} moved to dead_letter"
+        ))
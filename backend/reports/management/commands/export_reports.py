@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.export import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, export_chunks, parquet_available
+
+
+class Command(BaseCommand):
+    help = "Export submitted, research-consented reports as CSV, NDJSON or Parquet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument(
+            '--output', '-o',
+            help="File to write to (defaults to stdout for CSV and NDJSON)",
+        )
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        export_format = options['format']
+        if export_format == 'parquet':
+            if not parquet_available():
+                raise CommandError("Parquet export requires pyarrow")
+            if not options['output']:
+                raise CommandError("Parquet export needs --output")
+
+        chunks = export_chunks(export_format, chunk_size=options['chunk_size'])
+        # CSV is written as text, NDJSON and Parquet as bytes
+        binary = export_format != 'csv'
+        if options['output']:
+            mode, kwargs = ('wb', {}) if binary else ('w', {'newline': '', 'encoding': 'utf-8'})
+            with open(options['output'], mode, **kwargs) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            stream = sys.stdout.buffer if binary else sys.stdout
+            for chunk in chunks:
+                stream.write(chunk)
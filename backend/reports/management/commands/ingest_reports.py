@@ -0,0 +1,105 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.ingest import (
+    DEFAULT_BATCH_SIZE, INGEST_FORMATS, BatchWriter, get_checkpoint, open_source
+)
+from reports.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load reports from an NDJSON or CSV file, or from the legacy Flask "
+        "survey database. Interrupted runs resume from their checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source', nargs='?',
+            help="File to read, or a SQLAlchemy database URL for --format legacy "
+                 "(defaults to the Flask app's database)",
+        )
+        parser.add_argument(
+            '--format', choices=INGEST_FORMATS,
+            help="Source format (guessed from the file extension if omitted)",
+        )
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help="Checkpoint name (defaults to one derived from the source)",
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help="Ignore any saved checkpoint and start from the beginning",
+        )
+        parser.add_argument(
+            '--mapping',
+            help="JSON file mapping legacy answer keys or question texts to Report fields",
+        )
+        parser.add_argument('--errors', help="Write skipped records as NDJSON to this file")
+        parser.add_argument(
+            '--skip-stats', action='store_true',
+            help="Do not rebuild the statistics tables afterwards",
+        )
+
+    def handle(self, *args, **options):
+        source_format, source, source_name = self.resolve_source(options)
+        mapping = {}
+        if options['mapping']:
+            with open(options['mapping'], encoding='utf-8') as f:
+                mapping = json.load(f)
+
+        checkpoint = get_checkpoint(options['checkpoint'] or source_name, options['restart'])
+        if checkpoint.position:
+            self.stdout.write(f"Resuming {checkpoint.source} after position {checkpoint.position}")
+
+        errors_file = open(options['errors'], 'a', encoding='utf-8') if options['errors'] else None
+
+        def on_error(position, detail):
+            if errors_file:
+                errors_file.write(json.dumps({'position': position, 'errors': detail}) + '\n')
+
+        try:
+            records = open_source(
+                source_format, source, checkpoint.position, mapping, options['batch_size']
+            )
+            writer = BatchWriter(checkpoint, options['batch_size'], on_error).run(records)
+        finally:
+            if errors_file:
+                errors_file.close()
+
+        if writer.submitted and not options['skip_stats']:
+            rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {writer.ingested} reports, skipped {writer.skipped} "
+            f"({checkpoint.ingested} ingested in total from {checkpoint.source})"
+        ))
+
+    def resolve_source(self, options):
+        """
+        Return (format, source, default checkpoint name).
+        """
+        source, source_format = options['source'], options['format']
+        if source_format is None:
+            if source is None:
+                raise CommandError("Give a source file, or --format legacy")
+            extension = os.path.splitext(source)[1].lower().lstrip('.')
+            source_format = {'jsonl': 'ndjson', 'ndjson': 'ndjson', 'csv': 'csv'}.get(extension)
+            if source_format is None:
+                raise CommandError("Cannot tell the format from the file name; use --format")
+
+        if source_format == 'legacy':
+            if source is None:
+                from config import Config
+                source = Config.SQLALCHEMY_DATABASE_URI
+            try:
+                from sqlalchemy.engine import make_url
+            except ImportError:
+                raise CommandError("Ingesting the legacy database requires SQLAlchemy")
+            return source_format, source, f"legacy:{make_url(source).render_as_string(hide_password=True)}"
+
+        if source is None or not os.path.exists(source):
+            raise CommandError(f"No such file: {source}")
+        return source_format, source, f"{source_format}:{os.path.abspath(source)}"
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from reports.partitioning import apply_plan, partition_plan
+
+
+class Command(BaseCommand):
+    help = (
+        "Partition the reports table by is_submitted and month on PostgreSQL, or add the "
+        "coming months' partitions to an already partitioned table. Prints the SQL unless "
+        "--apply is given; see reports/partitioning.py for the trade-offs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument('--apply', action='store_true', help="Run the SQL instead of printing it")
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError("Partitioning is only supported on PostgreSQL")
+        statements, converting = partition_plan(connection, options['months_ahead'])
+        if not options['apply']:
+            for sql in statements:
+                self.stdout.write(f"{sql};")
+            return
+        apply_plan(connection, statements, converting)
+        if converting:
+            self.stdout.write(self.style.SUCCESS("Partitioned the reports table"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Checked the submitted report partitions for the next {options['months_ahead']} months"
+            ))
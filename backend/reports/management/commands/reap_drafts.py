@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from reports.drafts import draft_retention_settings, reap_drafts, stale_draft_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete unsubmitted reports that have not been saved within their time to live "
+        "(REPORTS_DRAFT_RETENTION), in small batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Drafts deleted per transaction")
+        parser.add_argument('--pause', type=float, help="Seconds to sleep between batches")
+        parser.add_argument('--limit', type=int, help="Stop after about this many drafts")
+        parser.add_argument(
+            '--archive', metavar='PATH',
+            help="Append the deleted drafts to this gzip-compressed NDJSON file first",
+        )
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--dry-run', action='store_true', help="Only count the stale drafts on each step"
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            counts = stale_draft_counts(using=options['database'])
+            config = draft_retention_settings()
+            for step, count in sorted(counts.items()):
+                days = config['TTL_DAYS'].get(step, config['DEFAULT_TTL_DAYS'])
+                self.stdout.write(f"Step {step} (TTL {days} days): {count} stale drafts")
+            self.stdout.write(f"{sum(counts.values())} drafts would be deleted")
+            return
+        reaped = reap_drafts(
+            batch_size=options['batch_size'], pause=options['pause'], archive_path=options['archive'],
+            limit=options['limit'], using=options['database'],
+        )
+        message = f"Deleted {reaped} stale drafts"
+        if options['archive'] and reaped:
+            message += f" (archived to {options['archive']})"
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reports.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the ReportStat rollup table from all submitted reports."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rows = rebuild_stats(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics: {rows} rollup rows"))
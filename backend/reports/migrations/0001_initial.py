@@ -0,0 +1,59 @@
+# Generated by Django 4.2.10 on 2026-10-18 02:34
+
+from django.db import migrations, models
+import reports.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Report',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('response_id', models.CharField(default=reports.models.generate_response_id, editable=False, max_length=8, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_submitted', models.BooleanField(default=False)),
+                ('current_step', models.IntegerField(default=1)),
+                ('reported_officially', models.CharField(blank=True, max_length=100, null=True)),
+                ('research_consent', models.BooleanField(default=False)),
+                ('name', models.CharField(blank=True, max_length=255, null=True)),
+                ('anonymous', models.BooleanField(default=True)),
+                ('role', models.CharField(blank=True, max_length=50, null=True)),
+                ('student_grade', models.CharField(blank=True, max_length=50, null=True)),
+                ('staff_role', models.CharField(blank=True, max_length=50, null=True)),
+                ('child_grade', models.CharField(blank=True, max_length=50, null=True)),
+                ('role_other', models.CharField(blank=True, max_length=255, null=True)),
+                ('school_board', models.CharField(blank=True, max_length=255, null=True)),
+                ('board_other', models.CharField(blank=True, max_length=255, null=True)),
+                ('school_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('incident_description', models.TextField(blank=True, null=True)),
+                ('incident_date', models.DateField(blank=True, null=True)),
+                ('incident_types', models.JSONField(blank=True, null=True)),
+                ('reported', models.CharField(blank=True, max_length=10, null=True)),
+                ('reporting_barriers', models.JSONField(blank=True, null=True)),
+                ('reported_to', models.JSONField(blank=True, null=True)),
+                ('report_reason', models.TextField(blank=True, null=True)),
+                ('school_response', models.TextField(blank=True, null=True)),
+                ('response_satisfaction', models.CharField(blank=True, max_length=50, null=True)),
+                ('response_satisfaction_reason', models.TextField(blank=True, null=True)),
+                ('impact_description', models.TextField(blank=True, null=True)),
+                ('support_received', models.CharField(blank=True, max_length=10, null=True)),
+                ('support_types', models.JSONField(blank=True, null=True)),
+                ('additional_support_needed', models.TextField(blank=True, null=True)),
+                ('additional_info', models.TextField(blank=True, null=True)),
+                ('contact_permission', models.BooleanField(default=False)),
+                ('contact_email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('contact_phone', models.CharField(blank=True, max_length=20, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.10 on 2026-10-18 02:34
+
+from django.db import migrations, models
+
+
+# A copy of the index as reports.search defined it when this migration was
+# written, so later changes to that module don't change the migration
+FTS_TABLE = 'reports_report_fts'
+TRGM_INDEX = 'report_incident_desc_trgm'
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON reports_report BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, incident_description)
+            VALUES (new.id, new.incident_description);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON reports_report BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, incident_description)
+            VALUES ('delete', old.id, old.incident_description);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF incident_description ON reports_report BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, incident_description)
+            VALUES ('delete', old.id, old.incident_description);
+            INSERT INTO {FTS_TABLE}(rowid, incident_description)
+            VALUES (new.id, new.incident_description);
+        END
+    """,
+}
+
+
+def sqlite_has_fts5(cursor):
+    cursor.execute("PRAGMA compile_options")
+    return any('ENABLE_FTS5' in row[0] for row in cursor.fetchall())
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON reports_report "
+                f"USING gin (incident_description gin_trgm_ops)"
+            )
+        elif connection.vendor == 'sqlite' and sqlite_has_fts5(cursor):
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"incident_description, content='reports_report', content_rowid='id')"
+            )
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {TRGM_INDEX}")
+        elif connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['created_at'], name='report_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['is_submitted', 'created_at'], name='report_submitted_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['school_board'], name='report_school_board_idx'),
+        ),
+        # pg_trgm GIN index on PostgreSQL, FTS5 table and triggers on SQLite
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.10 on 2026-10-18 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('school_board', 'School board'), ('incident_type', 'Incident type'), ('role', 'Role')], max_length=20)),
+                ('value', models.CharField(blank=True, default='', max_length=255)),
+                ('month', models.DateField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reportstat',
+            constraint=models.UniqueConstraint(fields=('dimension', 'month', 'value'), name='reportstat_dimension_month_value_uniq'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.10 on 2026-10-18 02:37
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The multi-value fields and their normalization (reports.models.choice_values)
+# as they were when this migration was written
+MULTI_VALUE_FIELDS = ('incident_types', 'reporting_barriers', 'reported_to', 'support_types')
+
+
+def choice_values(value):
+    if value is None or value == '':
+        return []
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    return sorted({
+        item if isinstance(item, str) else json.dumps(item, sort_keys=True)
+        for item in value
+    })
+
+
+def populate_facets(apps, schema_editor, batch_size=2000):
+    """
+    Build the facet rows of the existing reports from their JSON columns.
+    """
+    Report = apps.get_model('reports', 'Report')
+    ReportFacet = apps.get_model('reports', 'ReportFacet')
+    rows = Report.objects.order_by('id').values_list('id', *MULTI_VALUE_FIELDS)
+    batch = []
+    for report_id, *values in rows.iterator(chunk_size=batch_size):
+        batch.extend(
+            ReportFacet(report_id=report_id, field=field, value=value[:255])
+            for field, field_value in zip(MULTI_VALUE_FIELDS, values)
+            for value in choice_values(field_value)
+        )
+        if len(batch) >= batch_size:
+            ReportFacet.objects.bulk_create(batch, batch_size=batch_size, ignore_conflicts=True)
+            batch = []
+    ReportFacet.objects.bulk_create(batch, batch_size=batch_size, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_reportstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('incident_types', 'incident_types'), ('reporting_barriers', 'reporting_barriers'), ('reported_to', 'reported_to'), ('support_types', 'support_types')], max_length=30)),
+                ('value', models.CharField(max_length=255)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='reports.report')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['report', 'field'], name='reportfacet_report_field_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportfacet',
+            constraint=models.UniqueConstraint(fields=('field', 'value', 'report'), name='reportfacet_field_value_report_uniq'),
+        ),
+        migrations.RunPython(populate_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.10 on 2026-10-18 02:44
+
+from django.db import migrations, models
+
+
+# reports.response_ids.PG_SEQUENCE
+PG_SEQUENCE = 'reports_response_id_seq'
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {PG_SEQUENCE}")
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {PG_SEQUENCE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0005_report_created_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponseIdSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        # PostgreSQL reserves response_id numbers from a native sequence
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0007_ingestcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
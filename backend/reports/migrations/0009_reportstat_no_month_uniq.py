@@ -0,0 +1,35 @@
+# Generated by Django 4.2.10 on 2026-10-18 03:30
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_no_month_rows(apps, schema_editor):
+    """
+    Fold duplicate rollup rows without a month into one, so the constraint
+    can be added.
+    """
+    ReportStat = apps.get_model('reports', 'ReportStat')
+    rows = ReportStat.objects.using(schema_editor.connection.alias).filter(month__isnull=True)
+    duplicates = rows.values('dimension', 'value').annotate(
+        keep=Min('id'), total=Sum('count'), n=Count('id')
+    ).filter(n__gt=1).order_by()
+    for duplicate in duplicates:
+        group = rows.filter(dimension=duplicate['dimension'], value=duplicate['value'])
+        group.exclude(id=duplicate['keep']).delete()
+        group.update(count=duplicate['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0008_report_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_no_month_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reportstat',
+            constraint=models.UniqueConstraint(condition=models.Q(('month__isnull', True)), fields=('dimension', 'value'), name='reportstat_dimension_value_no_month_uniq'),
+        ),
+    ]
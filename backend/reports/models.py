@@ -1,11 +1,48 @@
+from django.core.exceptions import ValidationError
 from django.db import models
-import shortuuid
 import datetime
+import json
 
 
 def generate_response_id():
-    """Generate a short unique ID for the report"""
-    return shortuuid.ShortUUID().random(length=8)
+    """Allocate a new unique ID for the report (see reports/response_ids.py)"""
+    from .response_ids import next_response_id
+    return next_response_id()
+
+
+# JSONFields on Report that hold a list of choices; each chosen value is also
+# stored as a ReportFacet row so it can be filtered on with an index
+MULTI_VALUE_FIELDS = ('incident_types', 'reporting_barriers', 'reported_to', 'support_types')
+
+# Longest item of a multi-value field, which must fit ReportFacet.value
+CHOICE_VALUE_MAX_LENGTH = 255
+
+
+def choice_values(value):
+    """
+    Normalize the content of a multi-value JSON field to a sorted list of
+    distinct strings.
+    """
+    if value is None or value == '':
+        return []
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    return sorted({
+        item if isinstance(item, str) else json.dumps(item, sort_keys=True)
+        for item in value
+    })
+
+
+def validate_choice_values(value):
+    """
+    Reject multi-value field content with an item too long for a facet row.
+    """
+    for item in choice_values(value):
+        if len(item) > CHOICE_VALUE_MAX_LENGTH:
+            raise ValidationError(
+                f"Each choice must be at most {CHOICE_VALUE_MAX_LENGTH} characters long.",
+                code='max_length',
+            )
 
 
 class Report(models.Model):
@@ -20,6 +57,9 @@ class Report(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_submitted = models.BooleanField(default=False)
     current_step = models.IntegerField(default=1)
+    # Bumped by every step save and submission; step PATCHes can be made
+    # conditional on it with If-Match (optimistic concurrency)
+    version = models.PositiveIntegerField(default=1)
     
     # Before You Begin section
     reported_officially = models.CharField(max_length=100, blank=True, null=True)
@@ -77,4 +117,101 @@ class Report(models.Model):
         return f"Report {self.response_id}"
     
     class Meta:
-        ordering = ['-created_at'] 
\ No newline at end of file
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Default ordering, keyset pagination and the admin's date filter
+            models.Index(fields=['created_at', 'id'], name='report_created_id_idx'),
+            # Submitted (or draft) reports, newest first
+            models.Index(fields=['is_submitted', 'created_at'], name='report_submitted_created_idx'),
+            models.Index(fields=['school_board'], name='report_school_board_idx'),
+        ]
+
+
+class ReportFacet(models.Model):
+    """
+    One chosen value of one of a report's multi-value fields (for example an
+    incident type), normalized out of the JSON columns for indexed filtering.
+    Kept in sync by reports.facets.
+    """
+    FIELD_CHOICES = [(field, field) for field in MULTI_VALUE_FIELDS]
+    
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='facets')
+    field = models.CharField(max_length=30, choices=FIELD_CHOICES)
+    value = models.CharField(max_length=CHOICE_VALUE_MAX_LENGTH)
+    
+    def __str__(self):
+        return f"{self.field}={self.value!r}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['field', 'value', 'report'], name='reportfacet_field_value_report_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['report', 'field'], name='reportfacet_report_field_idx'),
+        ]
+
+
+class ReportStat(models.Model):
+    """
+    Pre-aggregated count of submitted reports for one value of a dimension
+    (school board, incident type, role, or the overall total) in one month of
+    `incident_date`. Maintained by reports.stats.
+    """
+    DIMENSION_CHOICES = [
+        ('total', 'Total'),
+        ('school_board', 'School board'),
+        ('incident_type', 'Incident type'),
+        ('role', 'Role'),
+    ]
+    
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    value = models.CharField(max_length=255, blank=True, default='')
+    # First day of the incident month; null when no incident date was given
+    month = models.DateField(blank=True, null=True)
+    count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.dimension}={self.value!r} {self.month}: {self.count}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dimension', 'month', 'value'], name='reportstat_dimension_month_value_uniq'
+            ),
+            # NULLs never conflict in the constraint above, so rows without a
+            # month get their own
+            models.UniqueConstraint(
+                fields=['dimension', 'value'], condition=models.Q(month__isnull=True),
+                name='reportstat_dimension_value_no_month_uniq'
+            ),
+        ]
+
+
+class ResponseIdSequence(models.Model):
+    """
+    Counter that response_id sequence numbers are reserved from, on
+    databases without native sequences. See reports.response_ids.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class IngestCheckpoint(models.Model):
+    """
+    How far an `ingest_reports` run has got through one source. Updated in
+    the same transaction as each batch of reports, so a resumed run neither
+    skips nor repeats rows.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    position = models.BigIntegerField(default=0)
+    ingested = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.source} @ {self.position}"
@@ -0,0 +1,259 @@
+"""
+Optional declarative partitioning of `reports_report` on PostgreSQL.
+
+`manage.py partition_reports --apply` rebuilds the table as
+
+    reports_report                      PARTITION BY LIST (is_submitted)
+      reports_report_drafts             FOR VALUES IN (false)
+      reports_report_submitted          FOR VALUES IN (true), PARTITION BY RANGE (created_at)
+        reports_report_submitted_2024_01, ...   one per month
+        reports_report_submitted_default        anything outside them
+
+so that drafts, which take all the autosave writes and are kept short by
+`reap_drafts`, live in a small table of their own, and queries that filter on
+`is_submitted` and `created_at` (the list, stats, export, the admin's date
+filter and the reaper) are pruned to the partitions they need. Submitting a
+report moves its row from the drafts partition to its month.
+
+PostgreSQL requires unique constraints on a partitioned table to include the
+partition keys, so the conversion also:
+
+* makes the primary key (id, is_submitted, created_at) and the unique
+  constraint on response_id (response_id, is_submitted, created_at);
+* keeps `id` and `response_id` unique with a side table,
+  reports_report_keys, holding both with a primary key and a unique
+  constraint, maintained by a trigger on reports_report: an insert that
+  reuses either fails with an IntegrityError as before (TRUNCATE skips the
+  trigger, so truncate both tables together);
+* points the foreign key of reports_reportfacet at reports_report_keys, as
+  reports_report has no unique `id` to point to any more;
+* swaps the identity column for a plain sequence default.
+
+Django's migration state still describes the unpartitioned table: it does
+not know about the side table, the trigger, the composite keys or where
+the facet foreign key points, and `makemigrations` cannot see the
+difference. Migrations that alter Report's `id` or `response_id`, its
+unique constraints or the facet foreign key must be written by hand
+(RunSQL inside SeparateDatabaseAndState) against the partitioned schema.
+
+Lookups by response_id alone (resume, step saves) check the index of every
+partition, so keep the number of months moderate. Rows whose month has no
+partition yet go to the default one, and are moved out when the command
+adds their month. Migrations that add
+unique constraints to Report need the partition keys too (or a side table
+like the one above). The conversion
+takes an exclusive lock on the table while it copies the rows, so run it in
+a maintenance window; run the command again (e.g. monthly) to add the
+coming months' partitions.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Min
+
+from .models import Report, ReportFacet
+from .search import install_search_index
+
+
+TABLE = Report._meta.db_table
+DRAFTS_TABLE = f'{TABLE}_drafts'
+SUBMITTED_TABLE = f'{TABLE}_submitted'
+OLD_TABLE = f'{TABLE}_unpartitioned'
+SEQUENCE = f'{TABLE}_id_seq'
+KEYS_TABLE = f'{TABLE}_keys'
+PARTITION_KEYS = ('is_submitted', 'created_at')
+
+
+def month_start(date):
+    return datetime.date(date.year, date.month, 1)
+
+
+def next_month(month):
+    return datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def months_between(first, last):
+    """
+    The first days of the months from `first` through `last`.
+    """
+    month, months = month_start(first), []
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def month_partition_name(month):
+    return f'{SUBMITTED_TABLE}_{month:%Y_%m}'
+
+
+def month_bounds_sql(month):
+    return f"FROM ('{month.isoformat()} 00:00:00+00') TO ('{next_month(month).isoformat()} 00:00:00+00')"
+
+
+def month_partition_sql(month):
+    return (
+        f"CREATE TABLE IF NOT EXISTS {month_partition_name(month)} PARTITION OF {SUBMITTED_TABLE} "
+        f"FOR VALUES {month_bounds_sql(month)}"
+    )
+
+
+def add_month_partition_sql(month):
+    """
+    The statements that add a month's partition to the partitioned table.
+
+    The month's rows may already be in the default partition (e.g. when
+    this has not been run for a while), and PostgreSQL refuses to create a
+    partition whose rows the default one holds. So the partition is built
+    as a plain table, the rows are moved into it, and only then is it
+    attached. The move deletes their keys (reports_report_keys) through the
+    trigger on the default partition; they are put back once the rows are
+    in the new table, which the deferred facet foreign key tolerates.
+    """
+    table = month_partition_name(month)
+    start = f"'{month.isoformat()} 00:00:00+00'"
+    end = f"'{next_month(month).isoformat()} 00:00:00+00'"
+    return [
+        f"CREATE TABLE {table} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+        f"WITH moved AS (DELETE FROM {SUBMITTED_TABLE}_default "
+        f"WHERE created_at >= {start} AND created_at < {end} RETURNING *) "
+        f"INSERT INTO {table} SELECT * FROM moved",
+        f"INSERT INTO {KEYS_TABLE} (id, response_id) SELECT id, response_id FROM {table}",
+        f"ALTER TABLE {SUBMITTED_TABLE} ATTACH PARTITION {table} FOR VALUES {month_bounds_sql(month)}",
+    ]
+
+
+def index_sql(index):
+    columns = ', '.join(
+        f'"{Report._meta.get_field(name.lstrip("-")).column}"' + (' DESC' if name.startswith('-') else '')
+        for name in index.fields
+    )
+    return f"CREATE INDEX {index.name} ON {TABLE} ({columns})"
+
+
+def keys_sql():
+    """
+    The side table keeping `id` and `response_id` unique across partitions,
+    filled from reports_report, and the trigger keeping it in step. Moving a
+    row between partitions (submitting) runs as a delete and an insert,
+    which the deferred facet foreign key tolerates within the transaction.
+    """
+    return [
+        f"CREATE TABLE {KEYS_TABLE} AS SELECT id, response_id FROM {TABLE}",
+        f"ALTER TABLE {KEYS_TABLE} ADD PRIMARY KEY (id), "
+        f"ADD CONSTRAINT {KEYS_TABLE}_response_id_key UNIQUE (response_id)",
+        f"""CREATE FUNCTION {KEYS_TABLE}_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM {KEYS_TABLE} WHERE id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO {KEYS_TABLE} (id, response_id) VALUES (NEW.id, NEW.response_id);
+    END IF;
+    RETURN NULL;
+END
+$$""",
+        f"CREATE TRIGGER {KEYS_TABLE}_sync AFTER INSERT OR DELETE OR UPDATE OF id, response_id "
+        f"ON {TABLE} FOR EACH ROW EXECUTE FUNCTION {KEYS_TABLE}_sync()",
+    ]
+
+
+def conversion_sql(months, facet_foreign_keys):
+    """
+    The statements that rebuild reports_report as a partitioned table with
+    a partition for each of `months`, dropping the named foreign keys of
+    reports_reportfacet first and pointing a new one at the side table.
+    """
+    facet_table = ReportFacet._meta.db_table
+    keys = ', '.join(PARTITION_KEYS)
+    return [
+        f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE",
+        *(f"ALTER TABLE {facet_table} DROP CONSTRAINT {name}" for name in facet_foreign_keys),
+        f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}",
+        # Columns, defaults and check constraints; not the identity, indexes
+        # or unique constraints, whose names stay taken until the old table
+        # is dropped
+        f"CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY LIST (is_submitted)",
+        f"CREATE SEQUENCE {SEQUENCE}_new OWNED BY {TABLE}.id",
+        f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}_new')",
+        f"CREATE TABLE {DRAFTS_TABLE} PARTITION OF {TABLE} FOR VALUES IN (false)",
+        f"CREATE TABLE {SUBMITTED_TABLE} PARTITION OF {TABLE} FOR VALUES IN (true) PARTITION BY RANGE (created_at)",
+        f"CREATE TABLE {SUBMITTED_TABLE}_default PARTITION OF {SUBMITTED_TABLE} DEFAULT",
+        *(month_partition_sql(month) for month in months),
+        f"INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}",
+        f"SELECT setval('{SEQUENCE}_new', COALESCE(MAX(id), 0) + 1, false) FROM {TABLE}",
+        f"DROP TABLE {OLD_TABLE}",
+        f"ALTER SEQUENCE {SEQUENCE}_new RENAME TO {SEQUENCE}",
+        f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, {keys})",
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_response_id_key UNIQUE (response_id, {keys})",
+        *keys_sql(),
+        f"ALTER TABLE {facet_table} ADD CONSTRAINT {facet_table}_report_id_keys_fk "
+        f"FOREIGN KEY (report_id) REFERENCES {KEYS_TABLE} (id) DEFERRABLE INITIALLY DEFERRED",
+        *(index_sql(index) for index in Report._meta.indexes),
+    ]
+
+
+def is_partitioned(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def facet_foreign_keys(connection):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, ReportFacet._meta.db_table)
+    return [
+        name for name, constraint in constraints.items()
+        if constraint['foreign_key'] and constraint['foreign_key'][0] == TABLE
+    ]
+
+
+def existing_tables(connection, names):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relname FROM pg_class WHERE relname = ANY(%s)", [list(names)])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def oldest_default_row(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(created_at) FROM {SUBMITTED_TABLE}_default")
+        return cursor.fetchone()[0]
+
+
+def partition_plan(connection, months_ahead=3, today=None):
+    """
+    The statements that partition reports_report, or when it is already
+    partitioned, add any missing partitions up to `months_ahead` months
+    from now, and for the months of rows that ended up in the default
+    partition. Returns (statements, converting).
+    """
+    today = today or datetime.date.today()
+    last = today
+    for _ in range(months_ahead):
+        last = next_month(last)
+    if is_partitioned(connection):
+        oldest = oldest_default_row(connection)
+        months = months_between(min(oldest.date(), today) if oldest else today, last)
+        existing = existing_tables(connection, [month_partition_name(month) for month in months])
+        return [
+            sql for month in months if month_partition_name(month) not in existing
+            for sql in add_month_partition_sql(month)
+        ], False
+    oldest = Report.objects.using(connection.alias).filter(is_submitted=True).aggregate(
+        oldest=Min('created_at')
+    )['oldest']
+    months = months_between(oldest.date() if oldest else today, last)
+    return conversion_sql(months, facet_foreign_keys(connection)), True
+
+
+def apply_plan(connection, statements, converting):
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        if converting:
+            # The trigram search index went with the old table
+            install_search_index(connection)
@@ -0,0 +1,78 @@
+import functools
+from contextlib import contextmanager
+
+from django.core.exceptions import FieldDoesNotExist
+
+
+class UnmappedField(Exception):
+    """
+    Raised when a serializer field cannot be traced back to a model column.
+    """
+
+
+def serializer_columns(serializer_class):
+    """
+    Return the model columns a ModelSerializer reads or writes, for use with
+    `QuerySet.only()`.
+
+    The primary key and any `auto_now` fields are always included so that
+    `save()` on a partially loaded instance still bumps `updated_at`. Raises
+    UnmappedField if a field's source is not a concrete model field (a method,
+    property, dotted path or `source='*'`), since the serializer may then read
+    anything on the instance.
+    """
+    model = serializer_class.Meta.model
+    columns = [model._meta.pk.name]
+    columns += [
+        field.name for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+    ]
+
+    for field_name, field in serializer_class().fields.items():
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise UnmappedField(
+                f"{serializer_class.__name__}.{field_name} has source {field.source!r}, "
+                f"which is not a field on {model.__name__}"
+            )
+        if not model_field.concrete:
+            raise UnmappedField(
+                f"{serializer_class.__name__}.{field_name} is not a concrete column"
+            )
+        columns.append(model_field.name)
+
+    return tuple(dict.fromkeys(columns))
+
+
+@functools.lru_cache(maxsize=None)
+def loaded_columns(serializer_class):
+    """
+    The columns to load for a serializer, or None when the serializer cannot
+    be mapped and the full row has to be loaded. Worked out on first use
+    rather than at import, since it builds the serializer's fields.
+    """
+    try:
+        return serializer_columns(serializer_class)
+    except UnmappedField:
+        return None
+
+
+@contextmanager
+def explicit_timestamps(model):
+    """
+    Let bulk_create keep the created_at/updated_at values it is given instead
+    of stamping every row with the current time.
+    """
+    fields = [
+        f for f in model._meta.concrete_fields
+        if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)
+    ]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
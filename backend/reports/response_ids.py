@@ -0,0 +1,277 @@
+"""
+Collision-free response_id allocation.
+
+A response_id is the only thing a client needs to resume (and edit) a report,
+so it has to stay unguessable. Instead of drawing random characters and
+hoping the unique index never trips, IDs are made from a sequence number:
+
+* numbers come from a database sequence in blocks, so every number is
+  handed out once across all processes without reading the report table;
+* each number is passed through a keyed Feistel permutation of the whole
+  8-character ID space, so consecutive numbers give unrelated-looking IDs
+  and distinct numbers always give distinct IDs;
+* the result is encoded in the same 57-character shortuuid alphabet as
+  before, so existing IDs and the max_length=8 column are unchanged.
+
+The permutation key is the REPORTS_RESPONSE_ID_KEY secret, which must be
+set outside the repository: anyone with the key can list every ID in
+order. Distinct numbers never collide with each other, but they can land on
+an ID issued before, at random by the old code or under an earlier key, so
+each block of new IDs is checked against the report table and the archive
+and the taken ones are skipped.
+
+IDs are deliberately not time-ordered: a sortable prefix would make the IDs
+of neighbouring reports easy to guess. Inserts into the response_id index are
+therefore still spread out; range scans use the (created_at, id) index.
+"""
+import hashlib
+import os
+import threading
+
+import shortuuid
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connections, transaction
+
+
+ALPHABET = shortuuid.ShortUUID()._alphabet
+ID_LENGTH = 8
+ID_SPACE = len(ALPHABET) ** ID_LENGTH
+
+SEQUENCE_NAME = 'response_id'
+# PostgreSQL sequence used instead of the counter table
+PG_SEQUENCE = 'reports_response_id_seq'
+
+DEFAULT_BLOCK_SIZE = 256
+
+# Keys with this prefix are for development only (see reports/checks.py)
+DEVELOPMENT_KEY_PREFIX = 'development-only-'
+
+
+def encode(number):
+    """
+    Encode 0 <= number < ID_SPACE as a fixed-width ID.
+    """
+    base = len(ALPHABET)
+    chars = []
+    for _ in range(ID_LENGTH):
+        number, digit = divmod(number, base)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def decode(response_id):
+    base = len(ALPHABET)
+    number = 0
+    for char in response_id:
+        number = number * base + ALPHABET.index(char)
+    return number
+
+
+class FeistelPermutation:
+    """
+    Keyed bijection on range(domain).
+
+    A balanced Feistel network over the smallest even number of bits that
+    covers the domain, with cycle walking to stay inside it. Each round uses
+    keyed BLAKE2b as its round function.
+    """
+    def __init__(self, key, domain=ID_SPACE, rounds=4):
+        self.key = key
+        self.domain = domain
+        self.rounds = rounds
+        self.half_bits = ((domain - 1).bit_length() + 1) // 2
+        self.mask = (1 << self.half_bits) - 1
+        self._half_bytes = (self.half_bits + 7) // 8
+
+    def _round(self, index, value):
+        digest = hashlib.blake2b(
+            bytes([index]) + value.to_bytes(self._half_bytes, 'big'),
+            key=self.key, digest_size=8,
+        ).digest()
+        return int.from_bytes(digest, 'big') & self.mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.mask
+        for index in range(self.rounds):
+            left, right = right, left ^ self._round(index, right)
+        return (left << self.half_bits) | right
+
+    def __call__(self, number):
+        if not 0 <= number < self.domain:
+            raise ValueError(f"{number} is outside the permutation domain")
+        number = self._encrypt(number)
+        while number >= self.domain:
+            number = self._encrypt(number)
+        return number
+
+
+def permutation_key():
+    """
+    The Feistel key, derived from the REPORTS_RESPONSE_ID_KEY setting; read
+    when the pool is first built, i.e. when the first ID is allocated.
+
+    Raises ImproperlyConfigured if the setting is missing or is a key that
+    ships with the code (Django's insecure development SECRET_KEY). The
+    development key guard_api.settings falls back to under DEBUG is
+    rejected by the deploy checks (reports/checks.py). Changing
+    it changes every future ID; IDs already issued are skipped.
+    """
+    secret = getattr(settings, 'REPORTS_RESPONSE_ID_KEY', None)
+    if not secret:
+        raise ImproperlyConfigured(
+            "Set REPORTS_RESPONSE_ID_KEY to a secret kept out of the repository; "
+            "report response IDs are derived from it."
+        )
+    if secret.startswith('django-insecure-') or secret == settings.SECRET_KEY:
+        raise ImproperlyConfigured(
+            "REPORTS_RESPONSE_ID_KEY must be its own secret, not the committed SECRET_KEY."
+        )
+    return hashlib.sha256(b'reports.response_id:' + secret.encode()).digest()
+
+
+def reserves_durably(using='default'):
+    """
+    Whether numbers reserved by `allocate_numbers` stay reserved if the
+    caller's transaction rolls back: always with a PostgreSQL sequence, and
+    with the counter row only outside a transaction.
+    """
+    connection = connections[using]
+    return connection.vendor == 'postgresql' or not connection.in_atomic_block
+
+
+def allocate_numbers(count, using='default'):
+    """
+    Reserve `count` sequence numbers and return them as a list.
+
+    On PostgreSQL this is one nextval() call per number in a single query;
+    nextval is not transactional, so the numbers stay reserved even if the
+    caller's transaction rolls back. Elsewhere a counter row is advanced on
+    the caller's connection: a second connection would wait on the write
+    lock the caller may already hold (SQLite's "database is locked"). Inside
+    a transaction the reservation then rolls back with it (see
+    `reserves_durably`).
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)", [PG_SEQUENCE, count]
+            )
+            return [row[0] - 1 for row in cursor.fetchall()]
+
+    with transaction.atomic(using=using):
+        start = _advance_counter(connection, count)
+    return list(range(start, start + count))
+
+
+def taken_response_ids(response_ids, using='default'):
+    """
+    The subset of `response_ids` already used by a report, in the table or
+    in the cold archive.
+    """
+    from .archive import get_archive
+    from .models import Report
+
+    taken = set(
+        Report.objects.using(using).filter(response_id__in=response_ids).values_list('response_id', flat=True)
+    )
+    return taken | get_archive().archived_ids(response_ids)
+
+
+def _advance_counter(connection, count):
+    """
+    Add `count` to the counter row and return its previous value.
+    """
+    from .models import ResponseIdSequence
+
+    table = connection.ops.quote_name(ResponseIdSequence._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET next_value = next_value + %s WHERE name = %s",
+            [count, SEQUENCE_NAME],
+        )
+        if cursor.rowcount == 0:
+            try:
+                cursor.execute(
+                    f"INSERT INTO {table} (name, next_value) VALUES (%s, %s)",
+                    [SEQUENCE_NAME, count],
+                )
+                return 0
+            except IntegrityError:
+                # Another process created the row first
+                cursor.execute(
+                    f"UPDATE {table} SET next_value = next_value + %s WHERE name = %s",
+                    [count, SEQUENCE_NAME],
+                )
+        cursor.execute(f"SELECT next_value FROM {table} WHERE name = %s", [SEQUENCE_NAME])
+        return cursor.fetchone()[0] - count
+
+
+class ResponseIdPool:
+    """
+    Per-process pool of pre-allocated response IDs.
+
+    Sequence numbers are reserved `block_size` at a time, so creating a
+    report normally costs no extra query beyond the one checking each block
+    against the IDs already taken. IDs left in the pool when the process
+    exits are simply never used. The pool is dropped after a fork so that
+    forked workers never share a block. Inside a transaction that could
+    roll the reservation back, only the numbers needed right away are
+    reserved, never a block for later (see `reserves_durably`).
+    """
+    def __init__(self, block_size=DEFAULT_BLOCK_SIZE, using='default', key=None):
+        self.block_size = block_size
+        self.using = using
+        self.permute = FeistelPermutation(key or permutation_key())
+        self._ids = []
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def take(self):
+        return self.take_many(1)[0]
+
+    def take_many(self, count):
+        """
+        Return `count` new IDs, reserving more numbers if the pool runs out.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._ids, self._pid = [], os.getpid()
+            while len(self._ids) < count:
+                needed = count - len(self._ids)
+                if reserves_durably(self.using):
+                    needed = max(needed, self.block_size)
+                ids = [encode(self.permute(number)) for number in allocate_numbers(needed, self.using)]
+                taken = taken_response_ids(ids, self.using)
+                self._ids += [response_id for response_id in ids if response_id not in taken]
+            ids, self._ids = self._ids[:count], self._ids[count:]
+        return ids
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_response_id_pool():
+    """
+    Return the process-wide pool, sized by REPORTS_RESPONSE_ID_BLOCK_SIZE.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                block_size = getattr(settings, 'REPORTS_RESPONSE_ID_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)
+                _pool = ResponseIdPool(block_size=block_size)
+    return _pool
+
+
+def next_response_id():
+    return get_response_id_pool().take()
+
+
+def allocate_response_ids(count):
+    """
+    Return `count` new IDs at once, e.g. for bulk_create.
+    """
+    return get_response_id_pool().take_many(count)
@@ -0,0 +1,165 @@
+"""
+Read-replica routing for the report endpoints.
+
+Queries go to the primary ('default') unless they run inside `replica_reads`,
+which the read-only endpoints (list, retrieve, resume, stats, export) enter
+through ReplicaReadsMixin. Each block picks one replica, so all its queries
+see the same snapshot.
+
+Replicas lag behind the primary, so a client that saves a step and then
+resumes could read its old answers. Every successful write records the
+report's response_id for REPORTS_READ_REPLICAS['STICKY_SECONDS'], and reads
+of a recently written report stay on the primary. The marks are kept in
+the REPORTS_READ_REPLICAS['CACHE'] alias, which every worker process must
+share; `check_replica_settings` refuses replicas without such a cache.
+
+With no replicas configured (the SQLite default) nothing is routed and no
+marks are recorded.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+
+
+DEFAULT_READ_REPLICAS = {
+    'ALIASES': [],
+    'STICKY_SECONDS': 10,
+    'CACHE': 'default',
+}
+
+# The replica that reads in the current request or task go to, if any
+_read_alias = ContextVar('reports_read_alias', default=None)
+
+
+def replica_settings():
+    return {**DEFAULT_READ_REPLICAS, **getattr(settings, 'REPORTS_READ_REPLICAS', {})}
+
+
+def check_replica_settings():
+    """
+    Raise ImproperlyConfigured if replicas are configured but the sticky
+    marks would go to a cache local to each process: a read served by
+    another worker right after a write would then go to a lagging replica.
+    """
+    from .cache import is_shared_cache
+
+    config = replica_settings()
+    if config['ALIASES'] and not is_shared_cache(config['CACHE']):
+        raise ImproperlyConfigured(
+            f"Read replicas need a cache shared by every worker for read-your-writes stickiness; "
+            f"CACHES[{config['CACHE']!r}] is local to each process (set REDIS_URL)."
+        )
+
+
+def _written_key(response_id):
+    return f'reports:written:{response_id}'
+
+
+def record_write(response_id):
+    """
+    Keep reads of this report on the primary for the sticky window.
+    """
+    config = replica_settings()
+    if response_id and config['ALIASES']:
+        caches[config['CACHE']].set(_written_key(response_id), True, config['STICKY_SECONDS'])
+
+
+async def arecord_write(response_id):
+    config = replica_settings()
+    if response_id and config['ALIASES']:
+        await caches[config['CACHE']].aset(_written_key(response_id), True, config['STICKY_SECONDS'])
+
+
+def read_database(response_id=None):
+    """
+    The replica to read from, or None for the primary: there are no
+    replicas, or `response_id` was written within the sticky window.
+    """
+    config = replica_settings()
+    if not config['ALIASES']:
+        return None
+    if response_id and caches[config['CACHE']].get(_written_key(response_id)):
+        return None
+    return random.choice(config['ALIASES'])
+
+
+async def aread_database(response_id=None):
+    config = replica_settings()
+    if not config['ALIASES']:
+        return None
+    if response_id and await caches[config['CACHE']].aget(_written_key(response_id)):
+        return None
+    return random.choice(config['ALIASES'])
+
+
+@contextmanager
+def replica_reads(response_id=None):
+    """
+    Send the reads made inside the block to a replica (see `read_database`).
+    """
+    token = _read_alias.set(read_database(response_id))
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Database router: reads of report models inside `replica_reads` go to the
+    chosen replica, everything else (all writes, migrations, the admin and
+    management commands) to the primary.
+    """
+    def db_for_read(self, model, **hints):
+        # Sessions and users stay on the primary so a fresh login is seen at once
+        if model._meta.app_label == 'reports':
+            return _read_alias.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's rows, so objects read from either may be related
+        aliases = {'default', *replica_settings()['ALIASES']}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_settings()['ALIASES']:
+            return False
+        return None
+
+
+class ReplicaReadsMixin:
+    """
+    View mixin: `replica_actions` (viewset actions, or HTTP methods for other
+    views) read from a replica, and successful writes mark their report as
+    recently written.
+    """
+    replica_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        response_id = kwargs.get(getattr(self, 'lookup_field', 'response_id'))
+        method = request.method.lower()
+        if request.method in SAFE_METHODS:
+            action_name = getattr(self, 'action_map', {}).get(method, method)
+            if action_name in self.replica_actions:
+                with replica_reads(response_id):
+                    return super().dispatch(request, *args, **kwargs)
+            return super().dispatch(request, *args, **kwargs)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code < 400:
+            data = getattr(response, 'data', None)
+            if response_id is None and isinstance(data, dict):
+                # A newly created report
+                response_id = data.get('response_id')
+            record_write(response_id)
+        return response
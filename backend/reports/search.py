@@ -0,0 +1,116 @@
+"""
+Full-text index over `Report.incident_description`.
+
+On PostgreSQL a pg_trgm GIN index lets the admin's `icontains` search use an
+index directly. SQLite has no equivalent, so there the text is mirrored into
+an FTS5 table kept in sync by triggers, and the admin search queries it.
+"""
+from django.db import connection as default_connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = 'reports_report_fts'
+TRGM_INDEX = 'report_incident_desc_trgm'
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON reports_report BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, incident_description)
+            VALUES (new.id, new.incident_description);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON reports_report BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, incident_description)
+            VALUES ('delete', old.id, old.incident_description);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF incident_description ON reports_report BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, incident_description)
+            VALUES ('delete', old.id, old.incident_description);
+            INSERT INTO {FTS_TABLE}(rowid, incident_description)
+            VALUES (new.id, new.incident_description);
+        END
+    """,
+}
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any('ENABLE_FTS5' in row[0] for row in cursor.fetchall())
+
+
+def install_search_index(connection):
+    """
+    Create the vendor-specific search index if it does not exist yet.
+
+    On SQLite this also recreates the sync triggers, which are dropped
+    whenever a migration rebuilds `reports_report`, and rebuilds the FTS
+    table from scratch when any trigger was missing.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON reports_report "
+                f"USING gin (incident_description gin_trgm_ops)"
+            )
+    elif connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+                list(SQLITE_TRIGGERS),
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"incident_description, content='reports_report', content_rowid='id')"
+            )
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            if len(existing) < len(SQLITE_TRIGGERS):
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def remove_search_index(connection):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {TRGM_INDEX}")
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def uses_fts(connection=default_connection):
+    """
+    Whether description searches should go through the SQLite FTS5 table.
+    """
+    return (
+        connection.vendor == 'sqlite'
+        and FTS_TABLE in connection.introspection.table_names()
+    )
+
+
+def fts_query(search_term):
+    """
+    Turn free text into an FTS5 query: every word must appear, as a prefix.
+    """
+    words = [word.replace('"', '""') for word in search_term.split()]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def description_matches(search_term):
+    """
+    Q object matching reports whose incident_description contains the term,
+    answered from the FTS5 index.
+    """
+    return Q(id__in=RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+        [fts_query(search_term)],
+    ))
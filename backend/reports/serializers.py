@@ -1,28 +1,92 @@
+import re
+
 from rest_framework import serializers
-from .models import Report
+from rest_framework.validators import ProhibitSurrogateCharactersValidator
+from .instrumentation import TimedSerializerMixin
+from .models import MULTI_VALUE_FIELDS, Report, validate_choice_values
+
+
+class FastSurrogateValidator(ProhibitSurrogateCharactersValidator):
+    """
+    Same check as DRF's validator, with a regex search instead of a Python
+    loop over every character of long text fields.
+    """
+    surrogates = re.compile('[\ud800-\udfff]')
+
+    def __call__(self, value):
+        if self.surrogates.search(str(value)):
+            super().__call__(value)
 
 
-class ReportSerializer(serializers.ModelSerializer):
+class ChoiceValuesMixin:
+    """
+    Validates the items of the writable multi-value fields, each of which
+    becomes a ReportFacet row.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in MULTI_VALUE_FIELDS:
+            if name in fields and not fields[name].read_only:
+                fields[name].validators.append(validate_choice_values)
+        return fields
+
+
+class ReportSerializer(ChoiceValuesMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Report model - handles all fields.
     """
     class Meta:
         model = Report
         fields = '__all__'
-        read_only_fields = ['response_id', 'created_at', 'updated_at']
+        read_only_fields = ['response_id', 'created_at', 'updated_at', 'version']
+
+
+class ReportIngestSerializer(ReportSerializer):
+    """
+    Serializer for bulk-loading existing reports (see reports/ingest.py) -
+    also accepts the response_id and timestamps of the source record.
+    """
+    response_id = serializers.CharField(min_length=8, max_length=8, required=False)
+    created_at = serializers.DateTimeField(required=False)
+    updated_at = serializers.DateTimeField(required=False)
+
+    class Meta(ReportSerializer.Meta):
+        read_only_fields = []
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in fields.values():
+            field.validators = [
+                FastSurrogateValidator() if isinstance(v, ProhibitSurrogateCharactersValidator) else v
+                for v in field.validators
+            ]
+        return fields
+
+
+class ReportListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for listing reports - summary fields only, no free text.
+    """
+    class Meta:
+        model = Report
+        fields = [
+            'response_id', 'created_at', 'updated_at', 'is_submitted', 'current_step',
+            'role', 'school_board', 'incident_date'
+        ]
+        read_only_fields = fields
 
 
-class ReportResumeSerializer(serializers.ModelSerializer):
+class ReportResumeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for resuming a report - only returns minimal info.
     """
     class Meta:
         model = Report
-        fields = ['response_id', 'current_step', 'is_submitted', 'created_at', 'updated_at']
-        read_only_fields = ['response_id', 'created_at', 'updated_at']
+        fields = ['response_id', 'current_step', 'is_submitted', 'created_at', 'updated_at', 'version']
+        read_only_fields = ['response_id', 'created_at', 'updated_at', 'version']
 
 
-class ReportStepSerializer(serializers.ModelSerializer):
+class ReportStepSerializer(ChoiceValuesMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """
     Base serializer for individual report steps.
     Subclasses will define specific fields for each step.
@@ -102,7 +166,7 @@ class AdditionalInfoSerializer(ReportStepSerializer):
         ]
 
 
-class SubmitReportSerializer(serializers.ModelSerializer):
+class SubmitReportSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for submitting the final report.
     """
@@ -0,0 +1,204 @@
+"""
+Rollup statistics for submitted reports.
+
+Counts are kept per (dimension, value, month) in ReportStat. A submission
+adds one to each of its rows with a single upsert as part of the submit
+transaction. Every other write that can change what a submitted report
+counts towards (creating one already submitted, editing its stat fields,
+unsubmitting or deleting it) moves its counts with `recount_report` in its
+own transaction; the `rebuild_stats` command recomputes the whole table for
+backfills.
+"""
+import datetime
+from collections import Counter
+
+from django.db import connections, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .archive import get_archive
+from .models import Report, ReportFacet, ReportStat, choice_values
+
+
+# Report columns a submission's rollup rows are computed from
+STAT_SOURCE_FIELDS = ('school_board', 'role', 'incident_types', 'incident_date')
+
+# The unique constraint a rollup row conflicts on, for rows with and without a month
+UPSERT_CONFLICT_TARGETS = {
+    False: '(dimension, month, value)',
+    True: '(dimension, value) WHERE month IS NULL',
+}
+
+# Column-backed dimensions, counted with GROUP BY queries when rebuilding
+COLUMN_DIMENSIONS = {'school_board': 'school_board', 'role': 'role'}
+
+
+def month_of(date):
+    if date is None:
+        return None
+    if isinstance(date, str):
+        # Accept both 'YYYY-MM' and full ISO dates
+        date = datetime.date.fromisoformat(date if len(date) > 7 else f"{date}-01")
+    return date.replace(day=1)
+
+
+def stat_keys(values):
+    """
+    The (dimension, value, month) rows one submitted report counts towards.
+    """
+    month = month_of(values['incident_date'])
+    keys = [('total', '', month)]
+    for dimension, field in COLUMN_DIMENSIONS.items():
+        keys.append((dimension, values[field] or '', month))
+    for incident_type in choice_values(values['incident_types']):
+        keys.append(('incident_type', incident_type, month))
+    return keys
+
+
+def add_counts(keys, amount=1, using='default'):
+    """
+    Add `amount` to the rollup rows `keys`, creating the missing ones.
+
+    Each group of keys with or without a month is one
+    INSERT ... ON CONFLICT DO UPDATE statement, whatever the number of keys;
+    the keys of one report share its month, so that is one statement per
+    submission. Rows without a month conflict on their own partial unique
+    constraint, since NULLs never conflict in the main one.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(ReportStat._meta.db_table)
+    with connection.cursor() as cursor:
+        for no_month, conflict_target in UPSERT_CONFLICT_TARGETS.items():
+            group = [key for key in keys if (key[2] is None) == no_month]
+            if not group:
+                continue
+            placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(group))
+            cursor.execute(
+                f"INSERT INTO {table} (dimension, value, month, count) VALUES {placeholders} "
+                f"ON CONFLICT {conflict_target} DO UPDATE SET count = {table}.count + excluded.count",
+                [
+                    param for dimension, value, month in group
+                    for param in (dimension, value, connection.ops.adapt_datefield_value(month), amount)
+                ],
+            )
+
+
+def subtract_counts(keys, amount=1):
+    """
+    Take `amount` off the existing rollup rows `keys`, in one UPDATE. Rows
+    that would drop below zero are left alone.
+    """
+    if not keys:
+        return
+    rows = Q()
+    for dimension, value, month in keys:
+        rows |= Q(dimension=dimension, value=value, month=month)
+    ReportStat.objects.filter(rows, count__gte=amount).update(count=F('count') - amount)
+
+
+def touches_stats(values):
+    """
+    Whether writing `values` to a report can change the rows it counts towards.
+    """
+    return 'is_submitted' in values or any(field in values for field in STAT_SOURCE_FIELDS)
+
+
+def submitted_stat_keys(report_id=None, response_id=None):
+    """
+    The rollup rows a stored report, identified by primary key or by
+    response_id, counts towards: none unless submitted.
+    """
+    reports = Report.objects.filter(is_submitted=True)
+    reports = reports.filter(pk=report_id) if report_id is not None else reports.filter(response_id=response_id)
+    values = reports.values(*STAT_SOURCE_FIELDS).first()
+    return stat_keys(values) if values else []
+
+
+def recount_report(old_keys, new_keys):
+    """
+    Move an edited report's counts from the rows it counted towards before
+    the edit (`submitted_stat_keys` beforehand) to those it counts towards now
+    (none once it is deleted or unsubmitted). Call in the edit's transaction.
+    """
+    if set(old_keys) != set(new_keys):
+        subtract_counts(old_keys)
+        add_counts(new_keys)
+
+
+def record_submission(response_id):
+    """
+    Count a newly submitted report in the rollup table. Call this in the same
+    transaction that flips `is_submitted`, and only when it actually changed.
+    """
+    values = Report.objects.values(*STAT_SOURCE_FIELDS).get(response_id=response_id)
+    add_counts(stat_keys(values))
+
+
+def rebuild_stats(chunk_size=5000):
+    """
+    Recompute every rollup row from the submitted reports.
+
+    Every dimension is counted in the database with one GROUP BY query;
+    incident types are grouped through the facet table. Reports moved to the
+    cold archive are read from there. Returns the number of rows written.
+    """
+    submitted = Report.objects.filter(is_submitted=True).annotate(month=TruncMonth('incident_date'))
+    counts = Counter()
+
+    for row in submitted.values('month').annotate(n=Count('id')).order_by():
+        counts[('total', '', row['month'])] += row['n']
+    for dimension, field in COLUMN_DIMENSIONS.items():
+        for row in submitted.values(field, 'month').annotate(n=Count('id')).order_by():
+            counts[(dimension, row[field] or '', row['month'])] += row['n']
+
+    incident_types = ReportFacet.objects.filter(
+        field='incident_types', report__is_submitted=True
+    ).annotate(month=TruncMonth('report__incident_date'))
+    for row in incident_types.values('value', 'month').annotate(n=Count('id')).order_by():
+        counts[('incident_type', row['value'], row['month'])] += row['n']
+
+    for values in get_archive().iter_rows():
+        for key in stat_keys(values):
+            counts[key] += 1
+
+    with transaction.atomic():
+        ReportStat.objects.all().delete()
+        ReportStat.objects.bulk_create(
+            [
+                ReportStat(dimension=dimension, value=value, month=month, count=count)
+                for (dimension, value, month), count in counts.items()
+            ],
+            batch_size=chunk_size,
+        )
+    return len(counts)
+
+
+def stats_summary(month_from=None, month_to=None):
+    """
+    Aggregate the rollup rows into the /api/stats/ payload, optionally
+    limited to incident months in [month_from, month_to].
+    """
+    # Rows emptied by admin edits (see recount_report) are left at zero
+    rows = ReportStat.objects.filter(count__gt=0)
+    if month_from:
+        rows = rows.filter(month__gte=month_of(month_from))
+    if month_to:
+        rows = rows.filter(month__lte=month_of(month_to))
+
+    summary = {
+        'total': 0,
+        'by_month': {},
+        'by_school_board': {},
+        'by_incident_type': {},
+        'by_role': {},
+    }
+    grouped = rows.values('dimension', 'value', 'month').annotate(n=Sum('count')).order_by('month')
+    for row in grouped:
+        if row['dimension'] == 'total':
+            summary['total'] += row['n']
+            month = row['month'].strftime('%Y-%m') if row['month'] else 'unknown'
+            summary['by_month'][month] = summary['by_month'].get(month, 0) + row['n']
+        else:
+            bucket = summary[f"by_{row['dimension']}"]
+            bucket[row['value']] = bucket.get(row['value'], 0) + row['n']
+    return summary
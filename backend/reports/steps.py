@@ -0,0 +1,226 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .facets import sync_facets
+from .models import MULTI_VALUE_FIELDS, Report
+from .querysets import loaded_columns
+from .serializers import (
+    BeforeYouBeginSerializer, PersonalInfoSerializer, IncidentDetailsSerializer,
+    ReportingResponseSerializer, SchoolResponseSerializer, ImpactSupportSerializer,
+    AdditionalInfoSerializer
+)
+from .stats import record_submission, recount_report, submitted_stat_keys, touches_stats
+
+
+class Step:
+    """
+    One step of the multi-step report form.
+
+    `number` is the value of `Report.current_step` while the user is on this
+    step; saving the step moves `current_step` on to `number + 1`.
+    """
+    def __init__(self, name, number, title, serializer_class):
+        self.name = name
+        self.number = number
+        self.title = title
+        self.serializer_class = serializer_class
+
+    def __repr__(self):
+        return f"Step({self.name!r}, {self.number})"
+
+
+# The form steps in order; each one is exposed as a PATCH action on ReportViewSet
+STEPS = (
+    Step('before_you_begin', 1, 'Before You Begin', BeforeYouBeginSerializer),
+    Step('personal_info', 2, 'Personal & Contact Information', PersonalInfoSerializer),
+    Step('incident_details', 3, 'Incident Details', IncidentDetailsSerializer),
+    Step('reporting_response', 4, 'Reporting & Response', ReportingResponseSerializer),
+    Step('school_response', 5, 'School Response', SchoolResponseSerializer),
+    Step('impact_support', 6, 'Impact & Support', ImpactSupportSerializer),
+    Step('additional_info', 7, 'Additional Information', AdditionalInfoSerializer),
+)
+
+STEPS_BY_NAME = {step.name: step for step in STEPS}
+
+
+def current_step_expression(steps, requested_step=None):
+    """
+    Build the SQL expression for the new `current_step` after saving `steps`.
+
+    Saving a step advances `current_step` only if the report is still on that
+    step, so the whole transition is a CASE over the stored value and never
+    needs the row to be read first. Any other value is left alone, or replaced
+    by `requested_step` when the client sent one explicitly.
+    """
+    transitions = {}
+    for step in sorted(steps, key=lambda s: s.number):
+        for start, end in list(transitions.items()):
+            if end == step.number:
+                transitions[start] = step.number + 1
+        transitions.setdefault(step.number, step.number + 1)
+
+    default = F('current_step') if requested_step is None else Value(requested_step)
+    return Case(
+        *[When(current_step=start, then=Value(end)) for start, end in transitions.items()],
+        default=default,
+        output_field=IntegerField(),
+    )
+
+
+def validate_step(step, data):
+    """
+    Validate a partial update for `step`; returns the serializer.
+    """
+    serializer = step.serializer_class(data=data, partial=True)
+    serializer.is_valid(raise_exception=True)
+    return serializer
+
+
+def step_update_values(validated_steps):
+    """
+    Turn `(step, validated_data)` pairs into the keyword arguments for one
+    `QuerySet.update()`: the validated fields, the CASE for `current_step` and
+    a fresh `updated_at`.
+    """
+    values = {}
+    requested_step = None
+    for step, validated_data in validated_steps:
+        validated_data = dict(validated_data)
+        if 'current_step' in validated_data:
+            requested_step = validated_data.pop('current_step')
+        values.update(validated_data)
+
+    values['current_step'] = current_step_expression(
+        [step for step, _ in validated_steps], requested_step
+    )
+    values['updated_at'] = timezone.now()
+    return values
+
+
+def needs_facet_sync(values):
+    return any(field in values for field in MULTI_VALUE_FIELDS)
+
+
+def needs_transaction(values):
+    """
+    Whether saving `values` also writes other rows: facets, or the rollup
+    counts of a report that is already submitted.
+    """
+    return needs_facet_sync(values) or touches_stats(values)
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a write is conditional on a version of the report that is
+    no longer the current one; `version` is the current version.
+    """
+    def __init__(self, version):
+        super().__init__(f"The report is at version {version}")
+        self.version = version
+
+
+def apply_update(response_id, values, expected_version=None):
+    """
+    Apply `values` to a report with one UPDATE that also bumps its version.
+
+    With `expected_version` the UPDATE only matches while the report is
+    still at that version, so concurrent writers never overwrite each
+    other's changes unseen and no row is locked in advance. Returns whether
+    the report was updated (False if it does not exist); raises
+    VersionConflict if it exists at another version.
+    """
+    reports = Report.objects.filter(response_id=response_id)
+    if expected_version is not None:
+        reports = reports.filter(version=expected_version)
+    if reports.update(**values, version=F('version') + 1):
+        return True
+    current = Report.objects.filter(response_id=response_id).values_list('version', flat=True).first()
+    if current is None:
+        return False
+    raise VersionConflict(current)
+
+
+def update_report(response_id, values, expected_version=None):
+    """
+    `apply_update`, returning the new version, or None if the report does
+    not exist. Call inside a transaction.
+    """
+    if not apply_update(response_id, values, expected_version):
+        return None
+    if expected_version is not None:
+        return expected_version + 1
+    # The row is ours until the transaction ends, so this is our version
+    return Report.objects.filter(response_id=response_id).values_list('version', flat=True).get()
+
+
+async def aapply_update(response_id, values, expected_version=None):
+    """
+    Async `apply_update`, a single statement that needs no transaction
+    (Django 4.2 has no async ones).
+    """
+    reports = Report.objects.filter(response_id=response_id)
+    if expected_version is not None:
+        reports = reports.filter(version=expected_version)
+    if await reports.aupdate(**values, version=F('version') + 1):
+        return True
+    current = await Report.objects.filter(response_id=response_id).values_list('version', flat=True).afirst()
+    if current is None:
+        return False
+    raise VersionConflict(current)
+
+
+def saved_steps_queryset(response_id, steps):
+    """
+    The report, loading only the columns the steps' serializers and the
+    ETag need (every column if a serializer has fields without one).
+    """
+    reports = Report.objects.filter(response_id=response_id)
+    columns = [loaded_columns(step.serializer_class) for step in steps]
+    if None in columns:
+        return reports
+    return reports.only('version', *(column for step_columns in columns for column in step_columns))
+
+
+def save_steps(response_id, validated_steps, expected_version=None):
+    """
+    Write validated step data straight to the database.
+
+    `validated_steps` is a list of `(step, validated_data)` pairs. All of them
+    are applied with a single `UPDATE ... WHERE response_id = ?` that only
+    touches the fields the steps own, `current_step`, `updated_at` and
+    `version`; the facet rows of any multi-value fields are replaced, and a
+    submitted report's rollup counts moved, in the same transaction. Returns
+    the saved report, with the steps' columns and
+    its new version, as read back in that transaction (None if the report
+    does not exist); see `update_report` for `expected_version`.
+    """
+    values = step_update_values(validated_steps)
+    with transaction.atomic():
+        # Drafts count towards nothing; only the steps changing a stat
+        # field pay for the lookup
+        old_keys = submitted_stat_keys(response_id=response_id) if touches_stats(values) else []
+        if not apply_update(response_id, values, expected_version):
+            return None
+        report = saved_steps_queryset(response_id, [step for step, _ in validated_steps]).get()
+        sync_facets(values, report_id=report.pk)
+        if old_keys:
+            recount_report(old_keys, submitted_stat_keys(report_id=report.pk))
+    return report
+
+
+def submit_report(response_id):
+    """
+    Mark a report as submitted.
+
+    The first submission also counts the report in the statistics rollup, in
+    the same transaction; submitting again is a no-op. Returns False if the
+    report does not exist.
+    """
+    with transaction.atomic():
+        submitted = Report.objects.filter(
+            response_id=response_id, is_submitted=False
+        ).update(is_submitted=True, updated_at=timezone.now(), version=F('version') + 1)
+        if submitted:
+            record_submission(response_id)
+    return bool(submitted) or Report.objects.filter(response_id=response_id).exists()
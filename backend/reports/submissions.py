@@ -0,0 +1,87 @@
+"""
+Optional write-behind mode for report submission.
+
+When REPORTS_WRITE_BEHIND['ENABLED'] is set, the submit endpoints queue the
+report in guard_common.write_behind.WriteBehindQueue and answer 202 Accepted; a
+background thread submits queued reports in group-committed batches.
+Submitting is idempotent (see steps.submit_report), so entries replayed
+after a crash are harmless. Each serving process starts the drain thread on
+its first request (connected in reports/apps.py), so entries left by a
+crash are applied without waiting for the next submission.
+"""
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .cache import get_resume_cache
+from .models import Report
+from .routing import record_write
+from .steps import submit_report
+from guard_common.write_behind import QueueFull, WriteBehindQueue
+
+
+DEFAULT_WRITE_BEHIND = {
+    'ENABLED': False,
+    'PATH': 'write_behind.sqlite3',
+    'OPTIONS': {},
+}
+
+
+def apply_submissions(entries):
+    """
+    Submit a batch of queued reports in one transaction.
+    """
+    close_old_connections()
+    with transaction.atomic():
+        for _, payload in entries:
+            submit_report(payload['response_id'])
+    cache = get_resume_cache()
+    for _, payload in entries:
+        cache.delete(payload['response_id'])
+        record_write(payload['response_id'])
+
+
+_queue = None
+
+
+def get_submission_queue():
+    """
+    Return the submission queue, or None when write-behind is disabled.
+    """
+    global _queue
+    config = getattr(settings, 'REPORTS_WRITE_BEHIND', DEFAULT_WRITE_BEHIND)
+    if not config.get('ENABLED'):
+        return None
+    if _queue is None:
+        _queue = WriteBehindQueue(
+            config.get('PATH', DEFAULT_WRITE_BEHIND['PATH']), apply_submissions,
+            **config.get('OPTIONS', {})
+        )
+    return _queue
+
+
+def start_submission_queue(sender=None, **kwargs):
+    """
+    request_started handler: start this process's drain thread, if
+    write-behind is enabled and it is not running yet.
+    """
+    queue = get_submission_queue()
+    if queue is not None:
+        queue.start()
+
+
+def enqueue_submission(response_id):
+    """
+    Queue a report for submission. Returns None if the report does not
+    exist, False if write-behind is off or the queue is full (submit
+    synchronously instead), and True once the submission is queued.
+    """
+    queue = get_submission_queue()
+    if queue is None:
+        return False
+    if not Report.objects.filter(response_id=response_id).exists():
+        return None
+    try:
+        queue.enqueue({'response_id': response_id})
+    except QueueFull:
+        return False
+    return True
@@ -0,0 +1,416 @@
+import datetime
+import json
+import tempfile
+from unittest import skipUnless
+
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.request import Request
+
+from .archive import archive_reports, get_archive
+from .export import export_chunks
+from .facets import sync_facets
+from .models import Report, ReportFacet, ReportStat
+from .partitioning import KEYS_TABLE, apply_plan, is_partitioned, month_partition_name, partition_plan
+from .querysets import UnmappedField, loaded_columns, serializer_columns
+from .serializers import ReportResumeSerializer
+from .stats import rebuild_stats, stats_summary
+from .views import ACTION_SERIALIZERS, ReportViewSet
+
+
+def create_report(client, data=None):
+    response = client.post('/api/reports/', data or {}, content_type='application/json')
+    return response.json()['response_id']
+
+
+def use_temporary_archive(test_case):
+    """
+    Point REPORTS_ARCHIVE at an empty directory until the test ends.
+    """
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    archive_override = override_settings(REPORTS_ARCHIVE={'PATH': directory.name})
+    archive_override.enable()
+    test_case.addCleanup(archive_override.disable)
+
+
+class ActionColumnsTests(TestCase):
+    """
+    The deferred-column querysets of the report actions (reports/querysets.py).
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.report = Report.objects.create(
+            name='A. Student', incident_description='A long narrative', incident_types=['verbal'],
+        )
+
+    def test_columns_cover_serializer_fields(self):
+        for action_name, serializer_class in ACTION_SERIALIZERS.items():
+            with self.subTest(action=action_name):
+                columns = loaded_columns(serializer_class)
+                self.assertIsNotNone(columns)
+                sources = {field.source for field in serializer_class().fields.values()}
+                self.assertEqual(set(columns), sources | {'id', 'updated_at'})
+
+    def test_action_querysets_load_only_serializer_columns(self):
+        request = Request(RequestFactory().get('/api/reports/'))
+        for action_name, serializer_class in ACTION_SERIALIZERS.items():
+            with self.subTest(action=action_name):
+                view = ReportViewSet(action=action_name, request=request, format_kwarg=None)
+                queryset = view.get_queryset()
+                self.assertEqual(
+                    queryset.query.deferred_loading,
+                    (frozenset(loaded_columns(serializer_class)), False),
+                )
+
+    def test_serializing_loads_no_deferred_field(self):
+        for action_name, serializer_class in ACTION_SERIALIZERS.items():
+            with self.subTest(action=action_name):
+                report = Report.objects.only(*loaded_columns(serializer_class)).get(pk=self.report.pk)
+                with self.assertNumQueries(0):
+                    serializer_class(report).data
+
+    def test_added_serializer_field_is_loaded(self):
+        class ResumeWithName(ReportResumeSerializer):
+            class Meta(ReportResumeSerializer.Meta):
+                fields = ReportResumeSerializer.Meta.fields + ['name']
+
+        self.assertIn('name', loaded_columns(ResumeWithName))
+        self.assertNotIn('name', loaded_columns(ReportResumeSerializer))
+
+    def test_unmapped_field_loads_every_column(self):
+        class ResumeWithMethod(ReportResumeSerializer):
+            summary = serializers.SerializerMethodField()
+
+            class Meta(ReportResumeSerializer.Meta):
+                fields = ReportResumeSerializer.Meta.fields + ['summary']
+
+            def get_summary(self, obj):
+                return obj.incident_description
+
+        with self.assertRaises(UnmappedField):
+            serializer_columns(ResumeWithMethod)
+        self.assertIsNone(loaded_columns(ResumeWithMethod))
+
+
+class ExportTests(TestCase):
+    """
+    The research export (reports/export.py) leaves out everything that
+    identifies a report or its reporter.
+    """
+    IDENTIFYING_FIELDS = ('id', 'response_id', 'name', 'contact_email', 'contact_phone')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.report = Report.objects.create(
+            name='A. Student', contact_email='student@example.com', contact_phone='555-0100',
+            incident_types=['verbal'], research_consent=True, is_submitted=True,
+        )
+        sync_facets({'incident_types': cls.report.incident_types}, report_id=cls.report.pk)
+
+    def setUp(self):
+        use_temporary_archive(self)
+
+    def test_no_identifying_column_is_exported(self):
+        rows = [json.loads(line) for line in export_chunks('ndjson')]
+        self.assertEqual(len(rows), 1)
+        self.assertFalse(set(rows[0]) & set(self.IDENTIFYING_FIELDS))
+        self.assertEqual(rows[0]['incident_types__verbal'], 1)
+
+        header = next(export_chunks('csv'))
+        self.assertFalse(set(header.strip().split(',')) & set(self.IDENTIFYING_FIELDS))
+
+    def test_no_exported_value_reaches_the_report(self):
+        # The numeric id is covered by the columns test
+        identifiers = {str(getattr(self.report, field)) for field in self.IDENTIFYING_FIELDS[1:]}
+        for value in json.loads(next(iter(export_chunks('ndjson')))).values():
+            self.assertNotIn(str(value), identifiers)
+
+
+@override_settings(ALLOWED_HOSTS=['*'], REPORTS_WRITE_BEHIND={'ENABLED': False})
+class ReportApiTests(TestCase):
+    """
+    Versioned writes, conditional GETs, submission and batch saves of the
+    report API.
+    """
+    def setUp(self):
+        self.response_id = create_report(self.client)
+        self.report_url = f'/api/reports/{self.response_id}'
+
+    def patch(self, path, data=None, **headers):
+        return self.client.patch(path, data or {}, content_type='application/json', headers=headers)
+
+    def test_step_save_returns_the_full_step(self):
+        response = self.patch(f'{self.report_url}/personal_info/', {'school_name': 'Central'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"2"')
+        data = response.json()
+        self.assertEqual(data['version'], 2)
+        self.assertEqual(data['response_id'], self.response_id)
+        self.assertEqual(data['school_name'], 'Central')
+        self.assertIn('current_step', data)
+        self.assertIn('school_board', data)
+
+    def test_stale_if_match_is_rejected(self):
+        self.patch(f'{self.report_url}/personal_info/', {'school_name': 'A'}, if_match='"1"')
+        response = self.patch(f'{self.report_url}/personal_info/', {'school_name': 'B'}, if_match='"1"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.json()['version'], 2)
+        self.assertEqual(response['ETag'], '"2"')
+        self.assertEqual(Report.objects.get(response_id=self.response_id).school_name, 'A')
+
+    def test_matching_etag_is_not_modified(self):
+        for path in (f'{self.report_url}/', f'{self.report_url}/resume/'):
+            with self.subTest(path=path):
+                etag = self.client.get(path)['ETag']
+                self.assertEqual(self.client.get(path, headers={'If-None-Match': etag}).status_code, 304)
+                self.patch(f'{self.report_url}/school_response/', {'school_response': 'Changed'})
+                self.assertEqual(self.client.get(path, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_submitting_twice_counts_once(self):
+        self.patch(f'{self.report_url}/personal_info/', {'school_board': 'B1'})
+        for _ in range(2):
+            self.assertEqual(self.patch(f'{self.report_url}/submit/').status_code, 200)
+        report = Report.objects.get(response_id=self.response_id)
+        self.assertTrue(report.is_submitted)
+        self.assertEqual(report.version, 3)
+        self.assertEqual(stats_summary()['by_school_board'], {'B1': 1})
+
+    def test_batch_with_a_bad_step_writes_nothing(self):
+        response = self.client.post(f'{self.report_url}/batch/', {
+            'personal_info': {'school_name': 'Central'},
+            'incident_details': {'incident_date': 'not a date'},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('incident_details', response.json())
+        report = Report.objects.get(response_id=self.response_id)
+        self.assertIsNone(report.school_name)
+        self.assertEqual(report.version, 1)
+
+    def test_missing_report(self):
+        self.assertEqual(self.patch('/api/reports/zzzzzzzz/personal_info/', {'name': 'x'}).status_code, 404)
+        self.assertEqual(self.patch('/api/reports/zzzzzzzz/submit/').status_code, 404)
+
+
+@override_settings(ALLOWED_HOSTS=['*'], REPORTS_WRITE_BEHIND={'ENABLED': False})
+class AsyncViewsTests(TestCase):
+    """
+    The async step, resume and submit views (reports/async_views.py).
+    """
+    def setUp(self):
+        self.response_id = create_report(self.client)
+        self.url = f'/api/async/reports/{self.response_id}'
+        self.async_client = AsyncClient()
+
+    def patch(self, path, data=None, **headers):
+        return self.async_client.patch(path, data or {}, content_type='application/json', headers=headers)
+
+    async def test_step_save(self):
+        response = await self.patch(f'{self.url}/personal_info/', {'school_name': 'Central'})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual((data['version'], data['school_name']), (2, 'Central'))
+        self.assertIn('current_step', data)
+
+        response = await self.patch(f'{self.url}/school_response/', {'school_response': 'x'}, if_match='"1"')
+        self.assertEqual(response.status_code, 412)
+        response = await self.patch(
+            f'{self.url}/incident_details/', {'incident_types': ['verbal']}, if_match='"2"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"3"')
+        response = await self.patch('/api/async/reports/zzzzzzzz/personal_info/', {'name': 'x'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual((await self.patch(f'{self.url}/no_such_step/')).status_code, 404)
+
+    async def test_resume(self):
+        response = await self.async_client.get(f'{self.url}/resume/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['response_id'], self.response_id)
+        etag = response['ETag']
+        response = await self.async_client.get(f'{self.url}/resume/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get('/api/async/reports/zzzzzzzz/resume/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_submit(self):
+        await self.patch(f'{self.url}/personal_info/', {'school_board': 'B1'})
+        for _ in range(2):
+            self.assertEqual((await self.patch(f'{self.url}/submit/')).status_code, 200)
+        report = await Report.objects.aget(response_id=self.response_id)
+        self.assertTrue(report.is_submitted)
+        # Counted once, by the first submission
+        self.assertEqual(await ReportStat.objects.filter(dimension='total', count=1).acount(), 1)
+
+
+@override_settings(ALLOWED_HOSTS=['*'], REPORTS_WRITE_BEHIND={'ENABLED': False})
+class StatsRollupTests(TestCase):
+    """
+    Every write to a submitted report keeps the ReportStat rollup equal to
+    what `rebuild_stats` computes from scratch.
+    """
+    def assertRollupCurrent(self, by_school_board):
+        live = stats_summary()
+        self.assertEqual(live['by_school_board'], by_school_board)
+        rebuild_stats()
+        self.assertEqual(stats_summary(), live)
+
+    def create_submitted(self, school_board):
+        return create_report(self.client, {
+            'is_submitted': True, 'school_board': school_board, 'incident_types': ['verbal'],
+        })
+
+    def patch(self, path, data):
+        return self.client.patch(path, data, content_type='application/json')
+
+    def test_creating_a_submitted_report_counts_it(self):
+        self.create_submitted('B1')
+        self.assertRollupCurrent({'B1': 1})
+
+    def test_step_save_after_submit_moves_the_counts(self):
+        response_id = self.create_submitted('B1')
+        self.patch(f'/api/reports/{response_id}/personal_info/', {'school_board': 'B2'})
+        self.assertRollupCurrent({'B2': 1})
+        self.client.post(f'/api/reports/{response_id}/batch/', {
+            'personal_info': {'school_board': 'B3'}, 'incident_details': {'incident_types': ['cyber']},
+        }, content_type='application/json')
+        self.assertRollupCurrent({'B3': 1})
+
+    def test_detail_update_recounts(self):
+        response_id = self.create_submitted('B1')
+        self.patch(f'/api/reports/{response_id}/', {'school_board': 'B2'})
+        self.assertRollupCurrent({'B2': 1})
+        self.patch(f'/api/reports/{response_id}/', {'is_submitted': False})
+        self.assertRollupCurrent({})
+
+    def test_delete_subtracts(self):
+        response_id = self.create_submitted('B1')
+        self.create_submitted('B2')
+        self.client.delete(f'/api/reports/{response_id}/')
+        self.assertRollupCurrent({'B2': 1})
+
+    def test_draft_edits_count_nothing(self):
+        response_id = create_report(self.client)
+        self.patch(f'/api/reports/{response_id}/personal_info/', {'school_board': 'B1'})
+        self.assertRollupCurrent({})
+
+
+@override_settings(ALLOWED_HOSTS=['*'], REPORTS_WRITE_BEHIND={'ENABLED': False})
+class ArchivedReportTests(TestCase):
+    """
+    Reports moved to the cold archive (reports/archive.py) are still
+    exported, and any request for one puts it back in the table.
+    """
+    def setUp(self):
+        use_temporary_archive(self)
+        self.response_id = create_report(self.client, {
+            'is_submitted': True, 'research_consent': True, 'school_board': 'B1',
+            'incident_types': ['cyber'],
+        })
+        long_ago = timezone.now() - datetime.timedelta(days=400)
+        Report.objects.filter(response_id=self.response_id).update(created_at=long_ago, updated_at=long_ago)
+        self.assertEqual(archive_reports(), 1)
+        self.assertFalse(Report.objects.filter(response_id=self.response_id).exists())
+
+    def patch(self, path, data=None):
+        return self.client.patch(path, data or {}, content_type='application/json')
+
+    def assertRehydrated(self):
+        self.assertTrue(Report.objects.filter(response_id=self.response_id).exists())
+        self.assertEqual(get_archive().count(), 0)
+
+    def test_export_includes_archived_reports(self):
+        rows = [json.loads(line) for line in export_chunks('ndjson')]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['school_board'], rows[0]['incident_types__cyber']), ('B1', 1))
+        self.assertNotIn('response_id', rows[0])
+        self.assertFalse(Report.objects.exists())
+
+    def test_resume(self):
+        response = self.client.get(f'/api/reports/{self.response_id}/resume/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['response_id'], self.response_id)
+        self.assertRehydrated()
+
+    def test_step_save_keeps_the_rollup(self):
+        response = self.patch(f'/api/reports/{self.response_id}/personal_info/', {'school_board': 'B2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['school_board'], 'B2')
+        self.assertRehydrated()
+        self.assertEqual(stats_summary()['by_school_board'], {'B2': 1})
+
+    def test_submit(self):
+        self.assertEqual(self.patch(f'/api/reports/{self.response_id}/submit/').status_code, 200)
+        self.assertRehydrated()
+
+    async def test_async_step_save(self):
+        response = await AsyncClient().patch(
+            f'/api/async/reports/{self.response_id}/school_response/', {'school_response': 'x'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['version'], 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Partitioning is only supported on PostgreSQL")
+@override_settings(ALLOWED_HOSTS=['*'], REPORTS_WRITE_BEHIND={'ENABLED': False})
+class PartitioningTests(TestCase):
+    """
+    The reports table after `partition_reports` (reports/partitioning.py).
+    """
+    def partition(self, months_ahead=1, today=None):
+        apply_plan(connection, *partition_plan(connection, months_ahead, today))
+
+    def partition_of(self, response_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM reports_report WHERE response_id = %s", [response_id]
+            )
+            return cursor.fetchone()[0]
+
+    def keys_of(self, response_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {KEYS_TABLE} WHERE response_id = %s", [response_id])
+            return cursor.fetchone()[0]
+
+    def test_report_round_trip(self):
+        submitted = create_report(self.client, {'is_submitted': True, 'incident_types': ['verbal']})
+        self.partition()
+        self.assertTrue(is_partitioned(connection))
+        self.assertEqual(self.keys_of(submitted), 1)
+
+        response_id = create_report(self.client)
+        self.assertEqual(self.partition_of(response_id), 'reports_report_drafts')
+        response = self.client.patch(
+            f'/api/reports/{response_id}/incident_details/', {'incident_types': ['cyber']},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.patch(f'/api/reports/{response_id}/submit/').status_code, 200)
+        self.assertEqual(self.partition_of(response_id), month_partition_name(datetime.date.today()))
+        self.assertEqual(self.keys_of(response_id), 1)
+        self.assertEqual(self.client.get(f'/api/reports/{response_id}/').status_code, 200)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Report.objects.create(response_id=response_id)
+
+        self.assertEqual(self.client.delete(f'/api/reports/{response_id}/').status_code, 204)
+        self.assertFalse(ReportFacet.objects.filter(report__response_id=response_id).exists())
+        self.assertEqual(self.keys_of(response_id), 0)
+
+    def test_month_with_rows_in_the_default_partition(self):
+        today = datetime.date.today()
+        self.partition(months_ahead=0, today=today)
+        response_id = create_report(self.client, {'is_submitted': True})
+        later = today.replace(day=1) + datetime.timedelta(days=70)
+        Report.objects.filter(response_id=response_id).update(
+            created_at=datetime.datetime.combine(later, datetime.time(), tzinfo=datetime.timezone.utc)
+        )
+        self.assertEqual(self.partition_of(response_id), 'reports_report_submitted_default')
+
+        self.partition(months_ahead=0, today=later)
+        self.assertEqual(self.partition_of(response_id), month_partition_name(later))
+        self.assertEqual(self.keys_of(response_id), 1)
+        self.assertEqual(self.client.get(f'/api/reports/{response_id}/').status_code, 200)
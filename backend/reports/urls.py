@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import ReportViewSet, ResumeReportView
+from .views import MetricsView, ReportViewSet, ResumeReportView, StatsView, WriteBehindStatsView
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
@@ -11,4 +11,7 @@ router.register(r'reports', ReportViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('resume/<str:response_id>/', ResumeReportView.as_view(), name='resume-report'),
+    path('stats/', StatsView.as_view(), name='report-stats'),
+    path('write-behind/', WriteBehindStatsView.as_view(), name='write-behind-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ] 
\ No newline at end of file
@@ -1,18 +1,146 @@
-from rest_framework import viewsets, status, generics
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from rest_framework import viewsets, status, generics, permissions, views
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
 
-from .models import Report
+from .archive import rehydrate_report
+from .cache import get_resume_cache
+from .conditional import (
+    conditional_response, if_match_version, is_conditional, report_etag, set_validators
+)
+from .export import EXPORT_FORMATS, export_chunks, export_queryset, parquet_available
+from .facets import filter_by_facets, sync_facets
+from .instrumentation import MetricsPermission, prometheus_stats, registry
+from .models import MULTI_VALUE_FIELDS, Report
+from .querysets import loaded_columns
+from .response_ids import next_response_id
+from .routing import ReplicaReadsMixin, record_write
 from .serializers import (
-    ReportSerializer, ReportResumeSerializer, BeforeYouBeginSerializer,
-    PersonalInfoSerializer, IncidentDetailsSerializer, ReportingResponseSerializer,
-    SchoolResponseSerializer, ImpactSupportSerializer, AdditionalInfoSerializer,
-    SubmitReportSerializer
+    ReportSerializer, ReportListSerializer, ReportResumeSerializer, SubmitReportSerializer
+)
+from .stats import STAT_SOURCE_FIELDS, recount_report, stats_summary, submitted_stat_keys
+from .submissions import enqueue_submission, get_submission_queue
+from .steps import (
+    STEPS, STEPS_BY_NAME, VersionConflict, validate_step, save_steps,
+    submit_report, update_report
 )
 
 
-class ReportViewSet(viewsets.ModelViewSet):
+# Serializer used by each ReportViewSet action
+ACTION_SERIALIZERS = {
+    'create': ReportSerializer,
+    'list': ReportListSerializer,
+    'retrieve': ReportSerializer,
+    'resume': ReportResumeSerializer,
+    'submit': SubmitReportSerializer,
+    **{step.name: step.serializer_class for step in STEPS},
+}
+
+
+def save_report_steps(response_id, validated_steps, expected_version=None):
+    """
+    `save_steps`, but a report that is not in the table is looked for in the
+    cold archive and, if found, put back and saved. Raises NotFound if it is
+    in neither.
+    """
+    report = save_steps(response_id, validated_steps, expected_version)
+    if report is None and rehydrate_report(response_id) is not None:
+        report = save_steps(response_id, validated_steps, expected_version)
+    if report is None:
+        raise NotFound(detail="Report not found")
+    return report
+
+
+def step_action(step):
+    """
+    Build the PATCH action that saves a single form step.
+
+    The step is validated with its serializer and written with one conditional
+    UPDATE; the report is never loaded first. With an If-Match header the
+    UPDATE only applies to that version of the report (412 otherwise).
+    A report in the cold archive is put back in the table first.
+    """
+    def update_step(self, request, response_id=None):
+        serializer = validate_step(step, request.data)
+        report = save_report_steps(
+            response_id, [(step, serializer.validated_data)], if_match_version(request)
+        )
+        get_resume_cache().delete(response_id)
+        return Response(
+            {'version': report.version, **step.serializer_class(report).data},
+            headers={'ETag': report_etag(report.version)}
+        )
+
+    update_step.__name__ = step.name
+    update_step.__doc__ = f"Update the \"{step.title}\" step of a report."
+    return action(detail=True, methods=['patch'])(update_step)
+
+
+def precondition_failed(conflict):
+    """
+    412 response for a write based on an outdated version of the report.
+    """
+    return Response({
+        'detail': 'The report has been changed since this version was loaded',
+        'version': conflict.version
+    }, status=status.HTTP_412_PRECONDITION_FAILED, headers={'ETag': report_etag(conflict.version)})
+
+
+def unchanged_response(request, queryset, response_id, private=False):
+    """
+    For a conditional GET, 304 Not Modified when the client's copy of the
+    report is current, decided with a values_list() query before anything
+    is loaded or serialized. None otherwise, including when the report is
+    not in the table, so that the full GET can look for it in the archive.
+    """
+    if not is_conditional(request):
+        return None
+    validators = queryset.filter(response_id=response_id).values_list('version', 'updated_at').first()
+    if validators is None:
+        return None
+    return conditional_response(request, *validators, private=private)
+
+
+def resume_response(view, request, response_id):
+    """
+    Return the resume payload for a report, served from the resume cache
+    when possible, with its ETag and Last-Modified (or 304 Not Modified).
+    """
+    cache = get_resume_cache()
+    payload = cache.get(response_id)
+    if payload is None:
+        response = unchanged_response(request, view.get_queryset(), response_id)
+        if response is not None:
+            return response
+        payload = dict(view.get_serializer(view.get_object()).data)
+        cache.set(response_id, payload)
+    response = conditional_response(request, payload['version'], payload['updated_at'])
+    if response is None:
+        response = set_validators(Response(payload), payload['version'], payload['updated_at'])
+    return response
+
+
+class ArchivedReportMixin:
+    """
+    View mixin: `get_object` puts a report that is in the cold archive back
+    in the table (see reports/archive.py) instead of raising Http404.
+    """
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            report = rehydrate_report(self.kwargs[self.lookup_field])
+            if report is None:
+                raise
+            # Later reads of the report must not go to a replica yet
+            record_write(report.response_id)
+            self.check_object_permissions(self.request, report)
+            return report
+
+
+class ReportViewSet(ArchivedReportMixin, ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     ViewSet for the Report model.
     Provides CRUD operations and custom actions for the multi-step form.
@@ -20,34 +148,50 @@ class ReportViewSet(viewsets.ModelViewSet):
     queryset = Report.objects.all()
     serializer_class = ReportSerializer
     lookup_field = 'response_id'
+    replica_actions = ('list', 'retrieve', 'resume', 'export')
+    # Most queries each action may run (see reports.instrumentation); steps
+    # with multi-value fields also replace the report's facet rows
+    query_budgets = {
+        'create': 6,
+        'list': 1,
+        'retrieve': 1,
+        'resume': 1,
+        'batch': 6,
+        'submit': 4,
+        # Replacing facet rows costs up to three queries; a step with
+        # rollup fields looks up whether the report is already counted
+        **{
+            step.name: 3
+            + 3 * bool(set(step.serializer_class.Meta.fields) & set(MULTI_VALUE_FIELDS))
+            + bool(set(step.serializer_class.Meta.fields) & set(STAT_SOURCE_FIELDS))
+            for step in STEPS
+        },
+    }
     
     def get_serializer_class(self):
         """
         Return the appropriate serializer based on the action.
         """
-        if self.action == 'create':
-            return ReportSerializer
-        elif self.action == 'retrieve':
-            return ReportSerializer
-        elif self.action == 'resume':
-            return ReportResumeSerializer
-        elif self.action == 'before_you_begin':
-            return BeforeYouBeginSerializer
-        elif self.action == 'personal_info':
-            return PersonalInfoSerializer
-        elif self.action == 'incident_details':
-            return IncidentDetailsSerializer
-        elif self.action == 'reporting_response':
-            return ReportingResponseSerializer
-        elif self.action == 'school_response':
-            return SchoolResponseSerializer
-        elif self.action == 'impact_support':
-            return ImpactSupportSerializer
-        elif self.action == 'additional_info':
-            return AdditionalInfoSerializer
-        elif self.action == 'submit':
-            return SubmitReportSerializer
-        return self.serializer_class
+        return ACTION_SERIALIZERS.get(self.action, self.serializer_class)
+    
+    def handle_exception(self, exc):
+        if isinstance(exc, VersionConflict):
+            return precondition_failed(exc)
+        return super().handle_exception(exc)
+    
+    def get_queryset(self):
+        """
+        Only load the columns the action's serializer uses, so large text and
+        JSON fields are left in the database unless they are needed.
+        """
+        queryset = super().get_queryset()
+        serializer_class = ACTION_SERIALIZERS.get(self.action)
+        columns = loaded_columns(serializer_class) if serializer_class else None
+        if columns:
+            queryset = queryset.only(*columns)
+        if self.action == 'list':
+            queryset = filter_by_facets(queryset, self.request.query_params)
+        return queryset
     
     def create(self, request, *args, **kwargs):
         """
@@ -55,7 +199,8 @@ class ReportViewSet(viewsets.ModelViewSet):
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        report = serializer.save()
+        self.perform_create(serializer)
+        report = serializer.instance
         
         # Return the response_id for the client to use in subsequent requests
         return Response({
@@ -63,150 +208,243 @@ class ReportViewSet(viewsets.ModelViewSet):
             'message': 'Report created successfully'
         }, status=status.HTTP_201_CREATED)
     
-    @action(detail=True, methods=['get'])
-    def resume(self, request, response_id=None):
-        """
-        Resume a report by its response_id.
-        """
-        try:
-            report = self.get_object()
-            serializer = self.get_serializer(report)
-            return Response(serializer.data)
-        except Report.DoesNotExist:
-            raise NotFound(detail="Report not found")
+    def perform_create(self, serializer):
+        # Drawn outside the transaction, so the ID pool can reserve a block
+        response_id = next_response_id()
+        with transaction.atomic():
+            serializer.save(response_id=response_id)
+            sync_facets(serializer.validated_data, report_id=serializer.instance.pk)
+            if serializer.instance.is_submitted:
+                recount_report([], submitted_stat_keys(report_id=serializer.instance.pk))
     
-    @action(detail=True, methods=['patch'])
-    def before_you_begin(self, request, response_id=None):
-        """
-        Update the "Before You Begin" step of a report.
-        """
-        report = self.get_object()
-        serializer = self.get_serializer(report, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        
-        # Update current_step if it's still at step 1
-        if report.current_step == 1:
-            serializer.validated_data['current_step'] = 2
-        
-        serializer.save()
-        return Response(serializer.data)
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Claim the next version (honouring If-Match) before the full-row
+            # save, which then writes it
+            version = update_report(
+                serializer.instance.response_id, {}, if_match_version(self.request)
+            )
+            if version is None:
+                raise NotFound(detail="Report not found")
+            report_id = serializer.instance.pk
+            old_keys = submitted_stat_keys(report_id=report_id)
+            serializer.instance.version = version
+            super().perform_update(serializer)
+            sync_facets(serializer.validated_data, report_id=report_id)
+            recount_report(old_keys, submitted_stat_keys(report_id=report_id))
+        get_resume_cache().delete(serializer.instance.response_id)
     
-    @action(detail=True, methods=['patch'])
-    def personal_info(self, request, response_id=None):
-        """
-        Update the "Personal & Contact Information" step of a report.
-        """
-        report = self.get_object()
-        serializer = self.get_serializer(report, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        
-        # Update current_step if it's still at step 2
-        if report.current_step == 2:
-            serializer.validated_data['current_step'] = 3
-        
-        serializer.save()
-        return Response(serializer.data)
+    def perform_destroy(self, instance):
+        response_id = instance.response_id
+        with transaction.atomic():
+            old_keys = submitted_stat_keys(report_id=instance.pk)
+            super().perform_destroy(instance)
+            recount_report(old_keys, [])
+        get_resume_cache().delete(response_id)
     
-    @action(detail=True, methods=['patch'])
-    def incident_details(self, request, response_id=None):
+    def retrieve(self, request, *args, **kwargs):
         """
-        Update the "Incident Details" step of a report.
+        Return a report with its ETag and Last-Modified, or 304 Not Modified
+        when the client's copy is current.
         """
+        response_id = kwargs[self.lookup_field]
+        response = unchanged_response(request, self.get_queryset(), response_id, private=True)
+        if response is not None:
+            return response
         report = self.get_object()
-        serializer = self.get_serializer(report, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        
-        # Update current_step if it's still at step 3
-        if report.current_step == 3:
-            serializer.validated_data['current_step'] = 4
-        
-        serializer.save()
-        return Response(serializer.data)
+        # A report just rehydrated from the archive has not been checked yet
+        response = conditional_response(request, report.version, report.updated_at, private=True)
+        if response is not None:
+            return response
+        return set_validators(
+            Response(self.get_serializer(report).data), report.version, report.updated_at,
+            private=True
+        )
     
-    @action(detail=True, methods=['patch'])
-    def reporting_response(self, request, response_id=None):
+    @action(detail=True, methods=['get'])
+    def resume(self, request, response_id=None):
         """
-        Update the "Reporting & Response" step of a report.
+        Resume a report by its response_id.
         """
-        report = self.get_object()
-        serializer = self.get_serializer(report, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        
-        # Update current_step if it's still at step 4
-        if report.current_step == 4:
-            serializer.validated_data['current_step'] = 5
-        
-        serializer.save()
-        return Response(serializer.data)
+        try:
+            return resume_response(self, request, response_id)
+        except Report.DoesNotExist:
+            raise NotFound(detail="Report not found")
     
-    @action(detail=True, methods=['patch'])
-    def school_response(self, request, response_id=None):
-        """
-        Update the "School Response" step of a report.
-        """
-        report = self.get_object()
-        serializer = self.get_serializer(report, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        
-        # Update current_step if it's still at step 5
-        if report.current_step == 5:
-            serializer.validated_data['current_step'] = 6
-        
-        serializer.save()
-        return Response(serializer.data)
+    # One PATCH action per form step, all driven by the STEPS table
+    before_you_begin = step_action(STEPS_BY_NAME['before_you_begin'])
+    personal_info = step_action(STEPS_BY_NAME['personal_info'])
+    incident_details = step_action(STEPS_BY_NAME['incident_details'])
+    reporting_response = step_action(STEPS_BY_NAME['reporting_response'])
+    school_response = step_action(STEPS_BY_NAME['school_response'])
+    impact_support = step_action(STEPS_BY_NAME['impact_support'])
+    additional_info = step_action(STEPS_BY_NAME['additional_info'])
     
-    @action(detail=True, methods=['patch'])
-    def impact_support(self, request, response_id=None):
+    @action(detail=True, methods=['post'])
+    def batch(self, request, response_id=None):
         """
-        Update the "Impact & Support" step of a report.
+        Save several form steps at once.
+
+        The body maps step names to the data for that step, e.g.
+        {"personal_info": {...}, "incident_details": {...}}. Every step is
+        validated before anything is written, then all of them are applied
+        in one transaction with a single UPDATE, conditional on the If-Match
+        version when one is sent.
         """
-        report = self.get_object()
-        serializer = self.get_serializer(report, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        
-        # Update current_step if it's still at step 6
-        if report.current_step == 6:
-            serializer.validated_data['current_step'] = 7
-        
-        serializer.save()
-        return Response(serializer.data)
+        if not isinstance(request.data, dict) or not request.data:
+            raise ValidationError({'detail': 'No steps provided'})
+
+        unknown = [name for name in request.data if name not in STEPS_BY_NAME]
+        if unknown:
+            raise ValidationError({name: ['Unknown step'] for name in unknown})
+
+        serializers, errors = {}, {}
+        for name, data in request.data.items():
+            serializer = STEPS_BY_NAME[name].serializer_class(data=data, partial=True)
+            if serializer.is_valid():
+                serializers[name] = serializer
+            else:
+                errors[name] = serializer.errors
+        if errors:
+            raise ValidationError(errors)
+
+        report = save_report_steps(response_id, [
+            (STEPS_BY_NAME[name], serializer.validated_data)
+            for name, serializer in serializers.items()
+        ], if_match_version(request))
+        get_resume_cache().delete(response_id)
+
+        return Response({
+            'response_id': response_id,
+            'version': report.version,
+            'steps': {name: STEPS_BY_NAME[name].serializer_class(report).data for name in serializers}
+        }, headers={'ETag': report_etag(report.version)})
     
-    @action(detail=True, methods=['patch'])
-    def additional_info(self, request, response_id=None):
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
         """
-        Update the "Additional Information" step of a report.
+        Stream submitted, research-consented reports as CSV, NDJSON or Parquet.
+
+        The format is chosen with ?output=csv|ndjson|parquet (default csv).
         """
-        report = self.get_object()
-        serializer = self.get_serializer(report, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        
-        # Update current_step if it's still at step 7
-        if report.current_step == 7:
-            serializer.validated_data['current_step'] = 8
-        
-        serializer.save()
-        return Response(serializer.data)
+        export_format = request.query_params.get('output', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'output': [f"Choose one of: {', '.join(EXPORT_FORMATS)}"]})
+        if export_format == 'parquet' and not parquet_available():
+            raise ValidationError({'output': ['Parquet export requires pyarrow']})
+
+        # The rows are read after this view returns, so pick the database now
+        queryset = export_queryset()
+        response = StreamingHttpResponse(
+            export_chunks(export_format, queryset.using(queryset.db)),
+            content_type=EXPORT_FORMATS[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="reports.{export_format}"'
+        return response
     
     @action(detail=True, methods=['patch'])
     def submit(self, request, response_id=None):
         """
         Submit the final report.
+
+        With write-behind enabled the submission is queued and 202 Accepted
+        is returned; it falls back to submitting directly when the queue is
+        full.
         """
-        report = self.get_object()
-        serializer = self.get_serializer(report, data={'is_submitted': True}, partial=True)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        queued = enqueue_submission(response_id)
+        if queued is None and rehydrate_report(response_id) is not None:
+            queued = enqueue_submission(response_id)
+        if queued is None:
+            raise NotFound(detail="Report not found")
+        if queued:
+            return Response({
+                'message': 'Report accepted for submission',
+                'response_id': response_id
+            }, status=status.HTTP_202_ACCEPTED)
+
+        submitted = submit_report(response_id)
+        if not submitted and rehydrate_report(response_id) is not None:
+            submitted = submit_report(response_id)
+        if not submitted:
+            raise NotFound(detail="Report not found")
+        get_resume_cache().delete(response_id)
         
         return Response({
             'message': 'Report submitted successfully',
-            'response_id': report.response_id
+            'response_id': response_id
         })
 
 
-class ResumeReportView(generics.RetrieveAPIView):
+class ResumeReportView(ArchivedReportMixin, ReplicaReadsMixin, generics.RetrieveAPIView):
     """
     View to resume a report by its response_id.
     """
-    queryset = Report.objects.all()
     serializer_class = ReportResumeSerializer
-    lookup_field = 'response_id' 
\ No newline at end of file
+    lookup_field = 'response_id' 
+    replica_actions = ('get',)
+    query_budgets = {'get': 1}
+    
+    def get_queryset(self):
+        return Report.objects.only(*loaded_columns(ReportResumeSerializer))
+    
+    def retrieve(self, request, *args, **kwargs):
+        return resume_response(self, request, kwargs[self.lookup_field])
+
+
+class StatsView(ReplicaReadsMixin, views.APIView):
+    """
+    Aggregate counts of submitted reports by school board, incident type, role
+    and incident month, served from the ReportStat rollup table.
+
+    Optional ?from=YYYY-MM and ?to=YYYY-MM limit the incident months counted.
+    """
+    replica_actions = ('get',)
+    query_budgets = {'get': 1}
+    
+    def get(self, request):
+        try:
+            summary = stats_summary(
+                month_from=request.query_params.get('from'),
+                month_to=request.query_params.get('to'),
+            )
+        except ValueError:
+            raise ValidationError({'detail': 'Months must be given as YYYY-MM'})
+        return Response(summary)
+
+
+class WriteBehindStatsView(views.APIView):
+    """
+    Backpressure and throughput counters of the submission write-behind
+    queue, or {"enabled": false} when it is off.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        queue = get_submission_queue()
+        if queue is None:
+            return Response({'enabled': False})
+        return Response({'enabled': True, **queue.stats()})
+
+
+class MetricsView(views.APIView):
+    """
+    Per-view request metrics of this process (see reports/instrumentation.py)
+    with the resume cache and write-behind counters, as Prometheus text or,
+    with ?output=json, as JSON.
+    """
+    permission_classes = [MetricsPermission]
+    
+    def get(self, request):
+        queue = get_submission_queue()
+        cache_stats = get_resume_cache().stats()
+        queue_stats = queue.stats() if queue is not None else None
+        if request.query_params.get('output') == 'json':
+            return Response({
+                'views': registry.as_dict(),
+                'resume_cache': cache_stats,
+                'write_behind': queue_stats,
+            })
+        text = registry.prometheus() + prometheus_stats('resume_cache', cache_stats)
+        if queue_stats is not None:
+            text += prometheus_stats('write_behind', queue_stats)
+        return HttpResponse(text, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -35,6 +35,18 @@ ssh $SSH_USER@$DROPLET_IP << 'EOF'
     source venv/bin/activate
     pip install -r requirements.txt
     cp .env.production .env
+    # Report response IDs are derived from this secret: generate it once and
+    # keep it across deploys, as changing it changes every future ID
+    if ! grep -q '^REPORTS_RESPONSE_ID_KEY=.' .env; then
+        KEY_FILE=/etc/guard_reporting/response_id_key
+        if [ ! -s $KEY_FILE ]; then
+            mkdir -p /etc/guard_reporting
+            python3 -c 'import secrets; print(secrets.token_urlsafe(32))' > $KEY_FILE
+            chmod 600 $KEY_FILE
+        fi
+        sed -i '/^REPORTS_RESPONSE_ID_KEY=/d' .env
+        echo "REPORTS_RESPONSE_ID_KEY=$(cat $KEY_FILE)" >> .env
+    fi
     
     # Set up Nginx
     cat > /etc/nginx/sites-available/guard_app << 'NGINX'
@@ -76,6 +88,7 @@ After=network.target
 User=www-data
 Group=www-data
 WorkingDirectory=$PROJECT_DIR/backend
+EnvironmentFile=$PROJECT_DIR/backend/.env
 ExecStart=$PROJECT_DIR/backend/venv/bin/gunicorn --workers 3 --bind 127.0.0.1:8000 app:app
 
 [Install]
@@ -136,6 +136,17 @@ const reportApi = {
   updateAdditionalInfo: async (responseId, data) => {
     const response = await apiClient.patch(`/reports/${responseId}/additional-info/`, data);
     return response.data;
+  },
+
+  /**
+   * Save several sections in a single request
+   * @param {string} responseId - The response ID
+   * @param {Object} steps - Form data keyed by step name, e.g. { personal_info: {...} }
+   * @returns {Promise<Object>} The saved fields for each step
+   */
+  saveSteps: async (responseId, steps) => {
+    const response = await apiClient.post(`/reports/${responseId}/batch/`, steps);
+    return response.data;
   }
 };
 